@@ -34,6 +34,10 @@ OPENAI_API_KEY      = get_required_env_var("OPENAI_API_KEY")
 QDRANT_API_KEY      = get_required_env_var("QDRANT_API_KEY")
 QDRANT_CLIENT_URL   = get_required_env_var("QDRANT_CLIENT_URL")
 
+# ── optional overrides ─────────────────────────────────────────────────────────
+OPENAI_BASE_URL     = os.getenv("OPENAI_BASE_URL")  # e.g. a local mock embeddings server
+QDRANT_PREFER_GRPC  = os.getenv("QDRANT_PREFER_GRPC", "").lower() in ("1", "true", "yes")
+
 
 def main():
     try:
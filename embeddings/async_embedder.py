@@ -0,0 +1,273 @@
+# async_embedder.py
+
+import asyncio
+import logging
+import random
+import threading
+import time
+from typing import List, Optional, Sequence
+
+import openai
+from openai import AsyncOpenAI
+
+from .batching import MAX_REQUEST_INPUTS, MAX_REQUEST_TOKENS, count_tokens, pack_batches
+
+# Errors worth retrying: throttling, server-side failures and dropped connections
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.InternalServerError,
+    openai.APIConnectionError,   # includes APITimeoutError
+)
+
+
+class TokenBucket:
+    """
+    Token bucket that refills continuously at `rate_per_minute` up to `capacity`.
+
+    Used twice by the engine: once counting requests (RPM) and once counting tokens (TPM).
+    The bucket holds no asyncio primitives and its state is guarded by a thread lock (held only
+    while refilling and taking, never while waiting), so one instance can be shared by event
+    loops running in different threads.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        self.rate_per_second = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate_per_second)
+        self.updated_at = now
+
+    def _try_take(self, amount: float) -> float:
+        """Take `amount` tokens if available and return 0, else return the seconds until they will be."""
+        with self._lock:
+            self._refill()
+            if self.tokens >= amount:
+                self.tokens -= amount
+                return 0.0
+            return (amount - self.tokens) / self.rate_per_second
+
+    async def acquire(self, amount: float = 1.0) -> None:
+        """Wait until `amount` tokens are available and take them."""
+        amount = min(amount, self.capacity)  # a request larger than the bucket would wait forever
+        while True:
+            wait = self._try_take(amount)
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+
+class AsyncEmbeddingEngine:
+    """
+    Concurrent, rate-limit-aware client for the OpenAI embeddings endpoint.
+
+    Inputs are packed into token-budgeted requests (see `batching.pack_batches`), and the requests run
+    concurrently on one event loop. Concurrency is capped by a semaphore, and every request first takes
+    from a requests-per-minute and a tokens-per-minute bucket. 429 / 5xx / connection errors are retried
+    with exponential backoff and jitter, honouring `Retry-After` when the server sends one.
+
+    Pointing `base_url` at a local mock embeddings server makes the engine testable offline.
+    """
+
+    def __init__(
+        self,
+        model: str,
+        *,
+        api_key: Optional[str] = None,
+        base_url: Optional[str] = None,
+        dimensions: Optional[int] = None,
+        max_concurrency: int = 8,
+        requests_per_minute: float = 3_000,
+        tokens_per_minute: float = 1_000_000,
+        max_retries: int = 6,
+        initial_backoff: float = 1.0,
+        max_backoff: float = 60.0,
+    ):
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.model = model
+        self.api_key = api_key
+        self.base_url = base_url
+        self.dimensions = dimensions
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+
+        self.request_bucket = TokenBucket(requests_per_minute)
+        self.token_bucket = TokenBucket(tokens_per_minute)
+
+        # Created per event loop in `session()`; asyncio primitives cannot outlive their loop
+        self._client: Optional[AsyncOpenAI] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def session(self) -> "_EngineSession":
+        """
+        Async context manager that opens one HTTP client and concurrency limit for the running loop.
+
+            async with engine.session():
+                vectors = await engine.embed(texts)
+        """
+        return _EngineSession(self)
+
+    async def embed(self, texts: Sequence[str], token_counts: Optional[Sequence[int]] = None) -> List[List[float]]:
+        """
+        Embed `texts` and return their vectors in input order.
+
+        Args:
+            texts (Sequence[str]): Inputs to embed.
+            token_counts (Sequence[int], optional): Pre-computed token counts; counted locally if omitted.
+
+        Returns:
+            List[List[float]]: One vector per input.
+        """
+        client, semaphore = self._client, self._semaphore
+        if client is None:
+            # No session: a client of this call's own, so overlapping calls never share (or close) one
+            client, semaphore = self._new_client(), asyncio.Semaphore(self.max_concurrency)
+            try:
+                return await self._embed(texts, token_counts, client, semaphore)
+            finally:
+                await client.close()
+        return await self._embed(texts, token_counts, client, semaphore)
+
+    def _new_client(self) -> AsyncOpenAI:
+        # Retries are handled by the engine so that they go through the rate limiter
+        return AsyncOpenAI(api_key=self.api_key, base_url=self.base_url, max_retries=0)
+
+    async def _embed(self, texts: Sequence[str], token_counts: Optional[Sequence[int]],
+                     client: AsyncOpenAI, semaphore: asyncio.Semaphore) -> List[List[float]]:
+        texts = list(texts)
+        if not texts:
+            return []
+        if token_counts is None:
+            token_counts = count_tokens(texts, self.model)
+
+        batches = pack_batches(
+            token_counts,
+            max_request_tokens=min(MAX_REQUEST_TOKENS, self.token_bucket.capacity),
+            max_request_inputs=MAX_REQUEST_INPUTS,
+        )
+        self.logger.debug("Embedding %d inputs in %d request(s)", len(texts), len(batches))
+
+        results = await asyncio.gather(*(
+            self._embed_batch([texts[i] for i in batch], sum(token_counts[i] for i in batch), client, semaphore)
+            for batch in batches
+        ))
+
+        vectors: List[List[float]] = [None] * len(texts)
+        for batch, batch_vectors in zip(batches, results):
+            for idx, vector in zip(batch, batch_vectors):
+                vectors[idx] = vector
+        return vectors
+
+    async def _embed_batch(self, inputs: List[str], n_tokens: int, client: AsyncOpenAI,
+                           semaphore: asyncio.Semaphore) -> List[List[float]]:
+        kwargs = {"input": inputs, "model": self.model}
+        if self.dimensions:
+            kwargs["dimensions"] = self.dimensions
+
+        attempt = 0
+        while True:
+            await self.request_bucket.acquire(1)
+            await self.token_bucket.acquire(n_tokens)
+            try:
+                async with semaphore:
+                    response = await client.embeddings.create(**kwargs)
+                # The API tags every embedding with the position of its input
+                return [r.embedding for r in sorted(response.data, key=lambda r: r.index)]
+            except RETRYABLE_ERRORS as exc:
+                attempt += 1
+                if attempt > self.max_retries:
+                    self.logger.error("Giving up on a %d-input request after %d attempts: %s", len(inputs), attempt, exc)
+                    raise
+                delay = self._backoff_delay(attempt, exc)
+                self.logger.warning("Embedding request failed (%s); retry %d/%d in %.1fs",
+                                    exc.__class__.__name__, attempt, self.max_retries, delay)
+                await asyncio.sleep(delay)
+
+    def _backoff_delay(self, attempt: int, exc: Exception) -> float:
+        response = getattr(exc, "response", None)
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        if retry_after:
+            try:
+                return min(float(retry_after), self.max_backoff)
+            except ValueError:
+                pass
+        delay = min(self.initial_backoff * 2 ** (attempt - 1), self.max_backoff)
+        return delay * random.uniform(0.5, 1.0)
+
+
+class _EngineSession:
+    def __init__(self, engine: AsyncEmbeddingEngine):
+        self.engine = engine
+
+    async def __aenter__(self) -> AsyncEmbeddingEngine:
+        engine = self.engine
+        engine._client = engine._new_client()
+        engine._semaphore = asyncio.Semaphore(engine.max_concurrency)
+        return engine
+
+    async def __aexit__(self, *exc_info) -> None:
+        engine = self.engine
+        client, engine._client, engine._semaphore = engine._client, None, None
+        await client.close()
+
+
+def run_sync(coro):
+    """Run `coro` to completion from synchronous code, even if this thread already has a running loop."""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    # e.g. called from a notebook: run on a private loop in a helper thread
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        return pool.submit(asyncio.run, coro).result()
+
+
+class SyncRunner:
+    """
+    One event loop for several `run` calls from synchronous code; `run_sync` for a sequence of coroutines.
+
+    Like `run_sync`, it also works when this thread already has a running loop: the private loop then
+    lives in a helper thread, and every `run` is handed to that thread.
+
+        with SyncRunner() as runner:
+            for batch in batches:
+                runner.run(embed(batch))
+    """
+
+    def __init__(self):
+        self._runner = asyncio.Runner()
+        self._pool = None
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        from concurrent.futures import ThreadPoolExecutor
+        self._pool = ThreadPoolExecutor(max_workers=1)
+
+    def run(self, coro):
+        """Run `coro` to completion on the runner's loop and return its result."""
+        if self._pool is None:
+            return self._runner.run(coro)
+        return self._pool.submit(self._runner.run, coro).result()
+
+    def close(self) -> None:
+        if self._pool is None:
+            self._runner.close()
+            return
+        try:
+            self._pool.submit(self._runner.close).result()
+        finally:
+            self._pool.shutdown()
+
+    def __enter__(self) -> "SyncRunner":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
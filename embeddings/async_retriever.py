@@ -0,0 +1,501 @@
+# async_retriever.py
+
+import asyncio
+import logging
+import math
+from typing import Any, Dict, List, Optional, Sequence
+
+from qdrant_client import AsyncQdrantClient, models
+from qdrant_client.http.models import GroupsResult, QueryResponse, ScoredPoint, SearchParams
+
+from config.config_env import OPENAI_API_KEY, OPENAI_BASE_URL, QDRANT_API_KEY, QDRANT_CLIENT_URL, QDRANT_PREFER_GRPC
+from embeddings.async_embedder import AsyncEmbeddingEngine
+from embeddings.document_store import DocumentStore
+from embeddings.query_cache import QueryEmbeddingCache, missing_texts
+from embeddings.query_classifier import EXACT_MATCH_SCORE, QueryClass, classify_query, pin_exact_matches
+from embeddings.retriever import (CASE_FILTER, CHUNK_FILTER, DEFAULT_PAYLOAD_FIELDS, PASSAGE_PAYLOAD_FIELDS, Filters,
+                                  _QueryBuilderMixin)
+from embeddings.search_filters import SearchFilters, as_qdrant_filter, combine_filters
+from qdrant.client_factory import create_async_qdrant_client
+from qdrant.provisioning import CollectionSpec, load_collection_spec
+
+
+class AsyncQdrantQueryRetriever(_QueryBuilderMixin):
+    """
+    Asynchronous counterpart of `QdrantQueryRetriever`, built on `AsyncQdrantClient` and the async OpenAI
+    client (through `AsyncEmbeddingEngine`, which adds rate limiting and retries).
+
+    Nothing blocks the event loop while a query is embedded or searched, so one process can serve
+    hundreds of concurrent searches, and callers can fan out with ``asyncio.gather``:
+
+        async with AsyncQdrantQueryRetriever(collection_name="commonlii_cases") as retriever:
+            vector = await retriever.embed_query(query)
+            cases, other = await asyncio.gather(
+                retriever.search_by_vector(vector, limit=20),
+                other_retriever.search_by_vector(vector, limit=20),   # another collection, same client
+            )
+
+    Every public coroutine takes a `timeout` (defaulting to the retriever's) and raises
+    `asyncio.TimeoutError` when the whole call, embedding included, exceeds it; the remaining budget is
+    also passed to Qdrant so the server abandons the search. Cancelling the calling task cancels the
+    in-flight requests.
+
+    Use the retriever as an async context manager (or call `aclose`) so the OpenAI and Qdrant connections
+    are opened once and reused; without it, every embedding opens its own HTTP client.
+
+    Attributes:
+        collection_name (str): The name of the Qdrant collection to search in.
+        client (AsyncQdrantClient): Async Qdrant client, bound to the event loop it is first used on.
+        spec (CollectionSpec | None): Spec of the collection; decides the vector layout and embedding dimensions.
+        embeddings (AsyncEmbeddingEngine): Async query embedder (anything with ``async embed(texts)``).
+        payload_fields (List[str] | None): Payload fields returned with every hit; None returns the whole payload.
+        document_store (DocumentStore | None): Local store of the large payload fields, see `fetch_full_texts`.
+        query_cache (QueryEmbeddingCache | None): Cache of query embeddings; repeated queries skip the API call.
+        timeout (float | None): Default deadline of every call in seconds; None waits indefinitely.
+        exact_lookup (bool): Answer neutral citations / case numbers in the query from the payload index.
+    """
+
+    def __init__(
+        self,
+        *,
+        collection_name: str,
+        qdrant_url: str | None = QDRANT_CLIENT_URL,
+        qdrant_api_key: str | None = QDRANT_API_KEY,
+        openai_api_key: str | None = OPENAI_API_KEY,
+        embedding_model: str = "text-embedding-3-small",
+        prefer_grpc: bool = QDRANT_PREFER_GRPC,
+        search_params: SearchParams | None = None,
+        payload_fields: Sequence[str] | None = DEFAULT_PAYLOAD_FIELDS,
+        document_store: DocumentStore | None = None,
+        client: AsyncQdrantClient | None = None,
+        embeddings: Any | None = None,
+        spec: CollectionSpec | None = None,
+        query_cache: QueryEmbeddingCache | None = None,
+        timeout: float | None = 30.0,
+        exact_lookup: bool = True,
+    ) -> None:
+        """
+        Initializes the AsyncQdrantQueryRetriever; no connection is made until the first call.
+
+        Args:
+            collection_name (str): Name of the Qdrant collection to be queried.
+            qdrant_url (str, optional): URL of the Qdrant instance.
+            qdrant_api_key (str, optional): API key for authenticating with Qdrant.
+            openai_api_key (str, optional): API key for accessing OpenAI's embedding model.
+            embedding_model (str, optional): Identifier of the OpenAI embedding model to use.
+            prefer_grpc (bool, optional): Talk to Qdrant over gRPC instead of REST.
+            search_params (SearchParams, optional): Query-time parameters; defaults to the collection spec's.
+            payload_fields (Sequence[str], optional): Payload fields to return with each hit; None returns the whole payload.
+            document_store (DocumentStore, optional): Store holding `full_text` and other offloaded fields.
+            client (AsyncQdrantClient, optional): Client to use, e.g. one shared by retrievers of several
+                collections. The caller keeps ownership; by default the retriever creates and closes its own.
+            embeddings (optional): Async query embedder with ``async embed(texts)`` to use instead of OpenAI.
+            spec (CollectionSpec, optional): Spec of the collection; defaults to its entry in config/qdrant_collections.yaml.
+            query_cache (QueryEmbeddingCache, optional): Cache of query embeddings (see `embeddings.query_cache`).
+            timeout (float, optional): Default per-call deadline in seconds.
+            exact_lookup (bool, optional): Look citations and case numbers in queries up exactly (see
+                `QdrantQueryRetriever.similarity_search_by_query_with_dense_vector`). Defaults to True.
+        """
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.collection_name = collection_name
+        self.spec = spec or load_collection_spec(collection_name)
+        self.search_params = search_params or (self.spec.search_params() if self.spec else None)
+        self.payload_fields = list(payload_fields) if payload_fields is not None else None
+        self.document_store = document_store
+        self.embedding_model = embedding_model
+        self.query_cache = query_cache
+        self.timeout = timeout
+        self.exact_lookup = exact_lookup
+
+        self._owns_client = client is None
+        self.client = client or create_async_qdrant_client(qdrant_url, qdrant_api_key, prefer_grpc=prefer_grpc)
+
+        self._owns_embeddings = embeddings is None
+        self.embeddings = embeddings or AsyncEmbeddingEngine(
+            embedding_model,
+            api_key=openai_api_key,
+            base_url=OPENAI_BASE_URL,
+            # Query vectors must have the dimensions the collection was built with
+            dimensions=self.spec.vector_size if self.spec and self.spec.vector_size else None,
+        )
+        self._embedding_session = None
+
+    # ------------------------------------------------------------------ lifecycle
+
+    async def __aenter__(self) -> "AsyncQdrantQueryRetriever":
+        if self._owns_embeddings and self._embedding_session is None:
+            self._embedding_session = self.embeddings.session()
+            await self._embedding_session.__aenter__()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        """Close the OpenAI session and, unless it was passed in, the Qdrant client."""
+        session, self._embedding_session = self._embedding_session, None
+        if session is not None:
+            await session.__aexit__(None, None, None)
+        if self._owns_client:
+            await self.client.close()
+
+    # ------------------------------------------------------------------ embedding
+
+    async def embed_query(self, query: str, *, timeout: float | None = None) -> List[float]:
+        """
+        Returns the raw embedding vector, from `query_cache` when the query was embedded before.
+        """
+        return (await self.embed_queries([query], timeout=timeout))[0]
+
+    async def embed_queries(self, queries: Sequence[str], *, timeout: float | None = None) -> List[List[float]]:
+        """
+        Returns the embedding vectors of `queries`, embedding the ones not in `query_cache` in one request.
+        """
+        return await self._with_deadline(self._embed_queries(list(queries)), timeout)
+
+    async def _embed_queries(self, queries: List[str]) -> List[List[float]]:
+        if self.query_cache is None:
+            return await self.embeddings.embed(queries)
+
+        dimensions = self.spec.vector_size if self.spec else None
+        # The persistent tier is a DuckDB file: keep its lookups off the event loop
+        texts, vectors = await self._run_cache(self.query_cache.lookup_many, self.embedding_model, dimensions, queries)
+        pending = missing_texts(texts, vectors)
+        if pending:
+            loop = asyncio.get_running_loop()
+            started = loop.time()
+            fresh = await self.embeddings.embed(pending)
+            await self._run_cache(self.query_cache.add_many, self.embedding_model, dimensions, pending, fresh,
+                                  embed_seconds=loop.time() - started)
+            found = dict(zip(pending, fresh))
+            vectors = [found[t] if v is None else v for t, v in zip(texts, vectors)]
+        return [v.tolist() if hasattr(v, "tolist") else list(v) for v in vectors]
+
+    async def _run_cache(self, func, *args, **kwargs):
+        if self.query_cache.store is None:
+            return func(*args, **kwargs)
+        return await asyncio.to_thread(func, *args, **kwargs)
+
+    # ------------------------------------------------------------------ search
+
+    async def search(
+        self,
+        query: str,
+        limit: int = 10,
+        *,
+        offset: int = 0,
+        filters: Filters = None,
+        with_payload: bool | Sequence[str] | None = None,
+        case_level: bool = True,
+        timeout: float | None = None,
+    ) -> QueryResponse:
+        """
+        Embed `query` and search the collection; the async `similarity_search_by_query_with_dense_vector`.
+
+        On the first page, citations and case numbers in the query are looked up exactly, concurrently
+        with the semantic search of the rest of the query, and pinned above it; a query of identifiers
+        only is answered without an embedding call.
+
+        Args:
+            query (str): Natural language query to embed and search with.
+            limit (int, optional): Number of hits to return.
+            offset (int, optional): Number of best hits to skip, for paging.
+            filters (SearchFilters | Filter, optional): Court, decision date and people filters, applied by
+                Qdrant during the search (see `embeddings.search_filters`).
+            with_payload (bool | Sequence[str], optional): Payload to return with each hit; defaults to `payload_fields`.
+            case_level (bool, optional): Search case-level points only, so that a case indexed as chunks is
+                listed once. Defaults to True; use `search_cases_grouped` for passages.
+            timeout (float, optional): Deadline of the whole call in seconds; defaults to `self.timeout`.
+
+        Returns:
+            QueryResponse: The matched points, best first.
+        """
+        query_filter = self._flat_filter(filters, case_level)
+
+        async def semantic(text: str) -> QueryResponse:
+            vector = (await self._embed_queries([text]))[0]
+            return await self._query(vector, limit, offset, query_filter, with_payload, deadline)
+
+        async def run() -> QueryResponse:
+            query_class = classify_query(query) if self.exact_lookup and not offset else QueryClass(remainder=query)
+            if not query_class.exact:
+                return await semantic(query)
+            if query_class.exact_only:
+                exact = await self._exact_matches(query_class, limit, query_filter, with_payload, deadline)
+                return QueryResponse(points=exact) if exact else await semantic(query)
+            exact, response = await asyncio.gather(
+                self._exact_matches(query_class, limit, query_filter, with_payload, deadline),
+                semantic(query_class.remainder),
+            )
+            return QueryResponse(points=pin_exact_matches(exact, response.points, limit))
+
+        deadline = self._deadline(timeout)
+        return await self._with_deadline(run(), timeout)
+
+    async def search_by_vector(
+        self,
+        vector: Sequence[float],
+        limit: int = 10,
+        *,
+        offset: int = 0,
+        filters: Filters = None,
+        with_payload: bool | Sequence[str] | None = None,
+        case_level: bool = True,
+        timeout: float | None = None,
+    ) -> QueryResponse:
+        """
+        Search with a precomputed query embedding, e.g. one vector fanned out over several collections.
+
+        Takes the same arguments as `search`, with `vector` in place of the query text.
+        """
+        deadline = self._deadline(timeout)
+        return await self._with_deadline(
+            self._query(list(vector), limit, offset, self._flat_filter(filters, case_level), with_payload, deadline), timeout
+        )
+
+    async def search_pages(
+        self,
+        query: str,
+        page_size: int = 10,
+        pages: int = 3,
+        *,
+        filters: Filters = None,
+        with_payload: bool | Sequence[str] | None = None,
+        case_level: bool = True,
+        timeout: float | None = None,
+    ) -> List[QueryResponse]:
+        """
+        Prefetch the first `pages` result pages of `query` in one embedding and one search, so the next
+        pages of a listing are ready before they are asked for.
+
+        The pages are cut from a single ranking, so they neither overlap nor skip hits (separate
+        ``offset`` queries could, on a two-tier collection, rank different candidate lists).
+
+        Returns:
+            List[QueryResponse]: One response per page, in page order; trailing pages may be short or empty.
+        """
+        async def run() -> List[QueryResponse]:
+            vector = (await self._embed_queries([query]))[0]
+            response = await self._query(vector, page_size * pages, 0, self._flat_filter(filters, case_level), with_payload,
+                                         deadline)
+            return [QueryResponse(points=response.points[page * page_size:(page + 1) * page_size])
+                    for page in range(pages)]
+
+        deadline = self._deadline(timeout)
+        return await self._with_deadline(run(), timeout)
+
+    async def search_batch(
+        self,
+        queries: Sequence[str],
+        limit: int = 10,
+        filters: Filters | Sequence[Filters] = None,
+        with_payload: bool | Sequence[str] | None = None,
+        *,
+        case_level: bool = True,
+        timeout: float | None = None,
+    ) -> List[QueryResponse | Exception]:
+        """
+        Search many queries concurrently after embedding them in one request; the async `QdrantQueryRetriever.search_batch`.
+
+        Failures are isolated per query: a failing search only fails its own entry, and if the batched
+        embedding fails, the queries are embedded one by one. A deadline that expires still raises for the
+        whole batch.
+
+        Returns:
+            List[QueryResponse | Exception]: One entry per query, in input order: its response, or the
+            exception that made it fail.
+        """
+        queries = list(queries)
+        if filters is None or isinstance(filters, (models.Filter, SearchFilters)):
+            filters = [filters] * len(queries)
+        elif len(filters) != len(queries):
+            raise ValueError(f"Got {len(filters)} filters for {len(queries)} queries")
+        filters = [self._flat_filter(f, case_level) for f in filters]
+
+        async def embed_one(i: int):
+            return i, (await self._embed_queries([queries[i]]))[0]
+
+        async def run() -> List[QueryResponse | Exception]:
+            results: List[QueryResponse | Exception | None] = [None] * len(queries)
+            valid = []
+            for i, query in enumerate(queries):
+                if query.strip():
+                    valid.append(i)
+                else:
+                    results[i] = ValueError("Empty query")
+            if not valid:
+                return results
+
+            try:
+                vectors = dict(zip(valid, await self._embed_queries([queries[i] for i in valid])))
+            except Exception as e:
+                self.logger.warning("Batched embedding of %d queries failed (%s); embedding one by one", len(valid), e)
+                vectors = {}
+                for i, outcome in zip(valid, await asyncio.gather(*map(embed_one, valid), return_exceptions=True)):
+                    if isinstance(outcome, Exception):
+                        results[i] = outcome
+                    else:
+                        vectors[i] = outcome[1]
+
+            embedded = [i for i in valid if i in vectors]
+            responses = await asyncio.gather(*(
+                self._query(vectors[i], limit, 0, filters[i], with_payload, deadline) for i in embedded
+            ), return_exceptions=True)
+            for i, response in zip(embedded, responses):
+                results[i] = response
+            return results
+
+        deadline = self._deadline(timeout)
+        return await self._with_deadline(run(), timeout)
+
+    async def search_cases_grouped(
+        self,
+        query: str,
+        limit: int = 10,
+        group_size: int = 3,
+        with_payload: bool | Sequence[str] | None = None,
+        filters: Filters = None,
+        *,
+        timeout: float | None = None,
+    ) -> GroupsResult:
+        """
+        Search chunk-level points and return the best `limit` distinct cases with their best passages;
+        the async `QdrantQueryRetriever.search_cases_grouped`.
+        """
+        if with_payload is None and self.payload_fields is not None:
+            with_payload = self.payload_fields + [f for f in PASSAGE_PAYLOAD_FIELDS if f not in self.payload_fields]
+
+        async def run() -> GroupsResult:
+            vector = (await self._embed_queries([query]))[0]
+            return await self.client.query_points_groups(
+                self.collection_name,
+                group_by="case_id",
+                limit=limit,
+                group_size=group_size,
+                with_payload=self._with_payload(with_payload),
+                timeout=self._server_timeout(deadline),
+                **self._query_kwargs(vector, limit * group_size, combine_filters(CHUNK_FILTER, as_qdrant_filter(filters))),
+            )
+
+        deadline = self._deadline(timeout)
+        return await self._with_deadline(run(), timeout)
+
+    async def facet_counts(
+        self,
+        fields: Sequence[str] = ("court",),
+        filters: Filters = None,
+        limit: int = 50,
+        exact: bool = False,
+        *,
+        timeout: float | None = None,
+    ) -> Dict[str, Dict[Any, int]]:
+        """
+        Number of cases per value of each of `fields` among the cases passing `filters`; the async
+        `QdrantQueryRetriever.facet_counts`, with the fields counted concurrently.
+        """
+        facet_filter = combine_filters(CASE_FILTER, as_qdrant_filter(filters))
+
+        async def run() -> Dict[str, Dict[Any, int]]:
+            responses = await asyncio.gather(*(
+                self.client.facet(self.collection_name, key=key, facet_filter=facet_filter, limit=limit, exact=exact,
+                                  timeout=self._server_timeout(deadline))
+                for key in fields
+            ))
+            return {key: {hit.value: hit.count for hit in response.hits} for key, response in zip(fields, responses)}
+
+        deadline = self._deadline(timeout)
+        return await self._with_deadline(run(), timeout)
+
+    async def fetch_full_texts(
+        self,
+        point_ids: Sequence[int],
+        field: str = "full_text",
+        *,
+        timeout: float | None = None,
+    ) -> Dict[int, str]:
+        """
+        Fetch `field` (by default the judgment text) for `point_ids`: from `document_store` first, the
+        remaining ids from Qdrant; the async `QdrantQueryRetriever.fetch_full_texts`.
+        """
+        async def run() -> Dict[int, str]:
+            texts = await asyncio.to_thread(self.document_store.get_many, point_ids, field) if self.document_store else {}
+            missing = [pid for pid in point_ids if pid not in texts]
+            if missing:
+                records = await self.client.retrieve(self.collection_name, ids=missing, with_payload=[field],
+                                                     with_vectors=False)
+                for record in records:
+                    value = (record.payload or {}).get(field)
+                    if isinstance(value, str):
+                        texts[record.id] = value
+            return texts
+
+        return await self._with_deadline(run(), timeout)
+
+    # ------------------------------------------------------------------ helpers
+
+    async def _query(
+        self,
+        vector: List[float],
+        limit: int,
+        offset: int,
+        query_filter: Optional[models.Filter],
+        with_payload: bool | Sequence[str] | None,
+        deadline: Optional[float],
+    ) -> QueryResponse:
+        return await self.client.query_points(
+            self.collection_name,
+            limit=limit,
+            offset=offset or None,
+            with_payload=self._with_payload(with_payload),
+            timeout=self._server_timeout(deadline),
+            # Two-tier collections: the candidate list must also cover the skipped hits
+            **self._query_kwargs(vector, limit + offset, query_filter),
+        )
+
+    async def _exact_matches(
+        self,
+        query_class: QueryClass,
+        limit: int,
+        query_filter: Optional[models.Filter],
+        with_payload: bool | Sequence[str] | None,
+        deadline: Optional[float],
+    ) -> List[ScoredPoint]:
+        """Case points carrying the query's citations / case numbers (and matching `query_filter`), from one scroll."""
+        records, _ = await self.client.scroll(
+            self.collection_name,
+            scroll_filter=combine_filters(query_class.qdrant_filter(), query_filter),
+            limit=limit,
+            with_payload=self._with_payload(with_payload),
+            with_vectors=False,
+            timeout=self._server_timeout(deadline),
+        )
+        return [ScoredPoint(id=r.id, version=0, score=EXACT_MATCH_SCORE, payload=r.payload) for r in records]
+
+    def _deadline(self, timeout: Optional[float]) -> Optional[float]:
+        timeout = self.timeout if timeout is None else timeout
+        return asyncio.get_running_loop().time() + timeout if timeout is not None else None
+
+    @staticmethod
+    def _server_timeout(deadline: Optional[float]) -> Optional[int]:
+        """Remaining budget in whole seconds (Qdrant's resolution), at least 1."""
+        if deadline is None:
+            return None
+        return max(1, math.ceil(deadline - asyncio.get_running_loop().time()))
+
+    async def _with_deadline(self, coro, timeout: Optional[float]):
+        timeout = self.timeout if timeout is None else timeout
+        if timeout is None:
+            return await coro
+        return await asyncio.wait_for(coro, timeout)
+
+
+# --------------------------- Example usage ------------------------------- #
+
+if __name__ == "__main__":
+    async def main() -> None:
+        async with AsyncQdrantQueryRetriever(collection_name="commonlii_cases") as retriever:
+            queries = ["Legal cases about property law in Sarawak", "Breach of contract construction delay"]
+            for query, response in zip(queries, await asyncio.gather(*(retriever.search(q) for q in queries))):
+                print(query, [point.id for point in response.points])
+
+    asyncio.run(main())
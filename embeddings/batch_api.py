@@ -0,0 +1,268 @@
+# batch_api.py
+
+import hashlib
+import json
+import logging
+import os
+import time
+import uuid
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from openai import OpenAI
+
+# Limits of one OpenAI batch input file
+MAX_BATCH_REQUESTS = 50_000
+MAX_BATCH_FILE_BYTES = 190 * 1024 * 1024    # the API allows 200 MB; keep some headroom
+
+EMBEDDINGS_ENDPOINT = "/v1/embeddings"
+TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+
+@dataclass
+class BatchResult:
+    """Outcome of one request line of a batch."""
+    custom_id: str
+    embedding: Optional[List[float]] = None
+    error: Optional[str] = None
+
+
+class BatchBackend(ABC):
+    """
+    Submit/poll layer of the Batch API.
+
+    `BatchEmbeddingJob` only talks to this interface, so it can run against OpenAI
+    (`OpenAIBatchBackend`) or against the file-based stand-in (`LocalFileBatchBackend`).
+    """
+
+    @abstractmethod
+    def submit(self, request_file: str) -> str:
+        """Submit a JSONL request file and return the batch id."""
+
+    @abstractmethod
+    def status(self, batch_id: str) -> str:
+        """Return the batch status (``validating``, ``in_progress``, ..., ``completed``, ``failed``, ...)."""
+
+    @abstractmethod
+    def results(self, batch_id: str) -> Iterator[BatchResult]:
+        """Yield the result of every request line of a finished batch, successful or not."""
+
+
+def _parse_result_line(line: dict) -> BatchResult:
+    """Turn one line of a batch output or error file into a BatchResult."""
+    custom_id = line["custom_id"]
+    response = line.get("response") or {}
+    if line.get("error") or response.get("status_code") != 200:
+        error = line.get("error") or (response.get("body") or {}).get("error") or {"message": f"HTTP {response.get('status_code')}"}
+        return BatchResult(custom_id, error=error.get("message", str(error)) if isinstance(error, dict) else str(error))
+    return BatchResult(custom_id, embedding=response["body"]["data"][0]["embedding"])
+
+
+class OpenAIBatchBackend(BatchBackend):
+    """Batch API backend using the OpenAI Files and Batches endpoints."""
+
+    def __init__(self, client: OpenAI, completion_window: str = "24h"):
+        self.client = client
+        self.completion_window = completion_window
+
+    def submit(self, request_file: str) -> str:
+        with open(request_file, "rb") as f:
+            input_file = self.client.files.create(file=f, purpose="batch")
+        batch = self.client.batches.create(
+            input_file_id=input_file.id,
+            endpoint=EMBEDDINGS_ENDPOINT,
+            completion_window=self.completion_window,
+        )
+        return batch.id
+
+    def status(self, batch_id: str) -> str:
+        return self.client.batches.retrieve(batch_id).status
+
+    def results(self, batch_id: str) -> Iterator[BatchResult]:
+        batch = self.client.batches.retrieve(batch_id)
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if not file_id:
+                continue
+            for line in self.client.files.content(file_id).text.splitlines():
+                if line.strip():
+                    yield _parse_result_line(json.loads(line))
+
+
+class LocalFileBatchBackend(BatchBackend):
+    """
+    File-based stand-in for the Batch API, for tests and dry runs.
+
+    `submit` copies nothing over the network: it runs every request line through `handler`
+    (request body -> embeddings response body; raising marks the line failed) and writes the
+    results under ``root/<batch_id>/output.jsonl`` in the Batch API's output format.
+    """
+
+    def __init__(self, root: str, handler: Callable[[dict], dict]):
+        self.root = root
+        self.handler = handler
+
+    def submit(self, request_file: str) -> str:
+        batch_id = f"batch_local_{uuid.uuid4().hex[:12]}"
+        batch_dir = os.path.join(self.root, batch_id)
+        os.makedirs(batch_dir, exist_ok=True)
+        with open(request_file, "r", encoding="utf-8") as src, \
+                open(os.path.join(batch_dir, "output.jsonl"), "w", encoding="utf-8") as out:
+            for line in src:
+                if not line.strip():
+                    continue
+                request = json.loads(line)
+                try:
+                    result = {"status_code": 200, "body": self.handler(request["body"])}
+                    error = None
+                except Exception as exc:
+                    result, error = None, {"code": exc.__class__.__name__, "message": str(exc)}
+                out.write(json.dumps({"custom_id": request["custom_id"], "response": result, "error": error}) + "\n")
+        return batch_id
+
+    def status(self, batch_id: str) -> str:
+        return "completed" if os.path.exists(os.path.join(self.root, batch_id, "output.jsonl")) else "failed"
+
+    def results(self, batch_id: str) -> Iterator[BatchResult]:
+        with open(os.path.join(self.root, batch_id, "output.jsonl"), "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield _parse_result_line(json.loads(line))
+
+
+class BatchEmbeddingJob:
+    """
+    Embed a set of ``custom_id -> text`` inputs through the Batch API.
+
+    Inputs are written to JSONL request files (one input per line, split to respect the per-file
+    request and size limits), submitted, and polled until every batch reaches a terminal state.
+    Lines that failed, and the lines of batches that failed or expired as a whole, are written to a
+    new request file and resubmitted, up to `max_attempts` times.
+
+    Submitted batch ids are recorded in ``work_dir/batches.json``, so a job that is restarted with
+    the same inputs resumes polling instead of paying for the same requests twice.
+    """
+
+    def __init__(self, backend: BatchBackend, model: str, work_dir: str, *, dimensions: Optional[int] = None,
+                 poll_interval: float = 60.0, max_attempts: int = 3):
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.backend = backend
+        self.model = model
+        self.work_dir = work_dir
+        self.dimensions = dimensions
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        os.makedirs(work_dir, exist_ok=True)
+        self._state_path = os.path.join(work_dir, "batches.json")
+
+    def run(self, inputs: Dict[str, str]) -> Tuple[Dict[str, List[float]], Dict[str, str]]:
+        """
+        Embed `inputs` and return ``(embeddings, errors)``, both keyed by custom id.
+
+        `errors` holds the last error of every input that still failed after `max_attempts`.
+        """
+        return self.collect(self.submit(inputs), inputs)
+
+    def submit(self, inputs: Dict[str, str]) -> List[str]:
+        """Write `inputs` to request files and submit them as the first attempt; return the batch ids."""
+        if not inputs:
+            return []
+        self.logger.info("Batch attempt 1/%d: %d request(s)", self.max_attempts, len(inputs))
+        return self._submit_all(inputs, 1)
+
+    def collect(self, batch_ids: List[str], inputs: Dict[str, str]) -> Tuple[Dict[str, List[float]], Dict[str, str]]:
+        """
+        Wait for `batch_ids` (returned by `submit(inputs)`), resubmit the inputs that failed and return
+        ``(embeddings, errors)`` like `run`.
+
+        Submitting every group of inputs before collecting any lets their batches run side by side.
+        """
+        embeddings: Dict[str, List[float]] = {}
+        errors: Dict[str, str] = {}
+        todo = dict(inputs)
+
+        for attempt in range(1, self.max_attempts + 1):
+            if not todo:
+                break
+            if attempt > 1:
+                self.logger.info("Batch attempt %d/%d: %d request(s)", attempt, self.max_attempts, len(todo))
+                batch_ids = self._submit_all(todo, attempt)
+            self._wait(batch_ids)
+
+            errors = {cid: "no result returned" for cid in todo}
+            for batch_id in batch_ids:
+                for result in self.backend.results(batch_id):
+                    if result.custom_id not in todo:
+                        continue
+                    if result.embedding is not None:
+                        embeddings[result.custom_id] = result.embedding
+                        errors.pop(result.custom_id, None)
+                    else:
+                        errors[result.custom_id] = result.error
+            # Resubmit only what failed
+            todo = {cid: todo[cid] for cid in errors}
+            if todo:
+                self.logger.warning("%d request(s) failed in attempt %d", len(todo), attempt)
+
+        return embeddings, errors
+
+    def _submit_all(self, inputs: Dict[str, str], attempt: int) -> List[str]:
+        return [self._submit_once(path) for path in self._write_request_files(inputs, attempt)]
+
+    def _write_request_files(self, inputs: Dict[str, str], attempt: int) -> List[str]:
+        paths: List[str] = []
+        out = None
+        n_lines = n_bytes = 0
+        try:
+            for custom_id, text in inputs.items():
+                body = {"model": self.model, "input": text}
+                if self.dimensions:
+                    body["dimensions"] = self.dimensions
+                line = (json.dumps({"custom_id": custom_id, "method": "POST", "url": EMBEDDINGS_ENDPOINT, "body": body}) + "\n").encode("utf-8")
+                if out is None or n_lines >= MAX_BATCH_REQUESTS or n_bytes + len(line) > MAX_BATCH_FILE_BYTES:
+                    if out:
+                        out.close()
+                    paths.append(os.path.join(self.work_dir, f"requests_a{attempt}_{len(paths):04d}.jsonl"))
+                    out = open(paths[-1], "wb")
+                    n_lines = n_bytes = 0
+                out.write(line)
+                n_lines += 1
+                n_bytes += len(line)
+        finally:
+            if out:
+                out.close()
+        return paths
+
+    def _submit_once(self, request_file: str) -> str:
+        state = self._load_state()
+        with open(request_file, "rb") as f:
+            key = f"{os.path.basename(request_file)}:{hashlib.sha256(f.read()).hexdigest()[:16]}"
+        if key in state:
+            self.logger.info("Resuming batch %s for %s", state[key], request_file)
+            return state[key]
+        batch_id = self.backend.submit(request_file)
+        state[key] = batch_id
+        with open(self._state_path, "w", encoding="utf-8") as f:
+            json.dump(state, f, indent=2)
+        self.logger.info("Submitted %s as batch %s", request_file, batch_id)
+        return batch_id
+
+    def _load_state(self) -> Dict[str, str]:
+        if not os.path.exists(self._state_path):
+            return {}
+        with open(self._state_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _wait(self, batch_ids: List[str]) -> None:
+        pending = set(batch_ids)
+        while True:
+            for batch_id in list(pending):
+                status = self.backend.status(batch_id)
+                if status in TERMINAL_STATUSES:
+                    pending.discard(batch_id)
+                    log = self.logger.info if status == "completed" else self.logger.warning
+                    log("Batch %s finished with status '%s'", batch_id, status)
+            if not pending:
+                return
+            self.logger.info("Waiting for %d batch(es)...", len(pending))
+            time.sleep(self.poll_interval)
@@ -0,0 +1,120 @@
+# batching.py
+
+from functools import lru_cache
+from typing import List, Sequence, Tuple
+
+import tiktoken
+
+# Limits published for the OpenAI embeddings endpoint
+MAX_INPUT_TOKENS = 8191          # per input string
+MAX_REQUEST_TOKENS = 300_000     # summed over every input of one request
+MAX_REQUEST_INPUTS = 2048        # number of inputs in one request
+
+
+@lru_cache(maxsize=None)
+def get_encoding(model: str) -> tiktoken.Encoding:
+    """Return the tokenizer used by `model`, falling back to cl100k_base for unknown models."""
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def count_tokens(texts: Sequence[str], model: str) -> List[int]:
+    """Return the number of tokens of every text in `texts`."""
+    encoding = get_encoding(model)
+    return [len(tokens) for tokens in encoding.encode_ordinary_batch(list(texts))]
+
+
+def truncate_to_tokens(text: str, max_tokens: int, model: str) -> str:
+    """Cut `text` down to its first `max_tokens` tokens."""
+    encoding = get_encoding(model)
+    tokens = encoding.encode_ordinary(text)
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max_tokens])
+
+
+def pack_batches(
+    token_counts: Sequence[int],
+    *,
+    max_request_tokens: int = MAX_REQUEST_TOKENS,
+    max_request_inputs: int = MAX_REQUEST_INPUTS,
+) -> List[List[int]]:
+    """
+    Greedily pack input indices into request batches.
+
+    Inputs are kept in their original order, and each batch stays under both the
+    summed token budget and the input count limit of a single embeddings request.
+    An input that is larger than `max_request_tokens` on its own gets a batch of its own.
+
+    Args:
+        token_counts (Sequence[int]): Token count of every input, in input order.
+        max_request_tokens (int, optional): Token budget of one request.
+        max_request_inputs (int, optional): Maximum number of inputs in one request.
+
+    Returns:
+        List[List[int]]: Batches of indices into `token_counts`.
+    """
+    batches: List[List[int]] = []
+    current: List[int] = []
+    current_tokens = 0
+
+    for idx, n_tokens in enumerate(token_counts):
+        if current and (
+            current_tokens + n_tokens > max_request_tokens
+            or len(current) >= max_request_inputs
+        ):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(idx)
+        current_tokens += n_tokens
+
+    if current:
+        batches.append(current)
+    return batches
+
+
+def split_by_tokens(text: str, max_tokens: int, model: str, *, overlap: int = 0) -> List[Tuple[str, int, int, int]]:
+    """
+    Split `text` on token boundaries into pieces of at most `max_tokens` tokens.
+
+    Args:
+        text (str): Text to split.
+        max_tokens (int): Token budget of each piece.
+        model (str): Model whose tokenizer defines the boundaries.
+        overlap (int, optional): Number of tokens shared by consecutive pieces.
+
+    Returns:
+        List[Tuple[str, int, int, int]]: ``(piece, char_start, char_end, n_tokens)`` for every piece,
+        where ``text[char_start:char_end] == piece`` and ``n_tokens`` is the token count of the piece
+        encoded on its own.
+    """
+    if overlap >= max_tokens:
+        raise ValueError("overlap must be smaller than max_tokens")
+    encoding = get_encoding(model)
+    tokens = encoding.encode_ordinary(text)
+    if len(tokens) <= max_tokens:
+        return [(text, 0, len(text), len(tokens))]
+
+    # Character offset at which every token starts; the end of the text closes the last token
+    _, offsets = encoding.decode_with_offsets(tokens)
+    offsets = list(offsets) + [len(text)]
+
+    pieces = []
+    start = 0
+    while True:
+        end = min(start + max_tokens, len(tokens))
+        while True:
+            char_start, char_end = offsets[start], offsets[end]
+            piece = text[char_start:char_end]
+            n_tokens = len(encoding.encode_ordinary(piece))
+            if n_tokens <= max_tokens or end - start <= 1:
+                break
+            # A boundary inside a multibyte character re-encodes to more tokens: shrink the piece
+            end = max(start + 1, end - (n_tokens - max_tokens))
+        pieces.append((piece, char_start, char_end, n_tokens))
+        if end == len(tokens):
+            break
+        start = max(end - overlap, start + 1)
+    return pieces
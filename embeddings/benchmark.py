@@ -0,0 +1,214 @@
+# benchmark.py
+
+import json
+import logging
+import resource
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import duckdb
+import httpx
+import numpy as np
+
+from embeddings.duckdb_reader import iter_point_batches, source_sql
+
+logger = logging.getLogger(__name__)
+
+_GROUND_TRUTH_BLOCK_ROWS = 65_536
+
+
+@dataclass
+class QuerySet:
+    """Benchmark queries: their texts and an ``(n, dim)`` float32 matrix of their embeddings."""
+    texts: List[str]
+    vectors: np.ndarray
+
+
+class StaticQueryEmbedder:
+    """
+    Query embedder serving precomputed vectors, so benchmarks measure the search and not the embedding API.
+
+    Implements the `embed_query` / `embed_documents` methods used by the retrievers.
+    """
+
+    def __init__(self, query_set: QuerySet):
+        self._vectors = {text: vector for text, vector in zip(query_set.texts, query_set.vectors.tolist())}
+
+    def embed_query(self, text: str) -> List[float]:
+        try:
+            return self._vectors[text]
+        except KeyError:
+            raise KeyError(f"No precomputed vector for query {text!r}") from None
+
+    def embed_documents(self, texts: Sequence[str]) -> List[List[float]]:
+        return [self.embed_query(text) for text in texts]
+
+
+def load_query_set(path: str, embed_documents: Optional[Callable[[List[str]], List[List[float]]]] = None) -> QuerySet:
+    """
+    Load queries from a JSONL file of ``{"query": "...", "vector": [...]}`` lines.
+
+    Lines without a ``vector`` are embedded once with `embed_documents` (e.g. `OpenAIEmbeddings.embed_documents`).
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        rows = [json.loads(line) for line in f if line.strip()]
+    texts = [row["query"] for row in rows]
+    missing = [i for i, row in enumerate(rows) if row.get("vector") is None]
+    if missing:
+        if embed_documents is None:
+            raise ValueError(f"{len(missing)} queries in {path} have no vector and no embedder was given")
+        for i, vector in zip(missing, embed_documents([texts[i] for i in missing])):
+            rows[i]["vector"] = vector
+    return QuerySet(texts=texts, vectors=np.asarray([row["vector"] for row in rows], dtype=np.float32))
+
+
+def sample_query_set(duckdb_path: str, table_name: str = "embedded_points", n: int = 200, *,
+                     noise: float = 0.05, seed: int = 0) -> QuerySet:
+    """
+    Build queries from stored points: `n` random vectors with Gaussian noise of relative scale `noise` added.
+
+    Needs no embedding API, and the queries follow the corpus distribution.
+    """
+    con = duckdb.connect(duckdb_path, read_only=True)
+    try:
+        rows = con.execute(
+            f"SELECT id, vector FROM {source_sql(table_name)} USING SAMPLE {int(n)} ROWS (reservoir, {int(seed)})"
+        ).fetchall()
+    finally:
+        con.close()
+    rng = np.random.default_rng(seed)
+    vectors = np.asarray([row[1] for row in rows], dtype=np.float32)
+    scale = noise * np.linalg.norm(vectors, axis=1, keepdims=True) / np.sqrt(vectors.shape[1])
+    vectors = vectors + rng.normal(size=vectors.shape).astype(np.float32) * scale
+    return QuerySet(texts=[f"point:{row[0]}" for row in rows], vectors=vectors)
+
+
+def exact_top_k(duckdb_path: str, table_name: str, queries: np.ndarray, k: int) -> List[List[int]]:
+    """
+    Exact cosine top-`k` point ids per query, scanning the stored vectors block by block.
+
+    Memory stays bounded by one block of the corpus and a ``(queries, k)`` running result.
+    """
+    q = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+    best_scores = np.full((len(q), 0), -np.inf, dtype=np.float32)
+    best_ids = np.empty((len(q), 0), dtype=np.uint64)
+    for batch in iter_point_batches(duckdb_path, table_name, batch_size=_GROUND_TRUTH_BLOCK_ROWS, read_only=True):
+        block = batch.vectors / np.maximum(np.linalg.norm(batch.vectors, axis=1, keepdims=True), 1e-12)
+        scores = np.concatenate([best_scores, q @ block.T], axis=1)
+        ids = np.concatenate([best_ids, np.broadcast_to(batch.ids, (len(q), len(batch.ids)))], axis=1)
+        keep = min(k, scores.shape[1])
+        top = np.argpartition(-scores, keep - 1, axis=1)[:, :keep]
+        best_scores = np.take_along_axis(scores, top, axis=1)
+        best_ids = np.take_along_axis(ids, top, axis=1)
+    order = np.argsort(-best_scores, axis=1, kind="stable")
+    return np.take_along_axis(best_ids, order, axis=1).tolist()
+
+
+def recall_at_k(truth: Sequence[Sequence[int]], retrieved: Sequence[Sequence[int]], k: int) -> float:
+    """Mean fraction of the exact top-`k` found in the retrieved top-`k`."""
+    if not truth:
+        return 0.0
+    return float(np.mean([len(set(t[:k]) & set(r[:k])) / max(1, min(k, len(t))) for t, r in zip(truth, retrieved)]))
+
+
+def latency_summary(latencies: Sequence[float]) -> Dict[str, float]:
+    """p50/p95/p99/mean/max of `latencies` (seconds), in milliseconds."""
+    ms = np.asarray(latencies) * 1000.0
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {"p50_ms": float(p50), "p95_ms": float(p95), "p99_ms": float(p99),
+            "mean_ms": float(ms.mean()), "max_ms": float(ms.max())}
+
+
+def process_peak_rss_bytes() -> int:
+    """Peak resident memory of this process (ru_maxrss is in KB on Linux)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def qdrant_memory_bytes(url: str, api_key: Optional[str] = None) -> Dict[str, int]:
+    """Resident/allocated memory of a Qdrant server from its ``/metrics`` endpoint; empty if unavailable."""
+    try:
+        response = httpx.get(f"{url.rstrip('/')}/metrics", headers={"api-key": api_key} if api_key else {}, timeout=10)
+        response.raise_for_status()
+    except httpx.HTTPError as e:
+        logger.warning("Could not read Qdrant metrics: %s", e)
+        return {}
+    memory = {}
+    for line in response.text.splitlines():
+        name, _, value = line.partition(" ")
+        if name in ("memory_resident_bytes", "memory_allocated_bytes", "memory_active_bytes"):
+            memory[name] = int(float(value))
+    return memory
+
+
+def run_queries(search: Callable[[str], List[int]], texts: Sequence[str], concurrency: int) -> Dict[str, Any]:
+    """
+    Run `search` over `texts` with `concurrency` threads.
+
+    Returns:
+        dict: ``results`` (ids per query, in input order), ``latencies`` (seconds), ``wall_seconds``,
+        ``errors`` and ``qps``.
+    """
+    results: List[List[int]] = [[] for _ in texts]
+    latencies: List[float] = []
+    errors = 0
+
+    def timed(i: int):
+        start = time.perf_counter()
+        ids = search(texts[i])
+        return i, ids, time.perf_counter() - start
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [pool.submit(timed, i) for i in range(len(texts))]
+        for future in futures:
+            try:
+                i, ids, latency = future.result()
+            except Exception as e:
+                errors += 1
+                logger.warning("Query failed: %s", e)
+                continue
+            results[i] = ids
+            latencies.append(latency)
+    wall = time.perf_counter() - started
+    return {"results": results, "latencies": latencies, "wall_seconds": wall,
+            "errors": errors, "qps": len(latencies) / wall if wall else 0.0}
+
+
+def benchmark_retriever(
+    retriever,
+    query_set: QuerySet,
+    truth: Sequence[Sequence[int]],
+    *,
+    k: int = 10,
+    concurrency_levels: Sequence[int] = (1, 4, 16),
+    warmup: int = 10,
+) -> Dict[str, Any]:
+    """
+    Measure recall@k and latency/QPS of a retriever at each concurrency level.
+
+    `retriever` is anything with `similarity_search_by_query_with_dense_vector` (`QdrantQueryRetriever`,
+    `LocalVectorRetriever`) whose embedder knows the query texts, e.g. a `StaticQueryEmbedder`.
+    """
+    def search(text: str) -> List[int]:
+        # Ground truth ranks every point, chunks included
+        response = retriever.similarity_search_by_query_with_dense_vector(text, limit=k, with_payload=False, case_level=False)
+        return [point.id for point in response.points]
+
+    for text in query_set.texts[:warmup]:
+        search(text)
+
+    levels = []
+    recall = None
+    for concurrency in concurrency_levels:
+        run = run_queries(search, query_set.texts, concurrency)
+        if recall is None:
+            recall = recall_at_k(truth, run["results"], k)
+        level = {"concurrency": concurrency, "qps": run["qps"], "errors": run["errors"]}
+        if run["latencies"]:
+            level.update(latency_summary(run["latencies"]))
+        levels.append(level)
+        logger.info("concurrency %d: %.1f QPS, p50 %.2f ms, p99 %.2f ms", concurrency, run["qps"],
+                    level.get("p50_ms", float("nan")), level.get("p99_ms", float("nan")))
+    return {f"recall_at_{k}": recall, "levels": levels, "client_peak_rss_bytes": process_peak_rss_bytes()}
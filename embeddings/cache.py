@@ -0,0 +1,200 @@
+# cache.py
+
+import hashlib
+import logging
+import os
+import threading
+from typing import List, Optional, Sequence
+
+import duckdb
+import numpy as np
+import pyarrow as pa
+
+# Rough per-row overhead (key columns, timestamps) on top of the float32 vector itself
+_ROW_OVERHEAD_BYTES = 64
+
+
+def text_hash(text: str) -> str:
+    """Return the hex sha256 of `text`, the content address used as cache key."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Persistent, content-addressed embedding cache stored in DuckDB.
+
+    Vectors are keyed by ``(model, dimensions, sha256(text))`` and stored as float32, so re-embedding an
+    unchanged text is a local lookup instead of an API call. Lookups and inserts are done in bulk.
+
+    When `max_size_bytes` is set, the least recently used entries are evicted after every insert that
+    pushes the cache above that size, down to `evict_to_fraction` of it.
+
+    Attributes:
+        hits (int): Number of texts served from the cache.
+        misses (int): Number of texts that were not in the cache.
+    """
+
+    def __init__(
+        self,
+        db_path: str = "embedding_cache.duckdb",
+        *,
+        max_size_bytes: Optional[int] = None,
+        evict_to_fraction: float = 0.9,
+    ):
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.db_path = db_path
+        self.max_size_bytes = max_size_bytes
+        self.evict_to_fraction = evict_to_fraction
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._con = duckdb.connect(db_path)
+        self._con.execute("""
+            CREATE TABLE IF NOT EXISTS embedding_cache (
+                model        VARCHAR   NOT NULL,
+                dimensions   INTEGER   NOT NULL,   -- 0 = model default
+                text_hash    VARCHAR   NOT NULL,
+                vector       FLOAT[]   NOT NULL,
+                nbytes       INTEGER   NOT NULL,
+                created_at   TIMESTAMP NOT NULL DEFAULT current_timestamp,
+                last_used_at TIMESTAMP NOT NULL DEFAULT current_timestamp,
+                PRIMARY KEY (model, dimensions, text_hash)
+            )
+        """)
+
+    def get_many(
+        self,
+        model: str,
+        dimensions: Optional[int],
+        texts: Sequence[str],
+        *,
+        max_age_seconds: Optional[float] = None,
+    ) -> List[Optional[np.ndarray]]:
+        """
+        Look up `texts` in one query.
+
+        Args:
+            max_age_seconds (float, optional): Treat entries created longer ago than this as misses.
+
+        Returns:
+            List[Optional[np.ndarray]]: The cached float32 vector of every text, or None on a miss.
+        """
+        if not texts:
+            return []
+        hashes = [text_hash(t) for t in texts]
+        lookup = pa.table({"text_hash": list(dict.fromkeys(hashes))})
+
+        with self._lock:
+            self._con.register("cache_lookup", lookup)
+            try:
+                rows = self._con.execute("""
+                    SELECT c.text_hash, c.vector
+                    FROM embedding_cache c JOIN cache_lookup l USING (text_hash)
+                    WHERE c.model = ? AND c.dimensions = ?
+                      AND (? IS NULL OR c.created_at >= CAST(current_timestamp AS TIMESTAMP) - to_seconds(?))
+                """, [model, dimensions or 0, max_age_seconds, max_age_seconds]).fetchall()
+                if rows:
+                    self._con.execute("""
+                        UPDATE embedding_cache SET last_used_at = current_timestamp
+                        WHERE model = ? AND dimensions = ?
+                          AND text_hash IN (SELECT text_hash FROM cache_lookup)
+                    """, [model, dimensions or 0])
+            finally:
+                self._con.unregister("cache_lookup")
+
+        found = {h: np.asarray(v, dtype=np.float32) for h, v in rows}
+        vectors = [found.get(h) for h in hashes]
+        n_hits = sum(v is not None for v in vectors)
+        self.hits += n_hits
+        self.misses += len(vectors) - n_hits
+        return vectors
+
+    def put_many(self, model: str, dimensions: Optional[int], texts: Sequence[str], vectors: Sequence[Sequence[float]]) -> None:
+        """Store the vectors of `texts`, replacing any existing entries, then evict if over budget."""
+        if not texts:
+            return
+        rows = {}
+        for text, vector in zip(texts, vectors):
+            vector = np.asarray(vector, dtype=np.float32)
+            rows[text_hash(text)] = (vector, vector.nbytes + _ROW_OVERHEAD_BYTES)
+        new_rows = pa.table({
+            "text_hash": pa.array(list(rows), pa.string()),
+            "vector": pa.array([v for v, _ in rows.values()], pa.list_(pa.float32())),
+            "nbytes": pa.array([n for _, n in rows.values()], pa.int32()),
+        })
+
+        with self._lock:
+            self._con.register("cache_new", new_rows)
+            try:
+                self._con.execute("""
+                    INSERT OR REPLACE INTO embedding_cache (model, dimensions, text_hash, vector, nbytes)
+                    SELECT ?, ?, text_hash, vector, nbytes FROM cache_new
+                """, [model, dimensions or 0])
+            finally:
+                self._con.unregister("cache_new")
+
+        if self.max_size_bytes:
+            self.evict()
+
+    def size_bytes(self) -> int:
+        """Return the approximate size of the cached entries in bytes."""
+        with self._lock:
+            return self._con.execute("SELECT COALESCE(SUM(nbytes), 0) FROM embedding_cache").fetchone()[0]
+
+    def evict(self) -> int:
+        """
+        Drop least recently used entries until the cache fits `evict_to_fraction * max_size_bytes`.
+
+        Returns:
+            int: Number of entries evicted.
+        """
+        if not self.max_size_bytes or self.size_bytes() <= self.max_size_bytes:
+            return 0
+        target = int(self.max_size_bytes * self.evict_to_fraction)
+        with self._lock:
+            before = self._con.execute("SELECT COUNT(*) FROM embedding_cache").fetchone()[0]
+            self._con.execute("""
+                DELETE FROM embedding_cache WHERE rowid IN (
+                    SELECT rowid FROM (
+                        SELECT rowid, SUM(nbytes) OVER (ORDER BY last_used_at DESC, rowid DESC) AS kept_bytes
+                        FROM embedding_cache
+                    ) WHERE kept_bytes > ?
+                )
+            """, [target])
+            after = self._con.execute("SELECT COUNT(*) FROM embedding_cache").fetchone()[0]
+        self.logger.info("Evicted %d cache entries (budget %d bytes)", before - after, self.max_size_bytes)
+        return before - after
+
+    def expire(self, max_age_seconds: float) -> int:
+        """
+        Drop entries created more than `max_age_seconds` ago.
+
+        Returns:
+            int: Number of entries dropped.
+        """
+        with self._lock:
+            before = self._con.execute("SELECT COUNT(*) FROM embedding_cache").fetchone()[0]
+            self._con.execute(
+                "DELETE FROM embedding_cache WHERE created_at < CAST(current_timestamp AS TIMESTAMP) - to_seconds(?)",
+                [max_age_seconds],
+            )
+            after = self._con.execute("SELECT COUNT(*) FROM embedding_cache").fetchone()[0]
+        if before != after:
+            self.logger.info("Expired %d cache entries older than %.0fs", before - after, max_age_seconds)
+        return before - after
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and the current cache size."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "size_bytes": self.size_bytes(),
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._con.close()
@@ -0,0 +1,138 @@
+# document_store.py
+
+import logging
+import os
+import threading
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import duckdb
+import pyarrow as pa
+import zstandard
+from qdrant_client.http.models import PointStruct
+
+DEFAULT_OFFLOAD_FIELDS: Tuple[str, ...] = ("full_text",)
+STORED_FIELDS_KEY = "stored_fields"
+
+
+class DocumentStore:
+    """
+    Local, zstd-compressed store for large payload fields (the judgment `full_text`), keyed by point id.
+
+    Search results only need a few short payload fields, so ingestion moves the large ones here
+    (`offload`) and uploads slim points to Qdrant. Texts are fetched back in bulk when they are
+    actually needed, e.g. for a download or an LLM explanation (`get_many`).
+
+    Each ``(point id, field)`` pair is one row of a DuckDB table holding the zstd frame of the
+    UTF-8 text.
+    """
+
+    def __init__(self, db_path: str = "documents.duckdb", *, compression_level: int = 9, read_only: bool = False):
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.db_path = db_path
+        self.compression_level = compression_level
+
+        if not read_only:
+            os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._con = duckdb.connect(db_path, read_only=read_only)
+        if not read_only:
+            self._con.execute("""
+                CREATE TABLE IF NOT EXISTS documents (
+                    id        UBIGINT NOT NULL,
+                    field     VARCHAR NOT NULL,
+                    data      BLOB    NOT NULL,   -- zstd frame of the UTF-8 text
+                    raw_bytes INTEGER NOT NULL,
+                    PRIMARY KEY (id, field)
+                )
+            """)
+        self._compressor = zstandard.ZstdCompressor(level=compression_level)
+        self._decompressor = zstandard.ZstdDecompressor()
+
+    def put_many(self, documents: Iterable[Tuple[int, str, str]]) -> int:
+        """Store ``(point id, field, text)`` triples, replacing existing entries; return the number stored."""
+        ids: List[int] = []
+        fields: List[str] = []
+        blobs: List[bytes] = []
+        sizes: List[int] = []
+        with self._lock:
+            for point_id, field, text in documents:
+                raw = text.encode("utf-8")
+                ids.append(point_id)
+                fields.append(field)
+                blobs.append(self._compressor.compress(raw))
+                sizes.append(len(raw))
+            if not ids:
+                return 0
+            # One INSERT OR REPLACE must not contain the same key twice: keep the last occurrence
+            latest = {(pid, f): i for i, (pid, f) in enumerate(zip(ids, fields))}
+            keep = sorted(latest.values())
+            table = pa.table({
+                "id": pa.array([ids[i] for i in keep], type=pa.uint64()),
+                "field": pa.array([fields[i] for i in keep], type=pa.string()),
+                "data": pa.array([blobs[i] for i in keep], type=pa.binary()),
+                "raw_bytes": pa.array([sizes[i] for i in keep], type=pa.int32()),
+            })
+            self._con.register("new_documents", table)
+            self._con.execute("INSERT OR REPLACE INTO documents SELECT id, field, data, raw_bytes FROM new_documents")
+            self._con.unregister("new_documents")
+        return len(keep)
+
+    def get_many(self, point_ids: Sequence[int], field: str = "full_text") -> Dict[int, str]:
+        """Return ``{point id: text}`` for the ids of `point_ids` that have `field` stored."""
+        if not point_ids:
+            return {}
+        with self._lock:
+            rows = self._con.execute(
+                "SELECT id, data FROM documents WHERE field = ? AND id IN (SELECT UNNEST(?::UBIGINT[]))",
+                [field, [int(pid) for pid in point_ids]],
+            ).fetchall()
+            return {pid: self._decompressor.decompress(data).decode("utf-8") for pid, data in rows}
+
+    def delete_many(self, point_ids: Sequence[int]) -> None:
+        """Remove every stored field of `point_ids`."""
+        if not point_ids:
+            return
+        with self._lock:
+            self._con.execute("DELETE FROM documents WHERE id IN (SELECT UNNEST(?::UBIGINT[]))", [[int(pid) for pid in point_ids]])
+
+    def get(self, point_id: int, field: str = "full_text") -> Optional[str]:
+        return self.get_many([point_id], field).get(point_id)
+
+    def offload(self, points: Sequence[PointStruct], fields: Sequence[str] = DEFAULT_OFFLOAD_FIELDS) -> List[PointStruct]:
+        """
+        Move `fields` out of the payloads of `points` into the store.
+
+        Returns new points whose payloads no longer carry those fields; the names of the moved fields
+        are listed under ``stored_fields`` so readers know where to look. Points without any of the
+        fields are returned unchanged. Fields carried by a ``point_type="chunk"`` point belong to its
+        case (see `OpenAIEmbedder._record_points`) and are stored under its ``case_id``.
+        """
+        documents = []
+        slim_points = []
+        for point in points:
+            payload = point.payload or {}
+            moved = [f for f in fields if isinstance(payload.get(f), str)]
+            if not moved:
+                slim_points.append(point)
+                continue
+            owner_id = payload["case_id"] if payload.get("point_type") == "chunk" else point.id
+            documents.extend((owner_id, f, payload[f]) for f in moved)
+            slim = {k: v for k, v in payload.items() if k not in moved}
+            slim[STORED_FIELDS_KEY] = sorted(set(slim.get(STORED_FIELDS_KEY, [])) | set(moved))
+            slim_points.append(PointStruct(id=point.id, vector=point.vector, payload=slim))
+        stored = self.put_many(documents)
+        if stored:
+            self.logger.info("Offloaded %d field value(s) of %d point(s) to %s", stored, len(points), self.db_path)
+        return slim_points
+
+    def stats(self) -> Dict[str, int]:
+        """Return the number of stored entries and their raw and compressed sizes in bytes."""
+        with self._lock:
+            n, raw, compressed = self._con.execute(
+                "SELECT COUNT(*), COALESCE(SUM(raw_bytes), 0), COALESCE(SUM(octet_length(data)), 0) FROM documents"
+            ).fetchone()
+        return {"documents": n, "raw_bytes": raw, "compressed_bytes": compressed}
+
+    def close(self) -> None:
+        with self._lock:
+            self._con.close()
@@ -0,0 +1,119 @@
+# duckdb_reader.py
+
+from dataclasses import dataclass
+from typing import Iterator, List, Optional
+
+import duckdb
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+DEFAULT_BATCH_ROWS = 10_000
+_FILE_SUFFIXES = (".parquet", ".parq")
+
+
+@dataclass
+class TextBatch:
+    """One batch of rows to embed: ids, the extracted text field and the raw payload JSON."""
+    ids: List
+    texts: List[Optional[str]]
+    payloads: List[str]
+
+
+@dataclass
+class PointBatch:
+    """One batch of stored points: ids, an ``(n, dim)`` float32 vector matrix and the raw payload JSON."""
+    ids: np.ndarray
+    vectors: np.ndarray
+    payloads: List[str]
+
+
+def source_sql(table_or_parquet: str) -> str:
+    """Return the FROM clause for a table name or a Parquet file path, quoted for DuckDB."""
+    if table_or_parquet.lower().endswith(_FILE_SUFFIXES):
+        return "read_parquet('{}')".format(table_or_parquet.replace("'", "''"))
+    return '"{}"'.format(table_or_parquet.replace('"', '""'))
+
+
+def json_path(field: str) -> str:
+    """Turn a dot-notation field (``meta.title``) into a DuckDB JSON path (``$.meta.title``)."""
+    return "$." + ".".join('"{}"'.format(part.replace('"', '\\"')) for part in field.split("."))
+
+
+def _iter_record_batches(db_path: Optional[str], query: str, params: list, batch_size: int,
+                         read_only: bool = False) -> Iterator[pa.RecordBatch]:
+    con = duckdb.connect(db_path, read_only=read_only) if db_path else duckdb.connect()
+    try:
+        reader = con.execute(query, params).fetch_record_batch(batch_size)
+        for batch in reader:
+            if batch.num_rows:
+                yield batch
+    finally:
+        con.close()
+
+
+def iter_text_batches(
+    db_path: Optional[str],
+    table_or_parquet: str,
+    *,
+    text_field: str = "chunk_text",
+    batch_size: int = DEFAULT_BATCH_ROWS,
+) -> Iterator[TextBatch]:
+    """
+    Stream ``id``, ``payload`` and one JSON field of the payload from a DuckDB table or Parquet file.
+
+    The field is extracted by DuckDB (``json_extract_string``), so payloads are not parsed in Python.
+    Rows arrive as Arrow record batches of at most `batch_size` rows, so memory is bounded by the
+    batch size rather than the table size.
+
+    Args:
+        db_path: Path to the .duckdb database, or None to query a Parquet file directly.
+        table_or_parquet: Table name or path to a Parquet file with ``id`` and ``payload`` columns.
+        text_field: Payload field to extract (dot-notation OK).
+        batch_size: Maximum number of rows per yielded batch.
+    """
+    query = f"SELECT id, json_extract_string(payload, ?) AS text, payload FROM {source_sql(table_or_parquet)}"
+    for batch in _iter_record_batches(db_path, query, [json_path(text_field)], batch_size):
+        yield TextBatch(
+            ids=batch.column(0).to_pylist(),
+            texts=batch.column(1).to_pylist(),
+            payloads=batch.column(2).to_pylist(),
+        )
+
+
+def iter_point_batches(
+    db_path: Optional[str],
+    table_or_parquet: str,
+    *,
+    batch_size: int = DEFAULT_BATCH_ROWS,
+    read_only: bool = False,
+) -> Iterator[PointBatch]:
+    """
+    Stream ``id``, ``vector`` and ``payload`` from a DuckDB table or Parquet file.
+
+    Vectors are copied out of the Arrow buffers into a float32 matrix without building a Python
+    list per row. Both ``FLOAT[N]`` columns and the variable-length ``DOUBLE[]`` columns written by
+    older versions are supported.
+
+    Args:
+        db_path: Path to the .duckdb database, or None to query a Parquet file directly.
+        table_or_parquet: Table name or path to a Parquet file with ``id``, ``vector`` and ``payload`` columns.
+        batch_size: Maximum number of rows per yielded batch.
+        read_only: Open the database read-only, e.g. alongside other read-only connections of the process.
+
+    Raises:
+        ValueError: If the vectors of a batch do not all have the same dimension.
+    """
+    query = f"SELECT id, vector, payload FROM {source_sql(table_or_parquet)}"
+    for batch in _iter_record_batches(db_path, query, [], batch_size, read_only):
+        vector_col = batch.column(1)
+        if not pa.types.is_fixed_size_list(vector_col.type):
+            lengths = pc.list_value_length(vector_col)
+            if pc.min(lengths).as_py() != pc.max(lengths).as_py():
+                raise ValueError(f"Vectors in {table_or_parquet} do not all have the same dimension")
+        flat = vector_col.flatten().to_numpy(zero_copy_only=False)
+        yield PointBatch(
+            ids=batch.column(0).to_numpy(zero_copy_only=False),
+            vectors=flat.astype(np.float32, copy=False).reshape(batch.num_rows, -1),
+            payloads=batch.column(2).to_pylist(),
+        )
@@ -3,112 +3,153 @@
 import duckdb
 import json
 from openai import OpenAI
-from config.config_env import OPENAI_API_KEY, QDRANT_API_KEY, QDRANT_CLIENT_URL
-from typing import List, Dict
-import pandas as pd
+from config.config_env import OPENAI_API_KEY, OPENAI_BASE_URL, QDRANT_API_KEY, QDRANT_CLIENT_URL, QDRANT_PREFER_GRPC
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+from itertools import islice
 import os
-from qdrant_client.http.models import PointStruct, VectorParams
+from qdrant_client.http.models import PointStruct
 from qdrant_client import QdrantClient
-from qdrant_client.http.exceptions import UnexpectedResponse
+from qdrant.client_factory import get_qdrant_client
+from qdrant.provisioning import CollectionSpec, apply_collection_spec, collection_spec
 import logging
-from .utils import _dig
+import warnings
+from .utils import _dig, chunk_point_id
+from .json_stream import iter_json_records
+from .duckdb_reader import TextBatch, iter_text_batches
+from .batching import MAX_INPUT_TOKENS, count_tokens, split_by_tokens, truncate_to_tokens
+from .async_embedder import AsyncEmbeddingEngine, SyncRunner, run_sync
+from .cache import EmbeddingCache
+from .batch_api import BatchBackend, BatchEmbeddingJob, OpenAIBatchBackend
+from .search_filters import CASE_POINT_KEY
+import asyncio
 import numpy as np
+import pyarrow as pa
 
 # Configure logging at the top of the script
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 
 class OpenAIEmbedder:
-    def __init__(self, model: str = "text-embedding-3-small", openai_api_key: str = OPENAI_API_KEY, qdrant_api_key: str = QDRANT_API_KEY, qdrant_client_url: str = QDRANT_CLIENT_URL):
+    def __init__(self, model: str = "text-embedding-3-small", openai_api_key: str = OPENAI_API_KEY, qdrant_api_key: str = QDRANT_API_KEY, qdrant_client_url: str = QDRANT_CLIENT_URL, *, dimensions: Optional[int] = None, cache: Optional[EmbeddingCache] = None, openai_base_url: Optional[str] = OPENAI_BASE_URL, qdrant_prefer_grpc: bool = QDRANT_PREFER_GRPC, max_concurrency: int = 8, requests_per_minute: float = 3_000, tokens_per_minute: float = 1_000_000):
         # Initialize logger
         self.logger = logging.getLogger(self.__class__.__name__)
         
         self.logger.info("Initializing OpenAIEmbedder with model: %s", model)
-        self.client = OpenAI(api_key=openai_api_key)
+        self.client = OpenAI(api_key=openai_api_key, base_url=openai_base_url)
         self.model = model
         self.qdrant_api_key = qdrant_api_key
         self.qdrant_client_url = qdrant_client_url
+        self.qdrant_prefer_grpc = qdrant_prefer_grpc
+        self.dimensions = dimensions
+        self.cache = cache
+        self._specs: Dict[Tuple[str, int], CollectionSpec] = {}
+
+        # All embedding requests go through the async, rate-limited engine
+        self.engine = AsyncEmbeddingEngine(
+            model,
+            api_key=openai_api_key,
+            base_url=openai_base_url,
+            dimensions=dimensions,
+            max_concurrency=max_concurrency,
+            requests_per_minute=requests_per_minute,
+            tokens_per_minute=tokens_per_minute,
+        )
+
+    @property
+    def qdrant_client(self) -> QdrantClient:
+        """The shared, pooled Qdrant client for this embedder's Qdrant instance."""
+        return get_qdrant_client(self.qdrant_client_url, self.qdrant_api_key, prefer_grpc=self.qdrant_prefer_grpc)
+
+    def _prepare_inputs(self, texts: List[str], truncate: bool) -> Tuple[List[str], List[int]]:
+        """Token-count `texts` and, if `truncate` is set, cut inputs above the per-input limit."""
+        texts = list(texts)
+        token_counts = count_tokens(texts, self.model)
+        if truncate:
+            for idx, n_tokens in enumerate(token_counts):
+                if n_tokens > MAX_INPUT_TOKENS:
+                    self.logger.warning("Input %d has %d tokens; truncating to %d", idx, n_tokens, MAX_INPUT_TOKENS)
+                    texts[idx] = truncate_to_tokens(texts[idx], MAX_INPUT_TOKENS, self.model)
+                    token_counts[idx] = MAX_INPUT_TOKENS
+        return texts, token_counts
+
+    def _embed_texts(self, texts: List[str], *, truncate: bool = True) -> List[List[float]]:
+        """
+        Embed `texts` through as many embeddings requests as needed and return the vectors in input order.
 
-    def _extract_texts_from_duckdb(self, duckdb_path: str, table_name: str) -> List[Dict]:
+        Every input is token-counted locally and the inputs are packed into requests that respect the
+        per-request token and input limits; the requests run concurrently through `self.engine`.
+        With `truncate=False`, inputs above the per-input limit are sent unchanged and the API rejects them.
+        """
+        texts, token_counts = self._prepare_inputs(texts, truncate)
+        self.logger.info("Embedding %d inputs (%d tokens)", len(texts), sum(token_counts))
+        return run_sync(self._aembed(texts, token_counts))
+
+    async def _aembed(self, texts: List[str], token_counts: List[int]) -> List[List[float]]:
+        """Embed `texts` through the engine, serving what it can from `self.cache` and caching the rest."""
+        if self.cache is None:
+            return await self.engine.embed(texts, token_counts)
+
+        vectors = self.cache.get_many(self.model, self.dimensions, texts)
+        # Embed every distinct missing text once
+        missing: Dict[str, List[int]] = {}
+        for idx, vector in enumerate(vectors):
+            if vector is None:
+                missing.setdefault(texts[idx], []).append(idx)
+        self.logger.info("Embedding cache: %d hit(s), %d distinct miss(es)", len(texts) - sum(map(len, missing.values())), len(missing))
+
+        if missing:
+            miss_texts = list(missing)
+            fresh = await self.engine.embed(miss_texts, [token_counts[idxs[0]] for idxs in missing.values()])
+            self.cache.put_many(self.model, self.dimensions, miss_texts, fresh)
+            for idxs, vector in zip(missing.values(), fresh):
+                for idx in idxs:
+                    vectors[idx] = vector
+        return [v.tolist() if isinstance(v, np.ndarray) else v for v in vectors]
+
+    def _extract_texts_from_duckdb(self, duckdb_path: str, table_name: str, *, text_field: str = "chunk_text") -> List[Dict]:
         self.logger.info("Extracting texts from DuckDB file: %s, table: %s", duckdb_path, table_name)
-        query = f"SELECT id, payload FROM {table_name}"
-        conn = duckdb.connect(duckdb_path)
-        df = conn.execute(query).fetchdf()
+        records = [
+            record
+            for batch in iter_text_batches(duckdb_path, table_name, text_field=text_field)
+            for record in self._text_batch_records(batch)
+        ]
+        self.logger.debug("Extracted %d records from DuckDB table: %s", len(records), table_name)
+        return records
 
-        # Convert JSON strings in 'payload' column to dicts
+    def _text_batch_records(self, batch: TextBatch) -> List[Dict]:
+        """Turn a `TextBatch` into ``{"id", "text", "payload"}`` records, skipping rows without text."""
         records = []
-        for _, row in df.iterrows():
-            payload = json.loads(row["payload"])
-            records.append({
-                "id": row["id"],
-                "text": payload["chunk_text"],
-                "payload": payload
-            })
-        self.logger.debug("Extracted %d records from DuckDB table: %s", len(records), table_name)
+        for rec_id, text, payload in zip(batch.ids, batch.texts, batch.payloads):
+            if text is None:
+                self.logger.warning("Skipping row %s – no text in payload", rec_id)
+                continue
+            records.append({"id": rec_id, "text": text, "payload": json.loads(payload)})
         return records
 
-    def embed_text_chunks(self, duckdb_path: str ='chunks.duckdb', table_name: str = "raw_chunks") -> List[PointStruct]:
+    def embed_text_chunks(self, duckdb_path: str ='chunks.duckdb', table_name: str = "raw_chunks", *,
+                          text_field: str = "chunk_text", batch_size: int = 10_000) -> List[PointStruct]:
         self.logger.info("Embedding text chunks from DuckDB file: %s, table: %s", duckdb_path, table_name)
-        records = self._extract_texts_from_duckdb(duckdb_path, table_name)
-        texts = [record["text"] for record in records]
-
-        self.logger.info("Generating embeddings for %d text chunks", len(texts))
-        response = self.client.embeddings.create(
-            input=texts,
-            model=self.model
-        )
-
-        embeddings = [r.embedding for r in response.data]
-        self.logger.debug("Generated embeddings for all text chunks")
-
         qdrant_points = []
-        for record, vector in zip(records, embeddings):
-            qdrant_points.append(
-                PointStruct(
-                    id=record["id"],
-                    vector=vector,
-                    payload=record["payload"]
+        for batch in iter_text_batches(duckdb_path, table_name, text_field=text_field, batch_size=batch_size):
+            records = self._text_batch_records(batch)
+            if not records:
+                continue
+            self.logger.info("Generating embeddings for %d text chunks", len(records))
+            embeddings = self._embed_texts([record["text"] for record in records])
+            for record, vector in zip(records, embeddings):
+                qdrant_points.append(
+                    PointStruct(
+                        id=record["id"],
+                        vector=vector,
+                        payload=record["payload"]
+                    )
                 )
-            )
 
         self.logger.info("Created %d Qdrant PointStruct objects", len(qdrant_points))
         return qdrant_points
     
-    def embed_json_file(self, json_file_path: str, json_field: str, *, id_field: str = "id") -> List[PointStruct]:
-        """
-        Read a JSON/NDJSON file, extract `json_field` from every item, create embeddings,
-        and return a list of PointStruct objects ready for Qdrant.
-
-        Parameters
-        ----------
-        json_file_path : str
-            Path to the JSON or NDJSON file.
-        json_field : str
-            The field that contains the text to embed (dot-notation allowed).
-        id_field : str, optional
-            Field to use as the point ID (default ``"id"``).
-            If the field is missing, a numeric index is used instead.
-
-        Returns
-        -------
-        List[PointStruct]
-        """
-        self.logger.info("Embedding JSON file '%s' (field=%s)", json_file_path, json_field)
-
-        # ── 1. Load file ─────────────────────────────────────────
-        with open(json_file_path, "r", encoding="utf-8") as f:
-            try:
-                data = json.load(f)                       # ordinary JSON
-            except json.JSONDecodeError:
-                f.seek(0)                                 # NDJSON fallback
-                data = [json.loads(line) for line in f if line.strip()]
-
-        # Uniform iterable
-        if isinstance(data, dict):
-            data = [data]
-
-        # ── 2. Extract texts & build records ────────────────────
-        records = []
-        for idx, item in enumerate(data):
+    def _iter_json_records(self, json_file_path: str, json_field: str, *, id_field: str = "id") -> Iterator[Dict]:
+        """Stream a JSON/NDJSON file as ``{"id", "text", "payload"}`` records, skipping items without `json_field`."""
+        for idx, item in enumerate(iter_json_records(json_file_path)):
             try:
                 text = _dig(item, json_field)
             except KeyError:
@@ -116,27 +157,87 @@ class OpenAIEmbedder:
                 continue
 
             rec_id = item.get(id_field, idx)
-            records.append({"id": rec_id, "text": text, "payload": item})
+            yield {"id": rec_id, "text": text, "payload": item}
 
+    def _load_json_records(self, json_file_path: str, json_field: str, *, id_field: str = "id") -> List[Dict]:
+        """Load a JSON/NDJSON file and return one ``{"id", "text", "payload"}`` record per item carrying `json_field`."""
+        records = list(self._iter_json_records(json_file_path, json_field, id_field=id_field))
         if not records:
             raise ValueError(f"No items contained the field '{json_field}'")
+        return records
 
-        texts = [r["text"] for r in records]
-        self.logger.info("Generating embeddings for %d records", len(texts))
-
-        # ── 3. Call OpenAI embeddings endpoint ──────────────────
-        response = self.client.embeddings.create(input=texts, model=self.model)
-        vectors = [r.embedding for r in response.data]
-
-        # ── 4. Wrap in PointStruct ──────────────────────────────
-        qdrant_points = [
-            PointStruct(id=rec["id"], vector=vec, payload=rec["payload"])
-            for rec, vec in zip(records, vectors)
+    def _record_points(self, record: Dict, pieces: List[Tuple[str, int, int, int]], vectors: List[List[float]], json_field: str, pooled_vector: bool, chunk_all: bool = False) -> List[PointStruct]:
+        """Wrap the embedded pieces of one record in PointStructs (see `embed_json_file`)."""
+        if len(pieces) == 1 and not chunk_all:
+            return [PointStruct(id=record["id"], vector=vectors[0], payload=record["payload"])]
+
+        # Chunks carry the case metadata, but not the embedded text field, which would be copied into every chunk
+        metadata = {k: v for k, v in record["payload"].items() if k != json_field}
+        points = [
+            PointStruct(
+                id=chunk_point_id(record["id"], k),
+                vector=vector,
+                payload={
+                    **metadata,
+                    "point_type": "chunk",
+                    "case_id": record["id"],
+                    "chunk_index": k,
+                    "chunk_count": len(pieces),
+                    "char_start": char_start,
+                    "char_end": char_end,
+                    "token_count": n_tokens,
+                    "chunk_text": piece,
+                },
+            )
+            for k, ((piece, char_start, char_end, n_tokens), vector) in enumerate(zip(pieces, vectors))
         ]
-        self.logger.info("Created %d Qdrant points from JSON file", len(qdrant_points))
-        return qdrant_points
-    
-    def embed_json_file_in_chunks(self,json_file_path: str, json_field: str, *, num_of_chunks: int = 3, id_field: str = "id") -> List[PointStruct]:
+
+        if not pooled_vector:
+            # No pooled point: the first chunk stands for the case in case-level searches and facet counts
+            # (see CASE_FILTER), and keeps the full text (`DocumentStore.offload` files it under the case id)
+            points[0].payload[CASE_POINT_KEY] = True
+            if json_field in record["payload"]:
+                points[0].payload[json_field] = record["payload"][json_field]
+        else:
+            # Token-weighted mean of the chunk vectors, re-normalised to unit length like the API's vectors
+            weights = np.array([n_tokens for *_, n_tokens in pieces], dtype=np.float32)
+            pooled = np.average(np.asarray(vectors, dtype=np.float32), axis=0, weights=weights)
+            pooled /= np.linalg.norm(pooled) or 1.0
+            points.append(PointStruct(
+                id=record["id"],
+                vector=pooled.tolist(),
+                payload={**record["payload"], "point_type": "pooled", "case_id": record["id"], "chunk_count": len(pieces)},
+            ))
+        return points
+
+    async def _aembed_records(self, records: List[Dict], json_field: str, *, split_oversized: bool = False, max_chunk_tokens: int = MAX_INPUT_TOKENS, pooled_vector: bool = True, chunk_all: bool = False, chunk_overlap: int = 0) -> List[PointStruct]:
+        """Embed `records` (as built by `_load_json_records`) and return their points."""
+        if not split_oversized and not chunk_all:
+            texts, token_counts = self._prepare_inputs([r["text"] for r in records], truncate=False)
+            vectors = await self._aembed(texts, token_counts)
+            return [
+                PointStruct(id=rec["id"], vector=vec, payload=rec["payload"])
+                for rec, vec in zip(records, vectors)
+            ]
+
+        # Split every oversized text on token boundaries before any request is made
+        plans = [split_by_tokens(r["text"], max_chunk_tokens, self.model, overlap=chunk_overlap) for r in records]
+        n_split = sum(len(plan) > 1 for plan in plans)
+        if n_split:
+            self.logger.info("Splitting %d oversized record(s) into chunks of at most %d tokens", n_split, max_chunk_tokens)
+
+        texts = [piece for plan in plans for piece, *_ in plan]
+        token_counts = [n_tokens for plan in plans for *_, n_tokens in plan]
+        vectors = await self._aembed(texts, token_counts)
+
+        points: List[PointStruct] = []
+        offset = 0
+        for record, plan in zip(records, plans):
+            points.extend(self._record_points(record, plan, vectors[offset:offset + len(plan)], json_field, pooled_vector, chunk_all))
+            offset += len(plan)
+        return points
+
+    def embed_json_file(self, json_file_path: str, json_field: str, *, id_field: str = "id", split_oversized: bool = False, max_chunk_tokens: int = MAX_INPUT_TOKENS, pooled_vector: bool = True, chunk_all: bool = False, chunk_overlap: int = 0) -> List[PointStruct]:
         """
         Read a JSON/NDJSON file, extract `json_field` from every item, create embeddings,
         and return a list of PointStruct objects ready for Qdrant.
@@ -150,6 +251,26 @@ class OpenAIEmbedder:
         id_field : str, optional
             Field to use as the point ID (default ``"id"``).
             If the field is missing, a numeric index is used instead.
+        split_oversized : bool, optional
+            Count tokens locally and split texts longer than `max_chunk_tokens` on token
+            boundaries before embedding. Each piece becomes its own point with
+            ``point_type="chunk"``, the parent's ``case_id``, its ``chunk_index`` and
+            ``char_start``/``char_end`` offsets into the text. Without it (default),
+            oversized texts are sent whole and the API rejects them.
+        max_chunk_tokens : int, optional
+            Token budget of one piece (default: the model's per-input limit).
+        pooled_vector : bool, optional
+            With `split_oversized`, also emit one ``point_type="pooled"`` point under the
+            record's own id whose vector is the token-weighted mean of its chunks. Without it,
+            the first chunk stands for the case (``case_point=True``) and carries the record's
+            `json_field`.
+        chunk_all : bool, optional
+            Index every record at chunk level, not only oversized ones: each record is split
+            into pieces of at most `max_chunk_tokens` (e.g. 512) and every piece, even the only
+            one of a short record, becomes a ``point_type="chunk"`` point with its ``case_id``
+            and offsets, ready for grouped search (``QdrantQueryRetriever.search_cases_grouped``).
+        chunk_overlap : int, optional
+            Number of tokens shared by consecutive chunks.
 
         Returns
         -------
@@ -157,55 +278,220 @@ class OpenAIEmbedder:
         """
         self.logger.info("Embedding JSON file '%s' (field=%s)", json_file_path, json_field)
 
-        # ── 1. Load file ─────────────────────────────────────────
-        with open(json_file_path, "r", encoding="utf-8") as f:
-            try:
-                data = json.load(f)                       # ordinary JSON
-            except json.JSONDecodeError:
-                f.seek(0)                                 # NDJSON fallback
-                data = [json.loads(line) for line in f if line.strip()]
+        # ── 1-2. Load file, extract texts & build records ──────
+        records = self._load_json_records(json_file_path, json_field, id_field=id_field)
+        self.logger.info("Generating embeddings for %d records", len(records))
 
-        # Uniform iterable
-        if isinstance(data, dict):
-            data = [data]
+        # ── 3-4. Embed and wrap in PointStruct ──────────────────
+        qdrant_points = run_sync(self._aembed_records(
+            records, json_field,
+            split_oversized=split_oversized, max_chunk_tokens=max_chunk_tokens, pooled_vector=pooled_vector,
+            chunk_all=chunk_all, chunk_overlap=chunk_overlap,
+        ))
+        self.logger.info("Created %d Qdrant points from JSON file", len(qdrant_points))
+        return qdrant_points
+    
+    def iter_embed_json_file(self, json_file_path: str, json_field: str, *, id_field: str = "id", batch_size: int = 256, split_oversized: bool = False, max_chunk_tokens: int = MAX_INPUT_TOKENS, pooled_vector: bool = True, chunk_all: bool = False, chunk_overlap: int = 0) -> Iterator[List[PointStruct]]:
+        """
+        Stream a JSON array / NDJSON file and yield its embedded points in bounded batches.
 
-        # ── 2. Extract texts & build records ────────────────────
-        records = []
-        for idx, item in enumerate(data):
+        Records are parsed incrementally and `json_field` is resolved on the fly, so at most
+        `batch_size` records (and their points) are held in memory at a time, however large the file is.
+        Takes the same keyword arguments as `embed_json_file` and, like it, can be called from a thread
+        that already runs an event loop (e.g. a notebook).
+
+        Args:
+            json_file_path (str): Path to the JSON or NDJSON file.
+            json_field (str): The field that contains the text to embed (dot-notation allowed).
+            id_field (str, optional): Field to use as the point ID (default ``"id"``).
+            batch_size (int, optional): Number of records embedded per yielded batch.
+
+        Yields:
+            List[PointStruct]: The points of the next `batch_size` records.
+        """
+        self.logger.info("Streaming JSON file '%s' (field=%s, batch_size=%d)", json_file_path, json_field, batch_size)
+        records = self._iter_json_records(json_file_path, json_field, id_field=id_field)
+
+        # One event loop (and HTTP client) for the whole stream instead of one per batch
+        with SyncRunner() as runner:
+            session = self.engine.session()
+            runner.run(session.__aenter__())
             try:
-                text = _dig(item, json_field)
-            except KeyError:
-                self.logger.warning("Skipping item %d – field '%s' missing", idx, json_field)
-                continue
+                n_records = 0
+                while batch := list(islice(records, batch_size)):
+                    n_records += len(batch)
+                    yield runner.run(self._aembed_records(
+                        batch, json_field,
+                        split_oversized=split_oversized, max_chunk_tokens=max_chunk_tokens, pooled_vector=pooled_vector,
+                        chunk_all=chunk_all, chunk_overlap=chunk_overlap,
+                    ))
+                self.logger.info("Streamed %d records from '%s'", n_records, json_file_path)
+            finally:
+                runner.run(session.__aexit__(None, None, None))
+
+    def embed_json_files(self, json_file_paths: List[str], json_field: str, *, id_field: str = "id", split_oversized: bool = False, max_chunk_tokens: int = MAX_INPUT_TOKENS, pooled_vector: bool = True, chunk_all: bool = False, chunk_overlap: int = 0) -> Dict[str, Union[List[PointStruct], Exception]]:
+        """
+        Embed several JSON/NDJSON files concurrently on one event loop.
 
-            rec_id = item.get(id_field, idx)
-            records.append({"id": rec_id, "text": text, "payload": item})
+        Every file is handled like `embed_json_file` (same keyword arguments), but the requests of all files
+        share the engine's concurrency limit and rate limiters, so network round-trips overlap instead of
+        running back to back.
 
-        if not records:
-            raise ValueError(f"No items contained the field '{json_field}'")
+        Args:
+            json_file_paths (List[str]): Files to embed.
+            json_field (str): The field that contains the text to embed (dot-notation allowed).
+            id_field (str, optional): Field to use as the point ID (default ``"id"``).
+
+        Returns:
+            Dict[str, Union[List[PointStruct], Exception]]: Points per path, or the exception that file raised.
+        """
+        async def _embed_file(path: str) -> List[PointStruct]:
+            records = self._load_json_records(path, json_field, id_field=id_field)
+            return await self._aembed_records(
+                records, json_field,
+                split_oversized=split_oversized, max_chunk_tokens=max_chunk_tokens, pooled_vector=pooled_vector,
+                chunk_all=chunk_all, chunk_overlap=chunk_overlap,
+            )
 
-        texts = []
-        for r in records:
-            text = r["text"]
-            mid = len(text) // num_of_chunks # break text into two halves
-            texts.extend([text[:mid], text[mid:]])
-        self.logger.info("Generating embeddings for %d records", len(texts))
+        async def _embed_all() -> List[Union[List[PointStruct], Exception]]:
+            async with self.engine.session():
+                return await asyncio.gather(*(_embed_file(p) for p in json_file_paths), return_exceptions=True)
 
-        # ── 3. Call OpenAI embeddings endpoint ──────────────────
-        response = self.client.embeddings.create(input=texts, model=self.model)
-        vectors = [r.embedding for r in response.data]
-        
-        # Combine all vectors into one by calculating the mean of each dimension
-        vectors = [np.mean(vectors, axis=0).tolist()]
+        self.logger.info("Embedding %d JSON files concurrently (field=%s)", len(json_file_paths), json_field)
+        return dict(zip(json_file_paths, run_sync(_embed_all())))
 
-        # ── 4. Wrap in PointStruct ──────────────────────────────
-        qdrant_points = [
-            PointStruct(id=rec["id"], vector=vec, payload=rec["payload"])
-            for rec, vec in zip(records, vectors)
-        ]
-        self.logger.info("Created %d Qdrant points from JSON file", len(qdrant_points))
+    def embed_json_files_offline(self, json_file_paths: List[str], json_field: str, *, id_field: str = "id", work_dir: str = "batch_jobs", backend: Optional[BatchBackend] = None, poll_interval: float = 60.0, max_attempts: int = 3, max_chunk_tokens: int = MAX_INPUT_TOKENS, pooled_vector: bool = True, chunk_all: bool = False, chunk_overlap: int = 0, files_per_shard: int = 256, db_path: Optional[str] = None) -> List[PointStruct]:
+        """
+        Embed JSON/NDJSON files through the OpenAI Batch API instead of synchronous requests.
+
+        Collects the shards of `iter_embed_json_files_offline` (same arguments) into one list. For a full
+        corpus, iterate that generator instead, so that only one shard of points is in memory at a time.
+
+        Args:
+            db_path (str, optional): If given, every shard's points are also written to this DuckDB file.
+
+        Returns:
+            List[PointStruct]: Points of every record whose inputs were all embedded.
+        """
+        qdrant_points: List[PointStruct] = []
+        for points in self.iter_embed_json_files_offline(
+            json_file_paths, json_field,
+            id_field=id_field, work_dir=work_dir, backend=backend, poll_interval=poll_interval, max_attempts=max_attempts,
+            max_chunk_tokens=max_chunk_tokens, pooled_vector=pooled_vector, chunk_all=chunk_all, chunk_overlap=chunk_overlap,
+            files_per_shard=files_per_shard,
+        ):
+            if db_path:
+                self.upload_points_to_duckdb(points, db_path=db_path)
+            qdrant_points.extend(points)
         return qdrant_points
-    
+
+    def iter_embed_json_files_offline(self, json_file_paths: List[str], json_field: str, *, id_field: str = "id", work_dir: str = "batch_jobs", backend: Optional[BatchBackend] = None, poll_interval: float = 60.0, max_attempts: int = 3, max_chunk_tokens: int = MAX_INPUT_TOKENS, pooled_vector: bool = True, chunk_all: bool = False, chunk_overlap: int = 0, files_per_shard: int = 256) -> Iterator[List[PointStruct]]:
+        """
+        Embed JSON/NDJSON files through the OpenAI Batch API and yield their points one shard of files at a time.
+
+        Meant for full re-indexes, where answers are not needed right away and the Batch API's higher
+        limits and lower price matter more. Texts are token-counted and split up front like
+        ``embed_json_file(..., split_oversized=True)``; inputs already in `self.cache` are not resubmitted.
+
+        The files are processed in shards of `files_per_shard`. First every shard's remaining inputs are
+        written as JSONL request lines and submitted, and its records are dropped again; only the piece
+        offsets, the submitted ids and the cache hits are kept. Then, shard by shard, the files are re-read,
+        their pieces cut at those offsets (no second tokenization or cache lookup), the batches polled
+        until done and the points yielded. Failed lines alone are resubmitted, up to `max_attempts` times;
+        records that still miss a vector afterwards are logged and left out. Request lines are keyed by record id and piece index, and every shard
+        keeps its request files and batch ids under ``work_dir/shard_<n>``, so an interrupted run
+        resumes polling instead of resubmitting.
+
+        Args:
+            json_file_paths (List[str]): Files to embed.
+            json_field (str): The field that contains the text to embed (dot-notation allowed).
+            id_field (str, optional): Field to use as the point ID (default ``"id"``).
+            work_dir (str, optional): Directory for request files and the batch id state files.
+            backend (BatchBackend, optional): Submit/poll backend; defaults to the OpenAI Batch API.
+            poll_interval (float, optional): Seconds between status polls.
+            max_attempts (int, optional): Submissions per input, counting the first one.
+            max_chunk_tokens (int, optional): Token budget of one piece of a split text.
+            pooled_vector (bool, optional): Also emit a pooled point for split texts.
+            chunk_all (bool, optional): Emit chunk points for every record (see `embed_json_file`).
+            chunk_overlap (int, optional): Number of tokens shared by consecutive chunks.
+            files_per_shard (int, optional): Files whose records are held in memory together.
+
+        Yields:
+            List[PointStruct]: The points of the next shard of files.
+        """
+        shards = [json_file_paths[i:i + files_per_shard] for i in range(0, len(json_file_paths), files_per_shard)]
+        jobs = [
+            BatchEmbeddingJob(
+                backend or OpenAIBatchBackend(self.client),
+                self.model,
+                os.path.join(work_dir, f"shard_{n:05d}"),
+                dimensions=self.dimensions,
+                poll_interval=poll_interval,
+                max_attempts=max_attempts,
+            )
+            for n in range(len(shards))
+        ]
+        self.logger.info("Offline embedding of %d file(s) in %d shard(s)", len(json_file_paths), len(shards))
+
+        def _shard_records(paths: List[str]) -> Iterator[Dict]:
+            return (rec for path in paths for rec in self._iter_json_records(path, json_field, id_field=id_field))
+
+        # Submit every shard before waiting on any, so that their batches run side by side. Only the piece
+        # offsets, the submitted ids and the cache hits of a shard are kept, not its texts
+        shard_plans = []
+        for paths, job in zip(shards, jobs):
+            spans: Dict[Union[int, str], List[Tuple[int, int, int]]] = {}
+            inputs: Dict[str, str] = {}
+            for record in _shard_records(paths):
+                plan = split_by_tokens(record["text"], max_chunk_tokens, self.model, overlap=chunk_overlap)
+                spans[record["id"]] = [(char_start, char_end, n_tokens) for _, char_start, char_end, n_tokens in plan]
+                inputs.update((f"{record['id']}:{k}", piece) for k, (piece, *_) in enumerate(plan))
+            cached: Dict[str, np.ndarray] = {}
+            if self.cache is not None:
+                hits = self.cache.get_many(self.model, self.dimensions, list(inputs.values()))
+                cached = {cid: v for cid, v in zip(inputs, hits) if v is not None}
+            pending = {cid: text for cid, text in inputs.items() if cid not in cached}
+            shard_plans.append((spans, list(pending), cached, job.submit(pending)))
+
+        n_points = n_failed = 0
+        for n, (paths, job) in enumerate(zip(shards, jobs)):
+            (spans, submitted, cached, ids), shard_plans[n] = shard_plans[n], None
+            records = [rec for rec in _shard_records(paths) if rec["id"] in spans]
+            plans = [[(r["text"][char_start:char_end], char_start, char_end, n_tokens) for char_start, char_end, n_tokens in spans[r["id"]]] for r in records]
+            inputs = {f"{r['id']}:{k}": piece for r, plan in zip(records, plans) for k, (piece, *_) in enumerate(plan)}
+            fresh, errors = job.collect(ids, {cid: inputs[cid] for cid in submitted if cid in inputs})
+            if self.cache is not None and fresh:
+                self.cache.put_many(self.model, self.dimensions, [inputs[cid] for cid in fresh], list(fresh.values()))
+            vectors = {cid: v.tolist() for cid, v in cached.items()}
+            vectors.update(fresh)
+
+            qdrant_points: List[PointStruct] = []
+            for record, plan in zip(records, plans):
+                cids = [f"{record['id']}:{k}" for k in range(len(plan))]
+                if any(cid not in vectors for cid in cids):
+                    self.logger.error("Skipping record %s: %s", record["id"], next(errors.get(cid) for cid in cids if cid not in vectors))
+                    continue
+                qdrant_points.extend(self._record_points(record, plan, [vectors[cid] for cid in cids], json_field, pooled_vector, chunk_all))
+            n_points += len(qdrant_points)
+            n_failed += len(errors)
+            yield qdrant_points
+
+        self.logger.info("Created %d Qdrant points offline (%d input(s) failed)", n_points, n_failed)
+
+    def embed_json_file_in_chunks(self,json_file_path: str, json_field: str, *, num_of_chunks: int = 3, id_field: str = "id") -> List[PointStruct]:
+        """
+        Deprecated: use ``embed_json_file(..., split_oversized=True)``.
+
+        Kept for existing callers and now delegates to it, so texts are split on token boundaries and
+        every chunk keeps its own point (plus a pooled point per split record). `num_of_chunks` is ignored.
+        """
+        warnings.warn(
+            "embed_json_file_in_chunks is deprecated; use embed_json_file(..., split_oversized=True)",
+            DeprecationWarning,
+            stacklevel=2,
+        )
+        return self.embed_json_file(json_file_path, json_field, id_field=id_field, split_oversized=True)
+
     def upload_points_to_duckdb(self, qdrant_points: List[PointStruct], db_path: str = "embedded_points.duckdb"):
         """
         Uploads a list of points to a DuckDB database file. Each point is stored with its ID, vector, and payload.
@@ -213,60 +499,167 @@ class OpenAIEmbedder:
         Args:
             qdrant_points (List[PointStruct]): A list of points to be uploaded. Each point should be an instance of 
             `PointStruct` with the following attributes:
-            - id (str): A unique identifier for the point.
+            - id (int): A unique unsigned integer identifier for the point.
             - vector (List[float]): A list of numerical values representing the vector of the point.
             - payload (dict): A dictionary containing additional metadata for the point.
             db_path (str, optional): Path to the DuckDB database file where the points will be stored. Defaults to 
             "embedded_points.duckdb".
 
         Behavior:
-            - Converts the list of `PointStruct` objects into a pandas DataFrame.
+            - Packs the vectors into one float32 matrix and hands it to DuckDB as an Arrow table, so no
+              per-row Python objects are built apart from the payload JSON.
             - Ensures the directory for the database file exists.
-            - Creates a DuckDB table named `embedded_points` if it does not already exist.
-            - Inserts the points into the `embedded_points` table.
+            - Creates the `embedded_points` table (`id UBIGINT PRIMARY KEY, vector FLOAT[N], payload VARCHAR`)
+              if it does not already exist, and migrates a table written by older versions (`DOUBLE[]` vectors,
+              no primary key) in place.
+            - Upserts the points: a point whose id is already stored replaces the stored row. When the same id
+              appears more than once in `qdrant_points`, the last one wins.
             - Logs the number of points saved and the path to the database file.
 
         Raises:
+            ValueError: If the vectors do not all have the same dimension, or if it differs from the
+            dimension of the existing table.
             Exception: If there are issues with file creation, database connection, or data insertion.
 
         Example:
             >>> points = [
-            >>>     PointStruct(id="1", vector=[0.1, 0.2, 0.3], payload={"key": "value"}),
-            >>>     PointStruct(id="2", vector=[0.4, 0.5, 0.6], payload={"key": "another_value"})
+            >>>     PointStruct(id=1, vector=[0.1, 0.2, 0.3], payload={"key": "value"}),
+            >>>     PointStruct(id=2, vector=[0.4, 0.5, 0.6], payload={"key": "another_value"})
             >>> ]
             >>> uploader.upload_points_to_duckdb(points, db_path="data/embedded_points.duckdb")
         """
+        if not qdrant_points:
+            return
         self.logger.info("Uploading points to DuckDB file: %s", db_path)
-        records = []
-        for point in qdrant_points:
-            records.append({
-                "id": point.id,
-                "vector": point.vector,
-                "payload": json.dumps(point.payload)
-            })
 
-        df = pd.DataFrame(records)
+        ids = np.fromiter((p.id for p in qdrant_points), dtype=np.uint64, count=len(qdrant_points))
+        try:
+            vectors = np.asarray([p.vector for p in qdrant_points], dtype=np.float32)
+        except ValueError as exc:
+            raise ValueError("All points must have vectors of the same dimension") from exc
+        payloads = [json.dumps(p.payload) for p in qdrant_points]
+
+        # A single INSERT OR REPLACE must not contain the same key twice: keep the last occurrence
+        _, last_from_end = np.unique(ids[::-1], return_index=True)
+        if len(last_from_end) < len(ids):
+            keep = np.sort(len(ids) - 1 - last_from_end)
+            ids, vectors, payloads = ids[keep], vectors[keep], [payloads[i] for i in keep]
+
+        dim = vectors.shape[1]
+        table = pa.table({
+            "id": pa.array(ids, type=pa.uint64()),
+            "vector": pa.FixedSizeListArray.from_arrays(pa.array(vectors.ravel(), type=pa.float32()), dim),
+            "payload": pa.array(payloads, type=pa.string()),
+        })
 
         # Ensure the output directory exists
         os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
 
-        # Save to DuckDB
         con = duckdb.connect(db_path)
-        con.register("df", df)
-        con.execute("""
-            CREATE TABLE IF NOT EXISTS embedded_points AS SELECT * FROM df
-        """)
-        con.execute("""
-            INSERT INTO embedded_points SELECT * FROM df
+        try:
+            self._ensure_points_table(con, dim)
+            con.register("new_points", table)
+            con.execute("INSERT OR REPLACE INTO embedded_points SELECT id, vector, payload FROM new_points")
+            con.unregister("new_points")
+        finally:
+            con.close()
+        self.logger.info("✅ Saved %d embedded points to DuckDB: %s", len(ids), db_path)
+
+    def _ensure_points_table(self, con: duckdb.DuckDBPyConnection, dim: int) -> None:
+        """Create `embedded_points` with a `FLOAT[dim]` vector column, migrating a legacy table if needed."""
+        row = con.execute("""
+            SELECT data_type FROM information_schema.columns
+            WHERE table_name = 'embedded_points' AND column_name = 'vector'
+        """).fetchone()
+        if row and row[0] == f"FLOAT[{dim}]":
+            return
+        if row and row[0] != "DOUBLE[]":
+            raise ValueError(f"embedded_points stores {row[0]} vectors, cannot add {dim}-dimensional ones")
+
+        con.execute(f"""
+            CREATE TABLE {'embedded_points_v2' if row else 'embedded_points'} (
+                id      UBIGINT PRIMARY KEY,
+                vector  FLOAT[{dim}] NOT NULL,
+                payload VARCHAR
+            )
         """)
-        self.logger.info("✅ Saved %d embedded points to DuckDB: %s", len(qdrant_points), db_path)
-        con.close()
+        if not row:
+            return
+
+        # Legacy table: variable-length DOUBLE[] vectors and possibly duplicated ids (last insert wins)
+        self.logger.info("Migrating embedded_points to FLOAT[%d] vectors", dim)
+        con.execute("BEGIN TRANSACTION")
+        try:
+            con.execute(f"""
+                INSERT INTO embedded_points_v2
+                SELECT DISTINCT ON (id) id::UBIGINT, vector::FLOAT[{dim}], payload
+                FROM (SELECT *, rowid AS _row FROM embedded_points)
+                ORDER BY id, _row DESC
+            """)
+            con.execute("DROP TABLE embedded_points")
+            con.execute("ALTER TABLE embedded_points_v2 RENAME TO embedded_points")
+            con.execute("COMMIT")
+        except Exception:
+            con.execute("ROLLBACK")
+            raise
+
+    def delete_points_from_duckdb(self, point_ids: List[int], db_path: str = "embedded_points.duckdb") -> int:
+        """
+        Delete the points with the given ids from the `embedded_points` table of a DuckDB file.
+
+        Args:
+            point_ids (List[int]): Ids of the points to delete.
+            db_path (str, optional): Path to the DuckDB database file. Defaults to "embedded_points.duckdb".
+
+        Returns:
+            int: Number of rows deleted (0 if the table does not exist yet).
+        """
+        if not point_ids or not os.path.exists(db_path):
+            return 0
+        con = duckdb.connect(db_path)
+        try:
+            if not con.execute("SELECT 1 FROM information_schema.tables WHERE table_name = 'embedded_points'").fetchone():
+                return 0
+            deleted = con.execute(
+                "DELETE FROM embedded_points WHERE id IN (SELECT UNNEST(?::UBIGINT[]))", [list(point_ids)]
+            ).fetchone()[0]
+        finally:
+            con.close()
+        self.logger.info("Deleted %d points from DuckDB: %s", deleted, db_path)
+        return deleted
+
+    def ensure_qdrant_collection(self, collection_name: str, vector_size: int, client: Optional[QdrantClient] = None,
+                                 spec: Optional[CollectionSpec] = None) -> None:
+        """
+        Create the Qdrant collection if it does not exist yet, or bring its settings up to date.
+
+        The collection is provisioned from `spec`, or from its entry in config/qdrant_collections.yaml
+        (quantization, on-disk vectors, HNSW/optimizer settings, payload indexes). Running it against an
+        already provisioned collection changes nothing.
+
+        Args:
+            collection_name (str): The name of the Qdrant collection.
+            vector_size (int): Dimension of the vectors stored in the collection.
+            client (QdrantClient, optional): Client to use; defaults to the shared `qdrant_client`.
+            spec (CollectionSpec, optional): Explicit collection spec; overrides the YAML file.
+        """
+        client = client or self.qdrant_client
+        apply_collection_spec(client, spec or collection_spec(collection_name, vector_size))
+
+    def _collection_spec(self, collection_name: str, vector_size: int) -> CollectionSpec:
+        """`collection_spec` of `collection_name`, read once per embedder (upload workers call this per batch)."""
+        key = (collection_name, vector_size)
+        if key not in self._specs:
+            self._specs[key] = collection_spec(collection_name, vector_size)
+        return self._specs[key]
 
     def upload_points_to_qdrant(
         self,
         qdrant_points: List[PointStruct],
         collection_name: str,
-        qdrant_host: str = QDRANT_CLIENT_URL  # use your actual URL here
+        qdrant_host: str = QDRANT_CLIENT_URL,  # use your actual URL here
+        *,
+        ensure_collection: bool = True,
     ):
         """
         Uploads a point to Qdrant, creating the collection if it does not exist.
@@ -274,35 +667,20 @@ class OpenAIEmbedder:
             qdrant_points (List[PointStruct]): A list of points to be uploaded.
             collection_name (str): The name of the Qdrant collection to upload to.
             qdrant_host (str): The URL of the Qdrant server. Defaults to QDRANT_CLIENT_URL from config.  
+            ensure_collection (bool): Check for (and create) the collection first. Callers that upload
+                many batches should ensure it once up front and pass False.
         """
-        self.logger.info("Connecting to Qdrant at %s", qdrant_host)
-
-        client = QdrantClient(
-            url=self.qdrant_client_url,
-            api_key=self.qdrant_api_key
-        )
+        client = self.qdrant_client
+        # Points carry the full embedding; a two-tier collection also stores its truncated search vector
+        spec = self._collection_spec(collection_name, len(qdrant_points[0].vector))
 
-        # Ensure collection exists (handle 404 if it doesn't)
-        try:
-            client.get_collection(collection_name)
-            self.logger.info("Collection '%s' already exists.", collection_name)
-        except UnexpectedResponse as e:
-            if "404" in str(e):
-                self.logger.info("Collection '%s' does not exist. Creating it.", collection_name)
-                client.recreate_collection(
-                    collection_name=collection_name,
-                    vectors_config=VectorParams(
-                        size=len(qdrant_points[0].vector),
-                        distance="Cosine"
-                    )
-                )
-            else:
-                raise
+        if ensure_collection:
+            self.ensure_qdrant_collection(collection_name, spec.vector_size, client=client, spec=spec)
 
         # Upload points
         client.upsert(
             collection_name=collection_name,
-            points=qdrant_points
+            points=spec.to_collection_points(qdrant_points)
         )
 
         self.logger.info("✅ Uploaded %d points to collection '%s'.", len(qdrant_points), collection_name)
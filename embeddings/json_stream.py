@@ -0,0 +1,98 @@
+# json_stream.py
+
+import json
+from typing import Any, Iterator
+
+_DECODER = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+
+
+def iter_json_records(json_file_path: str, *, read_size: int = 1 << 16) -> Iterator[Any]:
+    """
+    Stream the records of a JSON or NDJSON file without loading the whole file.
+
+    Handles the three layouts produced by our exporters:
+
+    * a top-level JSON array – every element is yielded in turn,
+    * NDJSON / concatenated JSON values – every value is yielded in turn,
+    * a single JSON object – yielded once.
+
+    The file is read in `read_size` blocks and values are decoded incrementally with
+    ``json.JSONDecoder.raw_decode``, so memory is bounded by the largest single record
+    rather than by the file size.
+
+    Raises:
+        json.JSONDecodeError: If the file is not valid JSON / NDJSON.
+    """
+    with open(json_file_path, "r", encoding="utf-8") as f:
+        buf = ""
+        pos = 0
+        eof = False
+
+        def _fill(min_chars: int) -> bool:
+            """Read more data; return False once the file is exhausted."""
+            nonlocal buf, pos, eof
+            if eof:
+                return False
+            chunk = f.read(max(read_size, min_chars))
+            if not chunk:
+                eof = True
+                return False
+            buf = buf[pos:] + chunk
+            pos = 0
+            return True
+
+        def _skip(chars: str) -> bool:
+            """Advance past `chars`; return False at end of file."""
+            nonlocal pos
+            while True:
+                while pos < len(buf) and buf[pos] in chars:
+                    pos += 1
+                if pos < len(buf):
+                    return True
+                if not _fill(read_size):
+                    return False
+
+        def _decode() -> Any:
+            """Decode the value starting at `pos`, reading more data until it is complete."""
+            nonlocal pos
+            want = read_size
+            while True:
+                try:
+                    value, end = _DECODER.raw_decode(buf, pos)
+                    # A value touching the end of the buffer (e.g. a number) may continue in the next block
+                    if end < len(buf) or eof:
+                        pos = end
+                        return value
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                # Grow geometrically so that huge records are not re-parsed once per block
+                _fill(want)
+                want *= 2
+
+        if not _skip(_WHITESPACE):
+            return
+
+        if buf[pos] == "[":
+            pos += 1
+            if not _skip(_WHITESPACE):
+                raise json.JSONDecodeError("Unterminated JSON array", buf, pos)
+            if buf[pos] == "]":
+                return
+            while True:
+                if buf[pos] in ",]":
+                    raise json.JSONDecodeError("Expecting value", buf, pos)
+                yield _decode()
+                if not _skip(_WHITESPACE):
+                    raise json.JSONDecodeError("Unterminated JSON array", buf, pos)
+                if buf[pos] == "]":
+                    return
+                if buf[pos] != ",":
+                    raise json.JSONDecodeError("Expecting ',' delimiter", buf, pos)
+                pos += 1
+                if not _skip(_WHITESPACE):
+                    raise json.JSONDecodeError("Unterminated JSON array", buf, pos)
+
+        while _skip(_WHITESPACE):
+            yield _decode()
@@ -0,0 +1,569 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import json
+import logging
+import threading
+from collections import Counter
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import duckdb
+import numpy as np
+from qdrant_client.http.models import GroupsResult, PointGroup, QueryResponse, ScoredPoint
+from langchain_openai import OpenAIEmbeddings
+from config.config_env import OPENAI_API_KEY
+from embeddings.document_store import DocumentStore
+from embeddings.duckdb_reader import iter_point_batches, source_sql
+from embeddings.query_cache import QueryEmbeddingCache
+from embeddings.query_classifier import (EXACT_MATCH_SCORE, QueryClass, canonical_case_number, canonical_citation,
+                                         classify_query, pin_exact_matches)
+from embeddings.retriever import DEFAULT_PAYLOAD_FIELDS, PASSAGE_PAYLOAD_FIELDS
+from embeddings.search_filters import CASE_POINT_KEY, SearchFilters
+
+_ASSIGN_CHUNK_ROWS = 65_536
+_MAX_CACHED_MASKS = 32
+# SQL twin of CASE_FILTER: unsplit and pooled points, and the chunk standing for a case without a pooled point
+_CASE_LEVEL_SQL = (
+    "(coalesce(json_extract_string(payload, '$.point_type'), '') <> 'chunk' "
+    f"OR json_extract_string(payload, '$.{CASE_POINT_KEY}') = 'true')"
+)
+
+
+def _normalise_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the `k` highest scores, best first."""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    idx = np.argpartition(-scores, k - 1)[:k]
+    return idx[np.argsort(-scores[idx], kind="stable")]
+
+
+class IVFIndex:
+    """
+    Inverted-file index over unit vectors for approximate top-k on large corpora.
+
+    Rows are clustered with spherical k-means into `n_lists` lists. A query is scored against the
+    centroids, and only the rows of the `n_probe` closest lists are scored exactly; raising
+    `n_probe` trades speed for recall.
+
+    Attributes:
+        centroids (np.ndarray): ``(n_lists, dim)`` unit centroids.
+        order (np.ndarray): Row numbers sorted by list.
+        offsets (np.ndarray): ``order[offsets[i]:offsets[i + 1]]`` are the rows of list ``i``.
+    """
+
+    def __init__(self, centroids: np.ndarray, order: np.ndarray, offsets: np.ndarray):
+        self.centroids = centroids
+        self.order = order
+        self.offsets = offsets
+
+    @classmethod
+    def build(
+        cls,
+        matrix: np.ndarray,
+        n_lists: Optional[int] = None,
+        *,
+        sample_size: int = 100_000,
+        iterations: int = 10,
+        seed: int = 0,
+    ) -> "IVFIndex":
+        """
+        Cluster the unit rows of `matrix`.
+
+        Args:
+            matrix: ``(n, dim)`` float32 matrix of unit vectors.
+            n_lists: Number of lists; defaults to ``sqrt(n)``.
+            sample_size: Rows the centroids are trained on.
+            iterations: k-means iterations.
+            seed: Seed for the sample and the initial centroids.
+        """
+        n = len(matrix)
+        n_lists = max(1, min(n_lists or int(np.sqrt(n)), n))
+        rng = np.random.default_rng(seed)
+        sample = np.asarray(matrix[np.sort(rng.choice(n, min(n, max(sample_size, n_lists)), replace=False))])
+        centroids = sample[rng.choice(len(sample), n_lists, replace=False)].copy()
+        for _ in range(iterations):
+            assign = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, sample)
+            filled = np.bincount(assign, minlength=n_lists) > 0
+            centroids[filled] = _normalise_rows(sums[filled])   # empty lists keep their previous centroid
+
+        assign = np.empty(n, dtype=np.int32)
+        for start in range(0, n, _ASSIGN_CHUNK_ROWS):
+            chunk = np.asarray(matrix[start:start + _ASSIGN_CHUNK_ROWS])
+            assign[start:start + len(chunk)] = np.argmax(chunk @ centroids.T, axis=1)
+        order = np.argsort(assign, kind="stable")
+        offsets = np.searchsorted(assign[order], np.arange(n_lists + 1))
+        return cls(centroids, order, offsets)
+
+    def candidates(self, query: np.ndarray, n_probe: int) -> np.ndarray:
+        """Row numbers in the `n_probe` lists whose centroids are closest to `query`."""
+        lists = _top_k(self.centroids @ query, n_probe)
+        return np.concatenate([self.order[self.offsets[i]:self.offsets[i + 1]] for i in lists])
+
+    def save(self, path: str) -> None:
+        np.savez(path, centroids=self.centroids, order=self.order, offsets=self.offsets)
+
+    @classmethod
+    def load(cls, path: str) -> "IVFIndex":
+        data = np.load(path)
+        return cls(data["centroids"], data["order"], data["offsets"])
+
+
+class LocalVectorRetriever:
+    """
+    In-process drop-in for `QdrantQueryRetriever`, searching the DuckDB point store directly.
+
+    Useful for development, CI and offline use: no Qdrant cluster is needed, only the
+    `embedded_points` table written by `OpenAIEmbedder.upload_points_to_duckdb`.
+
+    All vectors are held in one contiguous, unit-normalised float32 matrix, so a query is a single
+    BLAS matrix-vector product (cosine similarity) followed by a partial sort. With `cache_dir` the
+    matrix is written once as ``.npy`` and memory-mapped afterwards, so start-up is instant and the
+    OS page cache is shared between processes. For large corpora, ``index="ivf"`` scores only the
+    closest clusters (see `IVFIndex`).
+
+    Only the ids and vectors live in memory; payloads of the hits are read from DuckDB per query.
+
+    Attributes:
+        collection_name (str): Name reported for compatibility with `QdrantQueryRetriever`.
+        ids (np.ndarray): Point id per matrix row.
+        matrix (np.ndarray): ``(n, dim)`` unit vectors, possibly memory-mapped.
+        index (IVFIndex | None): Approximate index, if enabled.
+        payload_fields (List[str] | None): Payload fields returned with every hit; None returns the whole payload.
+        document_store (DocumentStore | None): Local store of the large payload fields, see `fetch_full_texts`.
+        query_cache (QueryEmbeddingCache | None): Cache of query embeddings; repeated queries skip the API call.
+        exact_lookup (bool): Answer neutral citations / case numbers in the query from a hash index, like
+            `QdrantQueryRetriever.similarity_search_by_query_with_dense_vector`.
+    """
+
+    def __init__(
+        self,
+        *,
+        duckdb_path: str = "embedded_points.duckdb",
+        table_name: str = "embedded_points",
+        collection_name: str = "commonlii_cases",
+        openai_api_key: str | None = OPENAI_API_KEY,
+        embedding_model: str = "text-embedding-3-small",
+        payload_fields: Sequence[str] | None = DEFAULT_PAYLOAD_FIELDS,
+        document_store: DocumentStore | None = None,
+        cache_dir: str | None = None,
+        index: str | None = None,
+        n_lists: int | None = None,
+        n_probe: int = 16,
+        embeddings: Any | None = None,
+        query_cache: QueryEmbeddingCache | None = None,
+        exact_lookup: bool = True,
+    ) -> None:
+        """
+        Loads the vectors of `table_name` and prepares the search.
+
+        Args:
+            duckdb_path (str, optional): DuckDB point store to search.
+            table_name (str, optional): Table with ``id``, ``vector`` and ``payload`` columns.
+            collection_name (str, optional): Collection the points belong to (informational).
+            openai_api_key (str, optional): API key for accessing OpenAI's embedding model.
+            embedding_model (str, optional): Identifier of the OpenAI embedding model; must match the stored vectors.
+            payload_fields (Sequence[str], optional): Payload fields to return with each hit; None returns the whole payload.
+            document_store (DocumentStore, optional): Store holding `full_text` and other offloaded fields.
+            cache_dir (str, optional): Directory for the memory-mapped ``.npy`` matrix (and IVF index); rebuilt
+                when the DuckDB file is newer. None keeps everything in RAM.
+            index (str, optional): ``"ivf"`` for approximate search, None for exact search.
+            n_lists (int, optional): Number of IVF lists; defaults to ``sqrt(n)``.
+            n_probe (int, optional): IVF lists scanned per query.
+            embeddings (optional): Query embedder to use instead of OpenAI (see `QdrantQueryRetriever`).
+            query_cache (QueryEmbeddingCache, optional): Cache of query embeddings (see `embeddings.query_cache`).
+            exact_lookup (bool, optional): Look citations and case numbers in queries up exactly. Defaults to True.
+        """
+        if index not in (None, "ivf"):
+            raise ValueError(f"index must be None or 'ivf', got {index!r}")
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.duckdb_path = duckdb_path
+        self.table_name = table_name
+        self.collection_name = collection_name
+        self.payload_fields = list(payload_fields) if payload_fields is not None else None
+        self.document_store = document_store
+        self.embedding_model = embedding_model
+        self.query_cache = query_cache
+        self.exact_lookup = exact_lookup
+        self.n_probe = n_probe
+
+        self._lock = threading.Lock()
+        self._con = duckdb.connect(duckdb_path, read_only=True)
+
+        self.ids, self.matrix = self._load_vectors(cache_dir)
+        self.index = self._load_index(cache_dir, n_lists) if index == "ivf" and len(self.ids) else None
+        self._case_ids: Optional[np.ndarray] = None   # loaded on the first grouped search
+        self._case_rows: Optional[np.ndarray] = None   # case-level rows, loaded on the first flat search
+        self._exact_index: Optional[Dict[str, List[int]]] = None   # loaded on the first citation / case number query
+        self._masks: Dict[SearchFilters, np.ndarray] = {}   # row masks of recently used filters
+        self.logger.info("Loaded %d vectors of dim %d from %s:%s%s", len(self.ids), self.matrix.shape[1],
+                         duckdb_path, table_name, " (IVF)" if self.index else "")
+
+        self.embeddings = embeddings or OpenAIEmbeddings(
+            model=embedding_model,
+            openai_api_key=openai_api_key,
+        )
+
+    # ------------------------------------------------------------------ loading
+
+    def _cache_path(self, cache_dir: str, suffix: str) -> str:
+        stem = os.path.splitext(os.path.basename(self.duckdb_path))[0]
+        return os.path.join(cache_dir, f"{stem}.{self.table_name}.{suffix}")
+
+    def _is_fresh(self, path: str) -> bool:
+        return os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(self.duckdb_path)
+
+    def _load_vectors(self, cache_dir: Optional[str]) -> Tuple[np.ndarray, np.ndarray]:
+        if cache_dir:
+            ids_path, vectors_path = self._cache_path(cache_dir, "ids.npy"), self._cache_path(cache_dir, "vectors.npy")
+            if not (self._is_fresh(ids_path) and self._is_fresh(vectors_path)):
+                self._write_cache(ids_path, vectors_path)
+            return np.load(ids_path), np.load(vectors_path, mmap_mode="r")
+
+        ids, blocks = [], []
+        for batch in iter_point_batches(self.duckdb_path, self.table_name, read_only=True):
+            ids.append(batch.ids)
+            blocks.append(_normalise_rows(batch.vectors))
+        if not blocks:
+            return np.empty(0, dtype=np.uint64), np.empty((0, 0), dtype=np.float32)
+        return np.concatenate(ids), np.ascontiguousarray(np.vstack(blocks), dtype=np.float32)
+
+    def _write_cache(self, ids_path: str, vectors_path: str) -> None:
+        """Stream the table into ``.npy`` files without holding the whole matrix in RAM."""
+        os.makedirs(os.path.dirname(vectors_path) or ".", exist_ok=True)
+        with self._lock:
+            n, dim = self._con.execute(
+                f"SELECT COUNT(*), COALESCE(MAX(len(vector)), 0) FROM {source_sql(self.table_name)}"
+            ).fetchone()
+        tmp_vectors, tmp_ids = vectors_path + ".tmp", ids_path + ".tmp"
+        vectors = np.lib.format.open_memmap(tmp_vectors, mode="w+", dtype=np.float32, shape=(n, dim))
+        ids = np.empty(n, dtype=np.uint64)
+        row = 0
+        for batch in iter_point_batches(self.duckdb_path, self.table_name, read_only=True):
+            vectors[row:row + len(batch.ids)] = _normalise_rows(batch.vectors)
+            ids[row:row + len(batch.ids)] = batch.ids
+            row += len(batch.ids)
+        vectors.flush()
+        del vectors
+        with open(tmp_ids, "wb") as f:
+            np.save(f, ids[:row])
+        os.replace(tmp_vectors, vectors_path)
+        os.replace(tmp_ids, ids_path)
+        self.logger.info("Cached %d vectors to %s", row, vectors_path)
+
+    def _load_index(self, cache_dir: Optional[str], n_lists: Optional[int]) -> IVFIndex:
+        path = self._cache_path(cache_dir, f"ivf{n_lists or 'auto'}.npz") if cache_dir else None
+        if path and self._is_fresh(path):
+            return IVFIndex.load(path)
+        index = IVFIndex.build(self.matrix, n_lists)
+        if path:
+            index.save(path)
+        return index
+
+    # ------------------------------------------------------------------ search
+
+    def embed_query(self, query: str) -> List[float]:
+        """
+        Returns the raw embedding vector, from `query_cache` when the query was embedded before.
+        """
+        if self.query_cache is None:
+            return self.embeddings.embed_query(query)
+        return self.query_cache.get_or_embed(self.embedding_model, None, query, self.embeddings.embed_query)
+
+    def search_by_vector(
+        self,
+        vector: Sequence[float],
+        limit: int = 10,
+        with_payload: bool | Sequence[str] | None = None,
+        filters: SearchFilters | None = None,
+        case_level: bool = True,
+    ) -> QueryResponse:
+        """
+        Top-`limit` points by cosine similarity to `vector`, among the points passing `filters`.
+
+        With filters, only the matching rows are scored (the IVF candidates that match, or every
+        matching row when the filter leaves fewer candidates than `limit`). With `case_level` (the
+        default), only case-level points are scored, so a case indexed as chunks is listed once.
+
+        Returns:
+            QueryResponse: Hits as `ScoredPoint`s, best first, like `QdrantClient.query_points`.
+        """
+        query = np.asarray(vector, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1.0)
+        mask = self._filter_mask(filters)
+        case_rows = self._case_level_rows() if case_level else None
+        if case_rows is not None:
+            mask = case_rows if mask is None else mask & case_rows
+        rows = None
+        if self.index is not None:
+            rows = self.index.candidates(query, self.n_probe)
+            if mask is not None:
+                rows = rows[mask[rows]]
+                if len(rows) < limit:
+                    rows = np.flatnonzero(mask)
+        elif mask is not None:
+            rows = np.flatnonzero(mask)
+
+        if rows is not None:
+            scores = self.matrix[rows] @ query
+            top = _top_k(scores, limit)
+            best, best_scores = rows[top], scores[top]
+        else:
+            scores = self.matrix @ query
+            best = _top_k(scores, limit)
+            best_scores = scores[best]
+
+        hit_ids = [int(pid) for pid in self.ids[best]]
+        payloads = self._payloads(hit_ids, self._with_payload(with_payload))
+        return QueryResponse(points=[
+            ScoredPoint(id=pid, version=0, score=float(score), payload=payloads.get(pid))
+            for pid, score in zip(hit_ids, best_scores)
+        ])
+
+    def similarity_search_by_query_with_dense_vector(
+        self,
+        query: str,
+        limit: int = 10,
+        with_payload: bool | Sequence[str] | None = None,
+        filters: SearchFilters | None = None,
+        case_level: bool = True,
+    ) -> QueryResponse:
+        """
+        Performs a similarity search over the local vectors using the query's embedding vector.
+
+        Citations and case numbers in the query are answered from a hash index first, as in
+        `QdrantQueryRetriever.similarity_search_by_query_with_dense_vector`.
+
+        Args:
+            query (str): Natural language query to embed and search with.
+            limit (int, optional): Number of top similar results to retrieve. Defaults to 10.
+            with_payload (bool | Sequence[str], optional): Payload to return with each hit; defaults to
+                `payload_fields`. Use `fetch_full_texts` for the judgment texts.
+            filters (SearchFilters, optional): Court, decision date and people filters (`SearchFilters.matches`).
+            case_level (bool, optional): Search case-level points only (see `search_by_vector`).
+
+        Returns:
+            QueryResponse: Same shape as the Qdrant response.
+            QueryResponse.points: List of points (documents) that match the query.
+        """
+        query_class = classify_query(query) if self.exact_lookup else QueryClass(remainder=query)
+        exact = self.exact_matches(query_class, limit, with_payload, filters) if query_class.exact else []
+        if exact and query_class.exact_only:
+            return QueryResponse(points=exact)
+
+        response = self.search_by_vector(self.embed_query(query_class.remainder if exact else query), limit=limit,
+                                         with_payload=with_payload, filters=filters, case_level=case_level)
+        return QueryResponse(points=pin_exact_matches(exact, response.points, limit)) if exact else response
+
+    def exact_matches(
+        self,
+        query_class: QueryClass,
+        limit: int = 10,
+        with_payload: bool | Sequence[str] | None = None,
+        filters: SearchFilters | None = None,
+    ) -> List[ScoredPoint]:
+        """
+        Case points whose ``neutral_citation`` or ``case_number`` is in `query_class` (and that pass
+        `filters`), from the hash index.
+
+        Returns:
+            List[ScoredPoint]: The matches, scored `EXACT_MATCH_SCORE`.
+        """
+        index = self._identifier_index()
+        keys = [f"citation:{c}" for c in query_class.citations] + [f"case_number:{n}" for n in query_class.case_numbers]
+        hit_ids = list(dict.fromkeys(pid for key in keys for pid in index.get(key, ())))
+        if filters is not None and not filters.is_empty:
+            fields = self._payloads(hit_ids, filters.payload_fields())
+            hit_ids = [pid for pid in hit_ids if filters.matches(fields.get(pid, {}))]
+        hit_ids = hit_ids[:limit]
+        payloads = self._payloads(hit_ids, self._with_payload(with_payload))
+        return [ScoredPoint(id=pid, version=0, score=EXACT_MATCH_SCORE, payload=payloads.get(pid)) for pid in hit_ids]
+
+    def search_cases_grouped(
+        self,
+        query: str,
+        limit: int = 10,
+        group_size: int = 3,
+        with_payload: bool | Sequence[str] | None = None,
+        filters: SearchFilters | None = None,
+    ) -> GroupsResult:
+        """
+        Best `limit` distinct cases with their best `group_size` passages, like `QdrantQueryRetriever.search_cases_grouped`.
+
+        Chunk points are always scored exactly (the IVF index is not used); the candidate list is
+        widened until enough distinct cases are found.
+        """
+        if with_payload is None and self.payload_fields is not None:
+            with_payload = self.payload_fields + [f for f in PASSAGE_PAYLOAD_FIELDS if f not in self.payload_fields]
+        vector = np.asarray(self.embed_query(query), dtype=np.float32)
+        vector = vector / (np.linalg.norm(vector) or 1.0)
+
+        case_ids = self._chunk_case_ids()
+        selectable = case_ids >= 0
+        mask = self._filter_mask(filters)
+        if mask is not None:
+            selectable &= mask
+        scores = np.where(selectable, self.matrix @ vector, -np.inf)
+        n_chunks = int(selectable.sum())
+        n_candidates = min(n_chunks, limit * group_size * 4)
+        while True:
+            # Distinct cases in order of their best passage
+            cases = list(dict.fromkeys(int(case_ids[row]) for row in _top_k(scores, n_candidates)))
+            if len(cases) >= limit or n_candidates >= n_chunks:
+                break
+            n_candidates = min(n_chunks, n_candidates * 4)
+
+        best = []
+        for case_id in cases[:limit]:
+            rows = np.flatnonzero((case_ids == case_id) & selectable)
+            best.append((case_id, rows[_top_k(scores[rows], group_size)]))
+        payloads = self._payloads([int(self.ids[row]) for _, rows in best for row in rows], self._with_payload(with_payload))
+        return GroupsResult(groups=[
+            PointGroup(id=case_id, hits=[
+                ScoredPoint(id=int(self.ids[row]), version=0, score=float(scores[row]), payload=payloads.get(int(self.ids[row])))
+                for row in rows
+            ])
+            for case_id, rows in best
+        ])
+
+    def facet_counts(
+        self,
+        fields: Sequence[str] = ("court",),
+        filters: SearchFilters | None = None,
+        limit: int = 50,
+        exact: bool = True,
+    ) -> Dict[str, Dict[Any, int]]:
+        """
+        Number of cases per value of each of `fields` among the cases passing `filters`, like
+        `QdrantQueryRetriever.facet_counts` (counts here are always exact).
+        """
+        mask = self._filter_mask(filters)
+        with self._lock:
+            rows = self._con.execute(
+                f"SELECT id, {', '.join(['json_extract_string(payload, ?)'] * len(fields))} "
+                f"FROM {source_sql(self.table_name)} WHERE {_CASE_LEVEL_SQL}",
+                [f"$.{f}" for f in fields],
+            ).fetchall()
+        if mask is not None:
+            kept = set(self.ids[mask].tolist())
+            rows = [row for row in rows if row[0] in kept]
+        counts = {}
+        for i, key in enumerate(fields, start=1):
+            counter = Counter(row[i] for row in rows if row[i] is not None)
+            counts[key] = dict(counter.most_common(limit))
+        return counts
+
+    def _filter_mask(self, filters: SearchFilters | None) -> Optional[np.ndarray]:
+        """Boolean mask of the matrix rows passing `filters`; None when there is nothing to filter on."""
+        if filters is None or filters.is_empty:
+            return None
+        if not isinstance(filters, SearchFilters):
+            raise TypeError(f"LocalVectorRetriever filters must be SearchFilters, got {type(filters).__name__}")
+        mask = self._masks.get(filters)
+        if mask is None:
+            fields = filters.payload_fields()
+            with self._lock:
+                rows = self._con.execute(
+                    f"SELECT id, {', '.join(['json_extract_string(payload, ?)'] * len(fields))} "
+                    f"FROM {source_sql(self.table_name)}",
+                    [f"$.{f}" for f in fields],
+                ).fetchall()
+            kept = {row[0] for row in rows if filters.matches(dict(zip(fields, row[1:])))}
+            mask = np.fromiter((pid in kept for pid in self.ids.tolist()), dtype=bool, count=len(self.ids))
+            if len(self._masks) >= _MAX_CACHED_MASKS:
+                self._masks.clear()
+            self._masks[filters] = mask
+        return mask
+
+    def _chunk_case_ids(self) -> np.ndarray:
+        """``case_id`` of every matrix row that is a chunk point, -1 for the others."""
+        if self._case_ids is None:
+            with self._lock:
+                rows = self._con.execute(
+                    f"SELECT id, TRY_CAST(json_extract_string(payload, '$.case_id') AS BIGINT) FROM {source_sql(self.table_name)} "
+                    "WHERE json_extract_string(payload, '$.point_type') = 'chunk'"
+                ).fetchall()
+            case_of = {pid: case_id for pid, case_id in rows if case_id is not None}
+            self._case_ids = np.fromiter((case_of.get(pid, -1) for pid in self.ids.tolist()), dtype=np.int64, count=len(self.ids))
+        return self._case_ids
+
+    def _case_level_rows(self) -> Optional[np.ndarray]:
+        """Mask of the case-level matrix rows (see `_CASE_LEVEL_SQL`); None when every row is case-level."""
+        if self._case_rows is None:
+            with self._lock:
+                other = self._con.execute(
+                    f"SELECT id FROM {source_sql(self.table_name)} WHERE NOT {_CASE_LEVEL_SQL}"
+                ).fetchall()
+            other_ids = {pid for (pid,) in other}
+            case_rows = np.fromiter((pid not in other_ids for pid in self.ids.tolist()), dtype=bool, count=len(self.ids))
+            self._case_rows = np.empty(0, dtype=bool) if case_rows.all() else case_rows
+        return self._case_rows if len(self._case_rows) else None
+
+    def _identifier_index(self) -> Dict[str, List[int]]:
+        """Case point ids (chunks excluded) by canonical ``citation:...`` and ``case_number:...`` key."""
+        if self._exact_index is None:
+            with self._lock:
+                rows = self._con.execute(
+                    f"SELECT id, json_extract_string(payload, '$.neutral_citation'), json_extract_string(payload, '$.case_number') "
+                    f"FROM {source_sql(self.table_name)} WHERE {_CASE_LEVEL_SQL} "
+                    "  AND (json_extract_string(payload, '$.neutral_citation') IS NOT NULL "
+                    "       OR json_extract_string(payload, '$.case_number') IS NOT NULL)"
+                ).fetchall()
+            index: Dict[str, List[int]] = {}
+            for pid, citation, case_number in rows:
+                # Stored values go through the same canonicalisation as queries, so spacing and case do not matter
+                keys = (("citation", citation and canonical_citation(citation)),
+                        ("case_number", case_number and canonical_case_number(case_number)))
+                for kind, key in keys:
+                    if key:
+                        index.setdefault(f"{kind}:{key}", []).append(pid)
+            self._exact_index = index
+        return self._exact_index
+
+    def _with_payload(self, with_payload: bool | Sequence[str] | None) -> bool | List[str]:
+        if with_payload is None:
+            return self.payload_fields if self.payload_fields is not None else True
+        return with_payload if isinstance(with_payload, bool) else list(with_payload)
+
+    def _payloads(self, point_ids: Sequence[int], with_payload: bool | List[str]) -> Dict[int, Dict[str, Any]]:
+        if not point_ids or with_payload is False:
+            return {}
+        with self._lock:
+            rows = self._con.execute(
+                f"SELECT id, payload FROM {source_sql(self.table_name)} WHERE id IN (SELECT UNNEST(?::UBIGINT[]))",
+                [list(point_ids)],
+            ).fetchall()
+        payloads = {pid: json.loads(payload) if payload else {} for pid, payload in rows}
+        if with_payload is not True:
+            payloads = {pid: {k: p[k] for k in with_payload if k in p} for pid, p in payloads.items()}
+        return payloads
+
+    def fetch_full_texts(self, point_ids: Sequence[int], field: str = "full_text") -> Dict[int, str]:
+        """
+        Fetch `field` (by default the judgment text) for `point_ids`.
+
+        Texts are read from `document_store` first, then from the payloads in DuckDB.
+
+        Returns:
+            Dict[int, str]: Text per point id; ids with no such field are left out.
+        """
+        texts = self.document_store.get_many(point_ids, field) if self.document_store else {}
+        missing = [pid for pid in point_ids if pid not in texts]
+        for pid, payload in self._payloads(missing, [field]).items():
+            if isinstance(payload.get(field), str):
+                texts[pid] = payload[field]
+        return texts
+
+    def close(self) -> None:
+        with self._lock:
+            self._con.close()
@@ -0,0 +1,162 @@
+# manifest.py
+
+import hashlib
+import logging
+import os
+import threading
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional
+
+import duckdb
+
+
+@dataclass(frozen=True)
+class FileFingerprint:
+    path: str
+    size: int
+    mtime: float
+    content_hash: Optional[str] = None
+
+
+def fingerprint(path: str, *, with_hash: bool = True) -> FileFingerprint:
+    """Return the size, mtime and (optionally) sha256 of the file at `path`."""
+    stat = os.stat(path)
+    content_hash = None
+    if with_hash:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        content_hash = digest.hexdigest()
+    return FileFingerprint(path=path, size=stat.st_size, mtime=stat.st_mtime, content_hash=content_hash)
+
+
+class IngestionManifest:
+    """
+    Durable record of which source files have been ingested, stored in DuckDB.
+
+    Every source file gets one row with its path, size, mtime, content hash, status
+    (``"done"`` or ``"failed"``) and the ids of the points it produced. Ingestion scripts
+    mark files done only after their points have been committed, so a restart can skip
+    finished files and pick up where it stopped.
+    """
+
+    DONE = "done"
+    FAILED = "failed"
+
+    def __init__(self, db_path: str, table_name: str = "ingest_manifest"):
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.db_path = db_path
+        self.table_name = table_name
+
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._con = duckdb.connect(db_path)
+        self._con.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table_name} (
+                path         VARCHAR PRIMARY KEY,
+                size         BIGINT,
+                mtime        DOUBLE,
+                content_hash VARCHAR,
+                status       VARCHAR NOT NULL,
+                point_ids    UBIGINT[],
+                error        VARCHAR,
+                updated_at   TIMESTAMP NOT NULL DEFAULT current_timestamp
+            )
+        """)
+
+    def plan(self, paths: Iterable[str], *, changed_only: bool = False,
+             on_missing: Optional[Callable[[List[int]], None]] = None) -> List[str]:
+        """
+        Return the subset of `paths` that still needs to be ingested.
+
+        New, failed and interrupted files are always returned. Files already marked done are
+        skipped; with `changed_only`, a done file is returned again when its content changed
+        since it was ingested (size/mtime are compared first, the content hash only if they differ).
+
+        With `on_missing`, tracked files that no longer exist on disk are purged: `on_missing` is
+        called with the ids of the points they produced (to delete them from the point store), and
+        their entries are dropped afterwards.
+        """
+        with self._lock:
+            rows = self._con.execute(f"SELECT path, size, mtime, content_hash, status FROM {self.table_name}").fetchall()
+        known = {row[0]: row[1:] for row in rows}
+        if on_missing is not None:
+            self._purge_missing([path for path in known if not os.path.exists(path)], on_missing)
+            known = {path: entry for path, entry in known.items() if os.path.exists(path)}
+
+        todo = []
+        n_unchanged = 0
+        for path in paths:
+            entry = known.get(path)
+            if entry is None or entry[3] != self.DONE:
+                todo.append(path)
+                continue
+            if not changed_only:
+                continue
+
+            size, mtime, content_hash, _ = entry
+            current = fingerprint(path, with_hash=False)
+            if (current.size, current.mtime) == (size, mtime):
+                n_unchanged += 1
+                continue
+            current = fingerprint(path)
+            if current.content_hash == content_hash:
+                # Touched but identical: remember the new mtime so it is not hashed again next time
+                self._upsert([current], status=self.DONE, point_ids=None, keep_point_ids=True)
+                n_unchanged += 1
+                continue
+            todo.append(path)
+
+        self.logger.info("Manifest: %d file(s) to ingest, %d tracked%s",
+                         len(todo), len(known), f" ({n_unchanged} unchanged)" if changed_only else "")
+        return todo
+
+    def _purge_missing(self, missing: List[str], on_missing: Callable[[List[int]], None]) -> None:
+        if not missing:
+            return
+        point_ids = [pid for path in missing for pid in self.point_ids(path)]
+        # Points first: if deleting them fails, the entries stay and the next run tries again
+        on_missing(point_ids)
+        with self._lock:
+            self._con.execute(f"DELETE FROM {self.table_name} WHERE path IN (SELECT UNNEST(?::VARCHAR[]))", [missing])
+        self.logger.info("Manifest: purged %d deleted source file(s) and their %d point(s)", len(missing), len(point_ids))
+
+    def point_ids(self, path: str) -> List[int]:
+        """Return the ids of the points last committed for `path`."""
+        with self._lock:
+            row = self._con.execute(f"SELECT point_ids FROM {self.table_name} WHERE path = ?", [path]).fetchone()
+        return list(row[0] or []) if row else []
+
+    def mark_done(self, point_ids_by_path: Dict[str, List[int]]) -> None:
+        """Record that the points of every file in `point_ids_by_path` have been committed."""
+        for path, ids in point_ids_by_path.items():
+            self._upsert([fingerprint(path)], status=self.DONE, point_ids=ids)
+
+    def mark_failed(self, path: str, error: str) -> None:
+        """Record that `path` failed, so the next run retries it."""
+        self._upsert([fingerprint(path, with_hash=False)], status=self.FAILED, point_ids=None, error=error, keep_point_ids=True)
+
+    def _upsert(self, fingerprints: List[FileFingerprint], *, status: str, point_ids: Optional[List[int]],
+                error: Optional[str] = None, keep_point_ids: bool = False) -> None:
+        with self._lock:
+            for fp in fingerprints:
+                ids = self._point_ids_unlocked(fp.path) if keep_point_ids else point_ids
+                self._con.execute(f"""
+                    INSERT OR REPLACE INTO {self.table_name}
+                        (path, size, mtime, content_hash, status, point_ids, error, updated_at)
+                    VALUES (?, ?, ?, COALESCE(?, (SELECT content_hash FROM {self.table_name} WHERE path = ?)), ?, ?, ?, current_timestamp)
+                """, [fp.path, fp.size, fp.mtime, fp.content_hash, fp.path, status, ids, error])
+
+    def _point_ids_unlocked(self, path: str) -> Optional[List[int]]:
+        row = self._con.execute(f"SELECT point_ids FROM {self.table_name} WHERE path = ?", [path]).fetchone()
+        return list(row[0]) if row and row[0] is not None else None
+
+    def summary(self) -> Dict[str, int]:
+        """Return the number of files per status."""
+        with self._lock:
+            return dict(self._con.execute(f"SELECT status, COUNT(*) FROM {self.table_name} GROUP BY status").fetchall())
+
+    def close(self) -> None:
+        with self._lock:
+            self._con.close()
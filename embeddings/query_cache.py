@@ -0,0 +1,229 @@
+# query_cache.py
+
+import logging
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Callable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from embeddings.cache import EmbeddingCache
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalise_query(text: str) -> str:
+    """
+    Canonical form of a search query: Unicode NFKC, whitespace collapsed and trimmed.
+
+    Case is kept, since the embedding of "HCA" and "hca" differ. The normalised text is what gets
+    embedded, so a cached vector is exactly the one a fresh call would return.
+    """
+    return _WHITESPACE_RE.sub(" ", unicodedata.normalize("NFKC", text)).strip()
+
+
+def missing_texts(texts: Sequence[str], vectors: Sequence[Optional[np.ndarray]]) -> List[str]:
+    """The distinct texts without a vector, in first-seen order: what still has to be embedded."""
+    return list(dict.fromkeys(t for t, v in zip(texts, vectors) if v is None))
+
+
+class QueryEmbeddingCache:
+    """
+    Two-tier cache of query embeddings: an in-process LRU in front of a persistent `EmbeddingCache`.
+
+    Entries are keyed by ``(model, dimensions, normalise_query(text))`` and held as float32. A hit in
+    either tier skips the embedding API call, which is usually the slowest part of a search. Misses are
+    embedded, then written to both tiers; hits in the persistent store are promoted to the LRU.
+
+    The LRU holds at most `max_entries` vectors; entries older than `ttl_seconds` are treated as misses in
+    both tiers (and dropped from the store when the cache is created), so a silently updated model is
+    picked up eventually. Size eviction of the store follows its own `max_size_bytes`.
+
+    Attributes:
+        store (EmbeddingCache | None): Persistent tier shared across processes and restarts; None keeps
+            the cache in memory only.
+        memory_hits (int): Queries served from the LRU, or by the embedding of the same text earlier in
+            the same batch.
+        store_hits (int): Queries served from the persistent store.
+        misses (int): Distinct texts that had to be embedded.
+    """
+
+    def __init__(
+        self,
+        store: Optional[EmbeddingCache] = None,
+        *,
+        max_entries: int = 1024,
+        ttl_seconds: Optional[float] = 30 * 24 * 3600,
+    ):
+        if max_entries < 1:
+            raise ValueError(f"max_entries must be >= 1, got {max_entries}")
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.store = store
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.memory_hits = 0
+        self.store_hits = 0
+        self.misses = 0
+        self._embed_seconds = 0.0
+        self._lookup_seconds = 0.0
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple[str, int, str], Tuple[np.ndarray, float]]" = OrderedDict()
+
+        if store is not None and ttl_seconds:
+            store.expire(ttl_seconds)
+
+    def get_or_embed(
+        self,
+        model: str,
+        dimensions: Optional[int],
+        query: str,
+        embed: Callable[[str], Sequence[float]],
+    ) -> List[float]:
+        """
+        Return the embedding of `query`, calling `embed` (e.g. ``OpenAIEmbeddings.embed_query``) only on a miss.
+
+        Args:
+            model (str): Embedding model identifier, part of the key.
+            dimensions (int, optional): Requested output dimensions, part of the key; None for the model default.
+            query (str): Query text; normalised with `normalise_query` before lookup and embedding.
+            embed (Callable): Embeds one text.
+
+        Returns:
+            List[float]: The query vector.
+        """
+        return self.get_or_embed_many(model, dimensions, [query], lambda texts: [embed(texts[0])])[0]
+
+    def get_or_embed_many(
+        self,
+        model: str,
+        dimensions: Optional[int],
+        queries: Sequence[str],
+        embed_many: Callable[[List[str]], Sequence[Sequence[float]]],
+    ) -> List[List[float]]:
+        """
+        Batch form of `get_or_embed`: one store lookup for the LRU misses, one `embed_many` call
+        (e.g. ``OpenAIEmbeddings.embed_documents``) for the distinct texts found in neither tier.
+
+        Returns:
+            List[List[float]]: One vector per query, in input order.
+        """
+        texts, vectors = self.lookup_many(model, dimensions, queries)
+        pending = missing_texts(texts, vectors)
+        if pending:
+            started = time.perf_counter()
+            fresh = embed_many(pending)
+            self.add_many(model, dimensions, pending, fresh, embed_seconds=time.perf_counter() - started)
+            found = dict(zip(pending, fresh))
+            vectors = [found[t] if v is None else v for t, v in zip(texts, vectors)]
+        return [np.asarray(v, dtype=np.float32).tolist() for v in vectors]
+
+    def lookup_many(
+        self,
+        model: str,
+        dimensions: Optional[int],
+        queries: Sequence[str],
+    ) -> Tuple[List[str], List[Optional[np.ndarray]]]:
+        """
+        Look `queries` up in both tiers without embedding anything; the first half of `get_or_embed_many`
+        for callers that embed the misses themselves (e.g. asynchronously) and hand them to `add_many`.
+
+        Returns:
+            Tuple[List[str], List[Optional[np.ndarray]]]: The normalised texts (what to embed) and the cached
+            vector of each query, None on a miss.
+        """
+        texts = [normalise_query(q) for q in queries]
+        keys = [(model, dimensions or 0, t) for t in texts]
+        started = time.perf_counter()
+        vectors: List[Optional[np.ndarray]] = [self._get_memory(key) for key in keys]
+
+        store_hits = 0
+        pending = missing_texts(texts, vectors)
+        if pending and self.store is not None:
+            stored = self.store.get_many(model, dimensions, pending, max_age_seconds=self.ttl_seconds)
+            found = {t: v for t, v in zip(pending, stored) if v is not None}
+            for i, key in enumerate(keys):
+                if vectors[i] is None and key[2] in found:
+                    vectors[i] = found[key[2]]
+                    store_hits += 1
+                    self._put_memory(key, vectors[i])
+
+        # One miss per distinct text still to embed; repeats of it in this batch are served by that one call
+        misses = len(missing_texts(texts, vectors))
+        with self._lock:
+            self.memory_hits += len(keys) - store_hits - misses
+            self.store_hits += store_hits
+            self.misses += misses
+            self._lookup_seconds += time.perf_counter() - started
+        return texts, vectors
+
+    def add_many(
+        self,
+        model: str,
+        dimensions: Optional[int],
+        texts: Sequence[str],
+        vectors: Sequence[Sequence[float]],
+        *,
+        embed_seconds: float = 0.0,
+    ) -> None:
+        """
+        Cache freshly embedded `texts` (normalised, as returned by `lookup_many`) in both tiers.
+
+        Args:
+            embed_seconds (float, optional): Time the embedding took, used for the ``saved_seconds`` estimate.
+        """
+        vectors = [np.asarray(v, dtype=np.float32) for v in vectors]
+        for text, vector in zip(texts, vectors):
+            self._put_memory((model, dimensions or 0, text), vector)
+        with self._lock:
+            self._embed_seconds += embed_seconds
+        if self.store is not None:
+            self.store.put_many(model, dimensions, texts, vectors)
+
+    def _get_memory(self, key: Tuple[str, int, str]) -> Optional[np.ndarray]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            vector, stored_at = entry
+            if self.ttl_seconds and time.monotonic() - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return vector
+
+    def _put_memory(self, key: Tuple[str, int, str], vector: np.ndarray) -> None:
+        with self._lock:
+            self._entries[key] = (vector, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Empty the in-process tier; the persistent store is left as is."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """
+        Return hit/miss counters and the latency the cache saved.
+
+        ``saved_seconds`` estimates the embedding time avoided: every hit is credited with the mean
+        latency of a miss, minus the time all lookups (hits and misses) took.
+        """
+        with self._lock:
+            hits = self.memory_hits + self.store_hits
+            lookups = hits + self.misses
+            mean_embed = self._embed_seconds / self.misses if self.misses else 0.0
+            return {
+                "memory_hits": self.memory_hits,
+                "store_hits": self.store_hits,
+                "misses": self.misses,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "mean_embed_ms": mean_embed * 1000.0,
+                "mean_lookup_ms": self._lookup_seconds / lookups * 1000.0 if lookups else 0.0,
+                "saved_seconds": max(0.0, hits * mean_embed - self._lookup_seconds),
+            }
@@ -0,0 +1,98 @@
+# query_classifier.py
+
+import re
+from dataclasses import dataclass, field
+from typing import List, Optional, Sequence
+
+from qdrant_client import models
+from qdrant_client.http.models import ScoredPoint
+
+from embeddings.search_filters import CASE_FILTER
+
+# Query-side versions of TITLE_CITATION_RE / CASE_NUMBER_RE in web_scrapper/extract_commonlii_cases.py,
+# which fill the `neutral_citation` and `case_number` payload fields. Unanchored, and case-insensitive
+# since users type "[1999] myca 3"; matches are canonicalised to the stored form.
+CITATION_RE = re.compile(r"\[\s*(?P<year>\d{4})\s*\]\s+(?P<series>[A-Za-z]+)\s+(?P<number>\d+)\b")
+CASE_NUMBER_RE = re.compile(r"\b(?P<prefix>[A-Za-z])-\s*(?P<rest>\d+-\d+-\d+)\b")
+
+# Score given to exact matches, above any cosine similarity
+EXACT_MATCH_SCORE = 1.0
+
+_WORD_RE = re.compile(r"[^\W\d_]{2,}")
+_FILLER_WORDS = {"case", "cases", "no", "number", "citation", "see", "in", "re", "the", "of", "and", "v", "vs"}
+
+
+def canonical_citation(text: str) -> Optional[str]:
+    """``"[ 1999 ]  myca 3"`` -> ``"[1999] MYCA 3"``, the form the extractor stores; None if `text` holds no citation."""
+    m = CITATION_RE.search(text)
+    return f"[{m.group('year')}] {m.group('series').upper()} {m.group('number')}" if m else None
+
+
+def canonical_case_number(text: str) -> Optional[str]:
+    """``"w- 03-151-2000"`` -> ``"W-03-151-2000"``; None if `text` holds no case number."""
+    m = CASE_NUMBER_RE.search(text)
+    return f"{m.group('prefix').upper()}-{m.group('rest')}" if m else None
+
+
+@dataclass
+class QueryClass:
+    """
+    What a search query asks for: exact identifiers, free text, or both.
+
+    Attributes:
+        citations (List[str]): Canonical neutral citations found in the query.
+        case_numbers (List[str]): Canonical case numbers found in the query.
+        remainder (str): The query with the identifiers removed, what a semantic search should embed.
+    """
+    citations: List[str] = field(default_factory=list)
+    case_numbers: List[str] = field(default_factory=list)
+    remainder: str = ""
+
+    @property
+    def exact(self) -> bool:
+        """The query contains at least one citation or case number."""
+        return bool(self.citations or self.case_numbers)
+
+    @property
+    def exact_only(self) -> bool:
+        """The query is nothing but identifiers (give or take filler words): no semantic search is needed."""
+        words = [w for w in _WORD_RE.findall(self.remainder) if w.lower() not in _FILLER_WORDS]
+        # A single real word left over ("[1999] MYCA 3 negligence") already asks for semantic results too
+        return self.exact and not words
+
+    def qdrant_filter(self) -> models.Filter:
+        """
+        Filter matching case-level points (not chunks) with any of the query's identifiers, answered from
+        the ``neutral_citation`` / ``case_number`` keyword payload indexes.
+        """
+        conditions = []
+        if self.citations:
+            conditions.append(models.FieldCondition(key="neutral_citation", match=models.MatchAny(any=self.citations)))
+        if self.case_numbers:
+            # The extractor keeps a space the title may have after the prefix ("W- 03-151-2000")
+            variants = self.case_numbers + [n.replace("-", "- ", 1) for n in self.case_numbers]
+            conditions.append(models.FieldCondition(key="case_number", match=models.MatchAny(any=variants)))
+        return models.Filter(should=conditions, must=[CASE_FILTER])
+
+
+def classify_query(query: str) -> QueryClass:
+    """Find the neutral citations and case numbers in `query`."""
+    citations, case_numbers = [], []
+    for m in CITATION_RE.finditer(query):
+        citations.append(canonical_citation(m.group(0)))
+    for m in CASE_NUMBER_RE.finditer(query):
+        case_numbers.append(canonical_case_number(m.group(0)))
+    remainder = CASE_NUMBER_RE.sub(" ", CITATION_RE.sub(" ", query))
+    return QueryClass(
+        citations=list(dict.fromkeys(citations)),
+        case_numbers=list(dict.fromkeys(case_numbers)),
+        remainder=" ".join(remainder.split()),
+    )
+
+
+def pin_exact_matches(exact: Sequence[ScoredPoint], semantic: Sequence[ScoredPoint], limit: int) -> List[ScoredPoint]:
+    """Exact matches first, then the semantic hits not of the same cases (nor their chunks), `limit` in total."""
+    pinned = list(exact)[:limit]
+    seen = {point.id for point in pinned} | {(point.payload or {}).get("case_id") for point in pinned}
+    rest = [p for p in semantic if p.id not in seen and (p.payload or {}).get("case_id", p.id) not in seen]
+    return pinned + rest[:limit - len(pinned)]
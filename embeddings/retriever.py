@@ -1,16 +1,100 @@
 import sys
 import os
+import logging
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from typing import List, Dict, Any
-from qdrant_client.models import QueryResponse
+from typing import List, Dict, Any, Optional, Sequence
+from qdrant_client import models
+from qdrant_client.http.models import GroupsResult, QueryResponse, ScoredPoint, SearchParams
 from qdrant_client import QdrantClient
 from langchain_openai import OpenAIEmbeddings
-from config.config_env import QDRANT_API_KEY, QDRANT_CLIENT_URL, OPENAI_API_KEY
+from config.config_env import QDRANT_API_KEY, QDRANT_CLIENT_URL, OPENAI_API_KEY, QDRANT_PREFER_GRPC
+from qdrant.client_factory import get_qdrant_client
+from qdrant.provisioning import FULL_VECTOR, SEARCH_VECTOR, CollectionSpec, load_collection_spec
+from embeddings.document_store import DocumentStore
+from embeddings.query_cache import QueryEmbeddingCache
+from embeddings.query_classifier import EXACT_MATCH_SCORE, QueryClass, classify_query, pin_exact_matches
+from embeddings.search_filters import CASE_FILTER, CHUNK_FILTER, SearchFilters, as_qdrant_filter, combine_filters
 
+logger = logging.getLogger(__name__)
 
-class QdrantQueryRetriever:
+# Payload fields needed to list search results; large fields (full_text) are fetched on demand
+DEFAULT_PAYLOAD_FIELDS = [
+    "case_name",
+    "court",
+    "decision_date",
+    "neutral_citation",
+    "case_number",
+    "source_html_url",
+    "point_type",
+    "case_id",
+]
+
+# Extra payload fields of chunk hits: where the passage sits in the judgment, and its text
+PASSAGE_PAYLOAD_FIELDS = [
+    "chunk_index",
+    "chunk_count",
+    "char_start",
+    "char_end",
+    "chunk_text",
+]
+
+Filters = SearchFilters | models.Filter | None
+
+
+class _QueryBuilderMixin:
+    """Query construction shared by the sync and async Qdrant retrievers; needs `spec`, `search_params` and `payload_fields`."""
+
+    def _query_kwargs(self, dense_vector: List[float], limit: int, query_filter: Optional[models.Filter] = None) -> Dict[str, Any]:
+        """
+        Arguments of `query_points` for a full query embedding, following the collection's vector layout.
+
+        `query_filter` is applied by Qdrant during the HNSW traversal (on indexed payload fields), not to
+        the hits afterwards; in a two-tier collection it is set on the prefetch too, so the candidate
+        list is drawn from matching points only.
+        """
+        if self.spec is None or not self.spec.two_tier:
+            return {"query": dense_vector, "query_filter": query_filter, "search_params": self.search_params}
+        return {
+            "prefetch": models.Prefetch(
+                query=self.spec.search_vector(dense_vector),
+                using=SEARCH_VECTOR,
+                filter=query_filter,
+                limit=self.spec.prefetch_limit(limit),
+                params=self.search_params,
+            ),
+            "query": dense_vector,
+            "query_filter": query_filter,
+            "using": FULL_VECTOR,
+        }
+
+    def _query_request(
+        self,
+        dense_vector: List[float],
+        limit: int,
+        query_filter: Optional[models.Filter],
+        with_payload: bool | List[str],
+    ) -> models.QueryRequest:
+        """One `query_batch_points` request, with the same layout handling as `_query_kwargs`."""
+        kwargs = self._query_kwargs(dense_vector, limit, query_filter)
+        kwargs["filter"] = kwargs.pop("query_filter")
+        if "search_params" in kwargs:
+            kwargs["params"] = kwargs.pop("search_params")
+        return models.QueryRequest(limit=limit, with_payload=with_payload, **kwargs)
+
+    def _with_payload(self, with_payload: bool | Sequence[str] | None) -> bool | List[str]:
+        if with_payload is None:
+            return self.payload_fields if self.payload_fields is not None else True
+        return with_payload if isinstance(with_payload, bool) else list(with_payload)
+
+    @staticmethod
+    def _flat_filter(filters: Filters, case_level: bool) -> Optional[models.Filter]:
+        """Filter of a flat (ungrouped) search: `filters`, restricted to case-level points unless `case_level` is off."""
+        return combine_filters(CASE_FILTER if case_level else None, as_qdrant_filter(filters))
+
+
+class QdrantQueryRetriever(_QueryBuilderMixin):
     """
     A retriever class for performing semantic similarity search using OpenAI embeddings and Qdrant vector store.
 
@@ -18,10 +102,19 @@ class QdrantQueryRetriever:
       - Converts a natural language query into a dense vector using OpenAI's embedding model.
       - Queries the specified Qdrant collection to retrieve the most similar vectors/documents.
 
+    For a two-tier collection (``search_dim`` in its spec), the candidates are found with the truncated
+    ``search`` vector and rescored with the ``full`` vector in the same request (Qdrant prefetch).
+
     Attributes:
         collection_name (str): The name of the Qdrant collection to search in.
-        client (QdrantClient): Instance of Qdrant client for querying the vector store.
+        client (QdrantClient): Shared, pooled Qdrant client (see `qdrant.client_factory`) for querying the vector store.
+        spec (CollectionSpec | None): Spec of the collection; decides the vector layout and embedding dimensions.
         embeddings (OpenAIEmbeddings): OpenAI embedding model used to convert text queries to vectors.
+        payload_fields (List[str] | None): Payload fields returned with every hit; None returns the whole payload.
+        document_store (DocumentStore | None): Local store of the large payload fields, see `fetch_full_texts`.
+        query_cache (QueryEmbeddingCache | None): Cache of query embeddings; repeated queries skip the API call.
+        exact_lookup (bool): Answer neutral citations / case numbers in the query from the payload index,
+            see `similarity_search_by_query_with_dense_vector`.
     """
 
     def __init__(
@@ -32,6 +125,15 @@ class QdrantQueryRetriever:
         qdrant_api_key: str | None = QDRANT_API_KEY,
         openai_api_key: str | None = OPENAI_API_KEY,
         embedding_model: str = "text-embedding-3-small",
+        prefer_grpc: bool = QDRANT_PREFER_GRPC,
+        search_params: SearchParams | None = None,
+        payload_fields: Sequence[str] | None = DEFAULT_PAYLOAD_FIELDS,
+        document_store: DocumentStore | None = None,
+        client: QdrantClient | None = None,
+        embeddings: Any | None = None,
+        spec: CollectionSpec | None = None,
+        query_cache: QueryEmbeddingCache | None = None,
+        exact_lookup: bool = True,
     ) -> None:
         """
         Initializes the QdrantQueryRetriever with necessary configurations.
@@ -42,44 +144,290 @@ class QdrantQueryRetriever:
             qdrant_api_key (str, optional): API key for authenticating with Qdrant.
             openai_api_key (str, optional): API key for accessing OpenAI's embedding model.
             embedding_model (str, optional): Identifier of the OpenAI embedding model to use.
+            prefer_grpc (bool, optional): Talk to Qdrant over gRPC instead of REST.
+            search_params (SearchParams, optional): Query-time parameters, e.g. quantization rescoring.
+                Defaults to the parameters of the collection's spec (see `qdrant.provisioning`).
+            payload_fields (Sequence[str], optional): Payload fields to return with each hit. Defaults to the
+                fields needed to list a case; pass None to return the whole payload.
+            document_store (DocumentStore, optional): Store holding `full_text` and other offloaded fields.
+            client (QdrantClient, optional): Client to use instead of the shared one, e.g. a local-mode client.
+            embeddings (optional): Query embedder with `embed_query` / `embed_documents` to use instead of
+                OpenAI, e.g. precomputed vectors in benchmarks and tests.
+            spec (CollectionSpec, optional): Spec of the collection. Defaults to its entry in
+                config/qdrant_collections.yaml, the same file ingestion provisions the collection from.
+            query_cache (QueryEmbeddingCache, optional): Cache of query embeddings, typically shared by all
+                retrievers of the process (see `embeddings.query_cache`).
+            exact_lookup (bool, optional): Detect citations and case numbers in queries (see
+                `embeddings.query_classifier`) and look them up exactly. Defaults to True.
         """
         
         self.collection_name = collection_name
+        self.spec = spec or load_collection_spec(collection_name)
+        self.search_params = search_params or (self.spec.search_params() if self.spec else None)
+        self.payload_fields = list(payload_fields) if payload_fields is not None else None
+        self.document_store = document_store
+        self.embedding_model = embedding_model
+        self.query_cache = query_cache
+        self.exact_lookup = exact_lookup
         
-        self.client = QdrantClient(
-            url=qdrant_url,
-            api_key=qdrant_api_key,
-        )
+        # Reused across retriever instances (e.g. Streamlit reruns), so connections stay warm
+        self.client = client or get_qdrant_client(qdrant_url, qdrant_api_key, prefer_grpc=prefer_grpc)
 
-        self.embeddings = OpenAIEmbeddings(
+        self.embeddings = embeddings or OpenAIEmbeddings(
             model=embedding_model,
             openai_api_key=openai_api_key,
+            # Query vectors must have the dimensions the collection was built with
+            dimensions=self.spec.vector_size if self.spec and self.spec.vector_size else None,
         )
 
     def embed_query(self, query: str) -> List[float]:
         """
-        Returns the raw embedding vector.
+        Returns the raw embedding vector, from `query_cache` when the query was embedded before.
+        """
+        if self.query_cache is None:
+            return self.embeddings.embed_query(query)
+        dimensions = self.spec.vector_size if self.spec else None
+        return self.query_cache.get_or_embed(self.embedding_model, dimensions, query, self.embeddings.embed_query)
+
+    def embed_queries(self, queries: Sequence[str]) -> List[List[float]]:
+        """
+        Returns the embedding vectors of `queries` from a single `embed_documents` request
+        (texts found in `query_cache` are not sent).
         """
-        return self.embeddings.embed_query(query)
+        if self.query_cache is None:
+            return self.embeddings.embed_documents(list(queries))
+        dimensions = self.spec.vector_size if self.spec else None
+        return self.query_cache.get_or_embed_many(self.embedding_model, dimensions, queries, self.embeddings.embed_documents)
     
     def similarity_search_by_query_with_dense_vector(
         self,
         query: str,
         limit: int = 10,
+        with_payload: bool | Sequence[str] | None = None,
+        filters: Filters = None,
+        case_level: bool = True,
     ) -> QueryResponse:
         """
         Performs a similarity search in Qdrant using the query's embedding vector.
 
+        With `exact_lookup`, neutral citations ("[1999] MYCA 3") and case numbers ("W-03-151-2000") in the
+        query are first looked up in the keyword payload index. A query that is nothing but identifiers is
+        answered from that lookup alone, without an embedding call; for a mixed query the exact hits
+        (scored `EXACT_MATCH_SCORE`) are pinned above the semantic hits of the rest of the query.
+
         Args:
             query (str): Natural language query to embed and search with.
             limit (int, optional): Number of top similar results to retrieve. Defaults to 10.
+            with_payload (bool | Sequence[str], optional): Payload to return with each hit; defaults to
+                `payload_fields`. Use `fetch_full_texts` for the judgment texts.
+            filters (SearchFilters | Filter, optional): Court, decision date and people filters, applied
+                by Qdrant during the search (see `embeddings.search_filters`).
+            case_level (bool, optional): Search case-level points only (see `CASE_FILTER`), so that a case
+                indexed as chunks is listed once. Defaults to True; use `search_cases_grouped` for passages.
 
         Returns:
             QueryResponse: Qdrant response containing the matched vectors/documents.
             QueryResponse.points: List of points (documents) that match the query.
         """
+        query_filter = self._flat_filter(filters, case_level)
+        query_class = classify_query(query) if self.exact_lookup else QueryClass(remainder=query)
+        exact = self.exact_matches(query_class, limit, with_payload, query_filter) if query_class.exact else []
+        if exact and query_class.exact_only:
+            return QueryResponse(points=exact)
+
+        dense_vector = self.embed_query(query_class.remainder if exact else query)
+        response = self.client.query_points(
+            self.collection_name,
+            limit=limit,
+            with_payload=self._with_payload(with_payload),
+            **self._query_kwargs(dense_vector, limit, query_filter),
+        )
+        return QueryResponse(points=pin_exact_matches(exact, response.points, limit)) if exact else response
+
+    def exact_matches(
+        self,
+        query_class: QueryClass,
+        limit: int = 10,
+        with_payload: bool | Sequence[str] | None = None,
+        filters: Filters = None,
+    ) -> List[ScoredPoint]:
+        """
+        Case points whose ``neutral_citation`` or ``case_number`` is in `query_class` (and that pass
+        `filters`), from one filtered scroll.
+
+        Returns:
+            List[ScoredPoint]: The matches, scored `EXACT_MATCH_SCORE`.
+        """
+        records, _ = self.client.scroll(
+            self.collection_name,
+            scroll_filter=combine_filters(query_class.qdrant_filter(), as_qdrant_filter(filters)),
+            limit=limit,
+            with_payload=self._with_payload(with_payload),
+            with_vectors=False,
+        )
+        return [ScoredPoint(id=r.id, version=0, score=EXACT_MATCH_SCORE, payload=r.payload) for r in records]
+
+    def search_batch(
+        self,
+        queries: Sequence[str],
+        limit: int = 10,
+        filters: Filters | Sequence[Filters] = None,
+        with_payload: bool | Sequence[str] | None = None,
+        case_level: bool = True,
+    ) -> List[QueryResponse | Exception]:
+        """
+        Search many queries with one embedding request and one Qdrant round trip (`query_batch_points`).
+
+        Failures are isolated per query: blank queries fail on their own, and if the batched embedding
+        or search request fails, the batch is retried query by query so that only the failing queries
+        report an error.
+
+        Args:
+            queries (Sequence[str]): Natural language queries.
+            limit (int, optional): Number of hits per query.
+            filters (SearchFilters | Filter | Sequence, optional): One filter applied to every query, or one
+                per query (None for unfiltered).
+            with_payload (bool | Sequence[str], optional): Payload to return with each hit; defaults to
+                `payload_fields`.
+            case_level (bool, optional): Search case-level points only (see
+                `similarity_search_by_query_with_dense_vector`).
+
+        Returns:
+            List[QueryResponse | Exception]: One entry per query, in input order: its response, or the
+            exception that made it fail.
+        """
+        queries = list(queries)
+        if filters is None or isinstance(filters, (models.Filter, SearchFilters)):
+            filters = [filters] * len(queries)
+        elif len(filters) != len(queries):
+            raise ValueError(f"Got {len(filters)} filters for {len(queries)} queries")
+        filters = [self._flat_filter(f, case_level) for f in filters]
+
+        results: List[QueryResponse | Exception | None] = [None] * len(queries)
+        valid = []
+        for i, query in enumerate(queries):
+            if query.strip():
+                valid.append(i)
+            else:
+                results[i] = ValueError("Empty query")
+        if not valid:
+            return results
+
+        try:
+            vectors = dict(zip(valid, self.embed_queries([queries[i] for i in valid])))
+        except Exception as e:
+            logger.warning("Batched embedding of %d queries failed (%s); embedding one by one", len(valid), e)
+            vectors = {}
+            for i in valid:
+                try:
+                    vectors[i] = self.embed_query(queries[i])
+                except Exception as e:
+                    results[i] = e
+
+        embedded = [i for i in valid if i in vectors]
+        if not embedded:
+            return results
+        payload = self._with_payload(with_payload)
+        requests = [self._query_request(vectors[i], limit, filters[i], payload) for i in embedded]
+        try:
+            responses = self.client.query_batch_points(self.collection_name, requests=requests)
+        except Exception as e:
+            logger.warning("Batched search of %d queries failed (%s); searching one by one", len(requests), e)
+            responses = []
+            for request in requests:
+                try:
+                    responses.append(self.client.query_batch_points(self.collection_name, requests=[request])[0])
+                except Exception as e:
+                    responses.append(e)
+        for i, response in zip(embedded, responses):
+            results[i] = response
+        return results
+
+    def search_cases_grouped(
+        self,
+        query: str,
+        limit: int = 10,
+        group_size: int = 3,
+        with_payload: bool | Sequence[str] | None = None,
+        filters: Filters = None,
+    ) -> GroupsResult:
+        """
+        Search chunk-level points and return the best `limit` distinct cases with their best passages.
+
+        Needs a collection indexed with ``chunk_all`` (see `OpenAIEmbedder.embed_json_file`). Only
+        ``point_type="chunk"`` points are searched, grouped by ``case_id`` in a single request.
+
+        Args:
+            query (str): Natural language query to embed and search with.
+            limit (int, optional): Number of distinct cases to return.
+            group_size (int, optional): Best-matching passages returned per case.
+            with_payload (bool | Sequence[str], optional): Payload of each passage hit; defaults to
+                `payload_fields` plus `PASSAGE_PAYLOAD_FIELDS` (offsets and passage text).
+            filters (SearchFilters | Filter, optional): Case filters; chunks carry their case's metadata.
+
+        Returns:
+            GroupsResult: ``groups`` ordered by their best passage; each group's ``id`` is the case id
+            and its ``hits`` are the passages, best first.
+        """
+        if with_payload is None and self.payload_fields is not None:
+            with_payload = self.payload_fields + [f for f in PASSAGE_PAYLOAD_FIELDS if f not in self.payload_fields]
         dense_vector = self.embed_query(query)
-        return self.client.query_points(self.collection_name, dense_vector, limit=limit)
+        return self.client.query_points_groups(
+            self.collection_name,
+            group_by="case_id",
+            limit=limit,
+            group_size=group_size,
+            with_payload=self._with_payload(with_payload),
+            **self._query_kwargs(dense_vector, limit * group_size, combine_filters(CHUNK_FILTER, as_qdrant_filter(filters))),
+        )
+
+    def facet_counts(
+        self,
+        fields: Sequence[str] = ("court",),
+        filters: Filters = None,
+        limit: int = 50,
+        exact: bool = False,
+    ) -> Dict[str, Dict[Any, int]]:
+        """
+        Number of cases per value of each of `fields` among the cases passing `filters`, from the payload
+        index (Qdrant facets) instead of from search results.
+
+        Counts case-level points only, so a case embedded as chunks is counted once.
+
+        Args:
+            fields (Sequence[str], optional): Payload fields with a keyword (or integer / bool) index.
+            filters (SearchFilters | Filter, optional): Restrict the counts to matching cases.
+            limit (int, optional): Most frequent values returned per field.
+            exact (bool, optional): Exact counts instead of Qdrant's fast estimate.
+
+        Returns:
+            Dict[str, Dict[Any, int]]: Per field, the counts by value, most frequent first.
+        """
+        facet_filter = combine_filters(CASE_FILTER, as_qdrant_filter(filters))
+        return {
+            key: {hit.value: hit.count for hit in self.client.facet(
+                self.collection_name, key=key, facet_filter=facet_filter, limit=limit, exact=exact).hits}
+            for key in fields
+        }
+
+    def fetch_full_texts(self, point_ids: Sequence[int], field: str = "full_text") -> Dict[int, str]:
+        """
+        Fetch `field` (by default the judgment text) for `point_ids` in one round trip per source.
+
+        Texts are read from `document_store` first; ids it does not hold (e.g. points uploaded before
+        the text was offloaded) are retrieved from Qdrant with a payload projected to `field`.
+
+        Returns:
+            Dict[int, str]: Text per point id; ids with no such field are left out.
+        """
+        texts = self.document_store.get_many(point_ids, field) if self.document_store else {}
+        missing = [pid for pid in point_ids if pid not in texts]
+        if missing:
+            for record in self.client.retrieve(self.collection_name, ids=missing, with_payload=[field], with_vectors=False):
+                value = (record.payload or {}).get(field)
+                if isinstance(value, str):
+                    texts[record.id] = value
+        return texts
 
 
 # --------------------------- Example usage ------------------------------- #
@@ -0,0 +1,150 @@
+# search_filters.py
+
+import re
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+from qdrant_client import models
+
+# Payload fields searched by the free-text filters; each has a ``text`` payload index (see qdrant/provisioning.py)
+CORAM_FIELDS = ("coram",)
+COUNSEL_FIELDS = ("counsel_appellant", "counsel_respondent")
+PARTY_FIELDS = ("appellants", "respondents")
+
+# Same tokenisation as Qdrant's default full-text index: lowercase words
+_TOKEN_RE = re.compile(r"\w+")
+
+DateLike = Union[date, datetime, str]
+
+# Payload flag of the first chunk of a split case that has no pooled point, which stands for the case
+CASE_POINT_KEY = "case_point"
+
+CHUNK_FILTER = models.Filter(must=[models.FieldCondition(key="point_type", match=models.MatchValue(value="chunk"))])
+# Case-level points only (unsplit, pooled, and the first chunk of a case without a pooled point),
+# so that every case is searched and counted exactly once
+CASE_FILTER = models.Filter(should=[
+    models.Filter(must_not=[models.FieldCondition(key="point_type", match=models.MatchValue(value="chunk"))]),
+    models.FieldCondition(key=CASE_POINT_KEY, match=models.MatchValue(value=True)),
+])
+
+
+def _tokens(text: str) -> List[str]:
+    return _TOKEN_RE.findall(text.lower())
+
+
+def _as_date(value: Optional[DateLike]) -> Optional[date]:
+    if value is None or value == "":
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+@dataclass(frozen=True)
+class SearchFilters:
+    """
+    Narrowing of a case search by court, decision date and the people involved.
+
+    Converted to a Qdrant `Filter` on indexed payload fields (`to_qdrant_filter`), so Qdrant applies it
+    during the HNSW traversal instead of the caller dropping hits afterwards. `matches` applies the same
+    conditions to a payload, for the in-process backend.
+
+    Attributes:
+        courts (Tuple[str, ...]): Accepted ``court`` values; empty accepts any court.
+        decided_from (date | str | None): Earliest ``decision_date``, inclusive.
+        decided_to (date | str | None): Latest ``decision_date``, inclusive (the whole day).
+        coram (str | None): Words that must all appear in ``coram`` (the judges).
+        counsel (str | None): Words that must all appear in one of the counsel fields.
+        parties (str | None): Words that must all appear in the appellants or the respondents.
+    """
+    courts: Tuple[str, ...] = ()
+    decided_from: Optional[DateLike] = None
+    decided_to: Optional[DateLike] = None
+    coram: Optional[str] = None
+    counsel: Optional[str] = None
+    parties: Optional[str] = None
+
+    def __post_init__(self):
+        # Accept any sequence of courts, but keep the filters hashable
+        object.__setattr__(self, "courts", tuple(self.courts or ()))
+        start, end = _as_date(self.decided_from), _as_date(self.decided_to)
+        if start and end and start > end:
+            raise ValueError(f"decided_from ({start}) is after decided_to ({end})")
+
+    @property
+    def is_empty(self) -> bool:
+        return not (self.courts or self.decided_from or self.decided_to or self.coram or self.counsel or self.parties)
+
+    def _text_conditions(self) -> List[Tuple[Sequence[str], str]]:
+        """(fields, text) pairs: the text must match at least one of the fields."""
+        pairs = [(CORAM_FIELDS, self.coram), (COUNSEL_FIELDS, self.counsel), (PARTY_FIELDS, self.parties)]
+        return [(fields, text.strip()) for fields, text in pairs if text and text.strip()]
+
+    def to_qdrant_filter(self) -> Optional[models.Filter]:
+        """
+        The equivalent Qdrant filter, or None when no condition is set.
+
+        Returns:
+            Filter | None: ``court`` as MatchAny, ``decision_date`` as a DatetimeRange and the free-text
+            fields as MatchText (all words of the text, any of the fields).
+        """
+        must: List[Union[models.FieldCondition, models.Filter]] = []
+        if self.courts:
+            must.append(models.FieldCondition(key="court", match=models.MatchAny(any=list(self.courts))))
+
+        start, end = _as_date(self.decided_from), _as_date(self.decided_to)
+        if start or end:
+            must.append(models.FieldCondition(key="decision_date", range=models.DatetimeRange(
+                gte=datetime.combine(start, datetime.min.time()) if start else None,
+                lt=datetime.combine(end + timedelta(days=1), datetime.min.time()) if end else None,
+            )))
+
+        for fields, text in self._text_conditions():
+            conditions = [models.FieldCondition(key=f, match=models.MatchText(text=text)) for f in fields]
+            must.append(conditions[0] if len(conditions) == 1 else models.Filter(should=conditions))
+        return models.Filter(must=must) if must else None
+
+    def payload_fields(self) -> List[str]:
+        """Payload fields `matches` reads."""
+        fields = (["court"] if self.courts else []) + (["decision_date"] if self.decided_from or self.decided_to else [])
+        for text_fields, _ in self._text_conditions():
+            fields.extend(text_fields)
+        return fields
+
+    def matches(self, payload: Dict[str, Any]) -> bool:
+        """Whether a point with `payload` passes the filters (same semantics as `to_qdrant_filter`)."""
+        if self.courts and payload.get("court") not in self.courts:
+            return False
+
+        start, end = _as_date(self.decided_from), _as_date(self.decided_to)
+        if start or end:
+            try:
+                decided = _as_date(payload.get("decision_date"))
+            except ValueError:
+                decided = None
+            if decided is None or (start and decided < start) or (end and decided > end):
+                return False
+
+        for fields, text in self._text_conditions():
+            wanted = set(_tokens(text))
+            if not any(wanted <= set(_tokens(str(payload.get(f) or ""))) for f in fields):
+                return False
+        return True
+
+
+def as_qdrant_filter(filters: Union["SearchFilters", models.Filter, None]) -> Optional[models.Filter]:
+    """Accept `SearchFilters`, a ready-made Qdrant `Filter`, or None."""
+    if isinstance(filters, SearchFilters):
+        return filters.to_qdrant_filter()
+    return filters
+
+
+def combine_filters(*filters: Optional[models.Filter]) -> Optional[models.Filter]:
+    """All of `filters` (Nones ignored), as one Filter; None if there is nothing to filter on."""
+    present = [f for f in filters if f is not None]
+    if len(present) <= 1:
+        return present[0] if present else None
+    return models.Filter(must=present)
@@ -0,0 +1,124 @@
+# upload_pipeline.py
+
+import logging
+import queue
+import threading
+import time
+from typing import List, Optional
+
+from qdrant_client.http.models import PointStruct
+
+from .embeddings import OpenAIEmbedder
+from qdrant.sync import with_content_hash
+
+_STOP = object()
+
+
+class StreamingUploadPipeline:
+    """
+    Bounded, concurrent hand-off from embedding to Qdrant (and an optional DuckDB backup).
+
+    The producer (the embedding loop) calls `submit` with each batch of freshly embedded points.
+    The batch is written to DuckDB in the producer's thread, split into upload batches, and put on a
+    bounded queue that `upload_workers` threads drain into Qdrant. The embedding of the next files
+    therefore overlaps with the upload of the previous ones. When the queue is full, `submit` blocks,
+    so peak memory is set by `queue_size * upload_batch_size` rather than by the corpus size.
+
+    Failed uploads are retried with exponential backoff. Batches that still fail are logged and
+    counted in `stats`, and they remain in the DuckDB backup for a later re-upload.
+
+    Usage:
+        with StreamingUploadPipeline(embedder, "commonlii_cases", duckdb_path="cases.duckdb") as pipeline:
+            for points in batches:
+                pipeline.submit(points)
+        print(pipeline.stats)
+    """
+
+    def __init__(
+        self,
+        embedder: OpenAIEmbedder,
+        collection_name: str,
+        *,
+        duckdb_path: Optional[str] = None,
+        upload_batch_size: int = 256,
+        queue_size: int = 8,
+        upload_workers: int = 4,
+        max_retries: int = 5,
+    ):
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.embedder = embedder
+        self.collection_name = collection_name
+        self.duckdb_path = duckdb_path
+        self.upload_batch_size = upload_batch_size
+        self.max_retries = max_retries
+
+        self.stats = {"points_submitted": 0, "points_uploaded": 0, "points_failed": 0, "batches_failed": 0}
+        self._stats_lock = threading.Lock()
+        self._collection_ready = False
+        self._queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        self._workers = [
+            threading.Thread(target=self._worker, name=f"qdrant-upload-{i}", daemon=True)
+            for i in range(upload_workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def __enter__(self) -> "StreamingUploadPipeline":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def submit(self, points: List[PointStruct]) -> None:
+        """Back up `points` to DuckDB and queue them for upload; blocks while the queue is full."""
+        if not points:
+            return
+        if self.duckdb_path:
+            self.embedder.upload_points_to_duckdb(points, db_path=self.duckdb_path)
+
+        if not self._collection_ready:
+            # Once, before any worker uploads: concurrent first uploads would race to create it
+            self.embedder.ensure_qdrant_collection(self.collection_name, len(points[0].vector))
+            self._collection_ready = True
+
+        # Record content hashes so that a later delta sync (qdrant/sync.py) can skip these points
+        points = with_content_hash(points)
+        with self._stats_lock:
+            self.stats["points_submitted"] += len(points)
+        for i in range(0, len(points), self.upload_batch_size):
+            self._queue.put(points[i:i + self.upload_batch_size])
+
+    def close(self) -> dict:
+        """Wait for every queued batch to be uploaded, stop the workers and return `stats`."""
+        for _ in self._workers:
+            self._queue.put(_STOP)
+        for worker in self._workers:
+            worker.join()
+        self.logger.info("Upload pipeline finished: %s", self.stats)
+        return self.stats
+
+    def _worker(self) -> None:
+        while True:
+            batch = self._queue.get()
+            if batch is _STOP:
+                return
+            self._upload(batch)
+
+    def _upload(self, batch: List[PointStruct]) -> None:
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                self.embedder.upload_points_to_qdrant(batch, collection_name=self.collection_name, ensure_collection=False)
+                with self._stats_lock:
+                    self.stats["points_uploaded"] += len(batch)
+                return
+            except Exception as exc:
+                if attempt == self.max_retries:
+                    self.logger.error("Giving up on %d points (ids %s..%s): %s", len(batch), batch[0].id, batch[-1].id, exc)
+                    with self._stats_lock:
+                        self.stats["points_failed"] += len(batch)
+                        self.stats["batches_failed"] += 1
+                    return
+                delay = min(2 ** (attempt - 1), 30)
+                self.logger.warning("Upload of %d points failed (%s); retry %d/%d in %ds",
+                                    len(batch), exc, attempt, self.max_retries - 1, delay)
+                time.sleep(delay)
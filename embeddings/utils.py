@@ -1,3 +1,9 @@
+import uuid
+
+# Namespace for ids of points derived from another point (e.g. the chunks of a split case)
+_POINT_ID_NAMESPACE = uuid.UUID("5d0c5e55-7a1c-4c1e-9b5e-6a2f4e0c1d3b")
+
+
 # Helper for dot-notation access (private)
 def _dig(obj: dict, dotted_field: str):
     """Return a nested value given dot-notation (e.g. 'a.b.c') or raise KeyError."""
@@ -5,3 +11,8 @@ def _dig(obj: dict, dotted_field: str):
     for key in dotted_field.split("."):
         current = current[key]          # KeyError if missing
     return current
+
+
+def chunk_point_id(parent_id, chunk_index: int) -> int:
+    """Return a deterministic 63-bit integer point id for chunk `chunk_index` of point `parent_id`."""
+    return uuid.uuid5(_POINT_ID_NAMESPACE, f"{parent_id}#{chunk_index}").int >> 65
@@ -3,6 +3,7 @@ from config.config_env import OPENAI_API_KEY
 import os
 from embeddings.pdfchunker import PDFChunker
 from embeddings.embeddings import OpenAIEmbedder
+from embeddings.cache import EmbeddingCache
 
 
 def main():
@@ -12,6 +13,7 @@ def main():
     embedded_db_path = "embedded_points.duckdb"      # 🟨 stores embedded vectors
     collection_name = "embedded_collection"          # ☁️ Qdrant collection
     raw_table = "raw_chunks"                         # 🧱 table for raw text
+    cache_db_path = "embedding_cache.duckdb"         # 🗃️ reuses vectors of unchanged chunks
     # -------------------------------------------
 
     # 1. Chunk the PDF and save chunks to DuckDB
@@ -21,8 +23,9 @@ def main():
 
     # 2. Generate embeddings from text chunks
     print("🧠 Generating embeddings...")
-    embedder = OpenAIEmbedder()
+    embedder = OpenAIEmbedder(cache=EmbeddingCache(cache_db_path))
     qdrant_points = embedder.embed_text_chunks(duckdb_path=raw_db_path, table_name=raw_table)
+    print(f"   cache: {embedder.cache.stats()}")
 
     # 3. Save embedded vectors to another DuckDB
     print("💾 Saving embedded points to DuckDB...")
@@ -0,0 +1,219 @@
+# bulk_upload.py
+
+import json
+import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Dict, Iterable, Iterator, List, Optional, Set
+
+import grpc
+from qdrant_client import QdrantClient
+from qdrant_client.http.exceptions import UnexpectedResponse
+from qdrant_client.models import PointStruct
+
+from qdrant.provisioning import CollectionSpec
+
+# Qdrant rejects requests above `service.max_request_size_mb` (32 MB by default); stay well below it
+DEFAULT_MAX_BATCH_BYTES = 8 * 1024 * 1024
+DEFAULT_MAX_BATCH_POINTS = 512
+# A float serialised in a REST/JSON body takes ~20 bytes ("-0.012345678901234567,")
+_JSON_BYTES_PER_DIM = 20
+_HTTP_PAYLOAD_TOO_LARGE = 413
+
+
+def estimate_point_bytes(point: PointStruct) -> int:
+    """
+    Approximate size of `point` in a REST upsert request body.
+
+    Over gRPC the vector takes ~4 bytes per dimension instead, but the payload's protobuf encoding
+    can be larger than its JSON, so the estimate does not bound the gRPC message size; batches the
+    server still rejects are split by `BulkUploader` (see `is_too_large_error`).
+    """
+    vector = point.vector
+    n_dims = len(vector) if isinstance(vector, list) else sum(len(v) for v in (vector or {}).values())
+    return len(json.dumps(point.payload or {}, ensure_ascii=False).encode("utf-8")) + n_dims * _JSON_BYTES_PER_DIM + 64
+
+
+def is_too_large_error(exc: Exception) -> bool:
+    """Whether `exc` is the server rejecting a request as too large: HTTP 413, or gRPC RESOURCE_EXHAUSTED."""
+    if isinstance(exc, UnexpectedResponse):
+        return exc.status_code == _HTTP_PAYLOAD_TOO_LARGE
+    return isinstance(exc, grpc.RpcError) and exc.code() == grpc.StatusCode.RESOURCE_EXHAUSTED
+
+
+def iter_sized_batches(points: Iterable[PointStruct], *, max_points: int, max_bytes: int) -> Iterator[List[PointStruct]]:
+    """
+    Group `points` into batches of at most `max_points` points and (approximately) `max_bytes` bytes.
+
+    A single point larger than `max_bytes` is sent on its own.
+    """
+    batch: List[PointStruct] = []
+    batch_bytes = 0
+    for point in points:
+        size = estimate_point_bytes(point)
+        if batch and (len(batch) >= max_points or batch_bytes + size > max_bytes):
+            yield batch
+            batch, batch_bytes = [], 0
+        batch.append(point)
+        batch_bytes += size
+    if batch:
+        yield batch
+
+
+class BulkUploader:
+    """
+    Parallel bulk loader for a Qdrant collection.
+
+    Points are grouped into batches bounded by point count and serialised size, and upserted by
+    `workers` threads sharing one client. With ``wait=False`` Qdrant acknowledges each batch once it
+    is queued rather than indexed, so consecutive batches are pipelined. A failed batch is retried
+    with exponential backoff; a batch rejected as too large (HTTP 413, or gRPC RESOURCE_EXHAUSTED)
+    is split in half.
+
+    Because acknowledged writes are only applied asynchronously, `upload` finishes with a
+    consistency check: it waits for the collection to settle and then confirms that every uploaded
+    id can be retrieved.
+
+    With a two-tier `spec` (see `CollectionSpec.search_dim`), points holding full embeddings are
+    converted to the collection's named ``search``/``full`` vectors on the way.
+
+    Usage:
+        uploader = BulkUploader(client, "commonlii_cases", workers=8)
+        stats = uploader.upload(points)
+        if stats["missing"]:
+            ...
+    """
+
+    def __init__(
+        self,
+        client: QdrantClient,
+        collection_name: str,
+        *,
+        max_batch_points: int = DEFAULT_MAX_BATCH_POINTS,
+        max_batch_bytes: int = DEFAULT_MAX_BATCH_BYTES,
+        workers: int = 4,
+        max_retries: int = 5,
+        wait: bool = False,
+        verify: bool = True,
+        settle_timeout: float = 600.0,
+        spec: Optional[CollectionSpec] = None,
+    ):
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.client = client
+        self.collection_name = collection_name
+        self.max_batch_points = max_batch_points
+        self.max_batch_bytes = max_batch_bytes
+        self.workers = workers
+        self.max_retries = max_retries
+        self.wait = wait
+        self.verify = verify
+        self.settle_timeout = settle_timeout
+        self.spec = spec
+
+        self._lock = threading.Lock()
+        self._uploaded_ids: Set = set()
+        self.stats: Dict[str, int] = {}
+
+    def upload(self, points: Iterable[PointStruct]) -> Dict[str, int]:
+        """
+        Upsert every point of `points` (any iterable, consumed lazily) and return upload statistics.
+
+        Returns:
+            dict: ``points_uploaded``, ``points_failed``, ``batches``, ``batches_failed``, ``retries``,
+            ``bytes`` (estimated) and ``missing`` (uploaded ids not found by the consistency check).
+        """
+        self.stats = {"points_uploaded": 0, "points_failed": 0, "batches": 0, "batches_failed": 0,
+                      "retries": 0, "bytes": 0, "missing": 0}
+        self._uploaded_ids = set()
+        started = time.monotonic()
+        if self.spec is not None and self.spec.two_tier:
+            points = map(self.spec.to_collection_point, points)
+
+        # Bound the number of in-flight batches so a fast reader cannot buffer the whole corpus
+        max_in_flight = self.workers * 2
+        in_flight: Set[Future] = set()
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="qdrant-bulk") as pool:
+            for batch in iter_sized_batches(points, max_points=self.max_batch_points, max_bytes=self.max_batch_bytes):
+                if len(in_flight) >= max_in_flight:
+                    _, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                in_flight.add(pool.submit(self._upload_batch, batch))
+            wait(in_flight)
+
+        elapsed = time.monotonic() - started
+        self.logger.info("Upserted %d points in %d batches in %.1fs (%.0f points/s)",
+                         self.stats["points_uploaded"], self.stats["batches"], elapsed,
+                         self.stats["points_uploaded"] / elapsed if elapsed else 0.0)
+
+        if self.verify and self._uploaded_ids:
+            missing = self.check_consistency(self._uploaded_ids)
+            self.stats["missing"] = len(missing)
+        return self.stats
+
+    def _upload_batch(self, batch: List[PointStruct]) -> None:
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                self.client.upsert(collection_name=self.collection_name, points=batch, wait=self.wait)
+                with self._lock:
+                    self.stats["points_uploaded"] += len(batch)
+                    self.stats["batches"] += 1
+                    self.stats["bytes"] += sum(estimate_point_bytes(p) for p in batch)
+                    self._uploaded_ids.update(p.id for p in batch)
+                return
+            except Exception as exc:
+                if is_too_large_error(exc) and len(batch) > 1:
+                    self.logger.warning("Batch of %d points too large for the server; splitting", len(batch))
+                    half = len(batch) // 2
+                    self._upload_batch(batch[:half])
+                    self._upload_batch(batch[half:])
+                    return
+                error = exc
+
+            if attempt == self.max_retries:
+                self.logger.error("Giving up on %d points (ids %s..%s): %s", len(batch), batch[0].id, batch[-1].id, error)
+                with self._lock:
+                    self.stats["points_failed"] += len(batch)
+                    self.stats["batches_failed"] += 1
+                return
+            delay = min(2 ** (attempt - 1), 30)
+            with self._lock:
+                self.stats["retries"] += 1
+            self.logger.warning("Upsert of %d points failed (%s); retry %d/%d in %ds",
+                                len(batch), error, attempt, self.max_retries - 1, delay)
+            time.sleep(delay)
+
+    def check_consistency(self, point_ids: Iterable, *, chunk_size: int = 1000) -> List:
+        """
+        Wait until the collection has applied all queued updates, then return the ids of `point_ids`
+        that cannot be retrieved from it.
+        """
+        point_ids = list(point_ids)
+        deadline = time.monotonic() + self.settle_timeout
+        while True:
+            info = self.client.get_collection(self.collection_name)
+            count = self.client.count(self.collection_name, exact=True).count
+            status = getattr(info.status, "value", info.status)
+            if (status == "green" and count >= len(point_ids)) or time.monotonic() > deadline:
+                break
+            self.logger.info("Waiting for '%s' to settle (status %s, %d/%d points)",
+                             self.collection_name, status, count, len(point_ids))
+            time.sleep(2)
+
+        missing = []
+        for i in range(0, len(point_ids), chunk_size):
+            chunk = point_ids[i:i + chunk_size]
+            found = {
+                record.id for record in self.client.retrieve(
+                    self.collection_name, ids=chunk, with_payload=False, with_vectors=False
+                )
+            }
+            missing.extend(pid for pid in chunk if pid not in found)
+
+        if missing:
+            self.logger.error("Consistency check: %d of %d uploaded points are missing from '%s' (e.g. %s)",
+                              len(missing), len(point_ids), self.collection_name, missing[:5])
+        else:
+            self.logger.info("Consistency check passed: %d points present in '%s' (collection holds %d)",
+                             len(point_ids), self.collection_name, count)
+        return missing
+
@@ -0,0 +1,111 @@
+# client_factory.py
+
+import atexit
+import logging
+import threading
+from typing import Dict, Optional, Tuple
+
+import httpx
+from qdrant_client import AsyncQdrantClient, QdrantClient
+
+from config.config_env import QDRANT_API_KEY, QDRANT_CLIENT_URL, QDRANT_PREFER_GRPC
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT = 60
+DEFAULT_POOL_SIZE = 16
+DEFAULT_KEEPALIVE_EXPIRY = 120.0
+
+_clients: Dict[Tuple, QdrantClient] = {}
+_clients_lock = threading.Lock()
+
+
+def _client_kwargs(url: Optional[str], api_key: Optional[str], prefer_grpc: bool, timeout: int, pool_size: int) -> dict:
+    return {
+        "url": url,
+        "api_key": api_key,
+        "prefer_grpc": prefer_grpc,
+        "timeout": timeout,
+        # Keep TLS connections open between calls instead of handshaking on every request
+        "limits": httpx.Limits(
+            max_connections=pool_size,
+            max_keepalive_connections=pool_size,
+            keepalive_expiry=DEFAULT_KEEPALIVE_EXPIRY,
+        ),
+    }
+
+
+def get_qdrant_client(
+    url: Optional[str] = QDRANT_CLIENT_URL,
+    api_key: Optional[str] = QDRANT_API_KEY,
+    *,
+    prefer_grpc: bool = QDRANT_PREFER_GRPC,
+    timeout: int = DEFAULT_TIMEOUT,
+    pool_size: int = DEFAULT_POOL_SIZE,
+) -> QdrantClient:
+    """
+    Return the process-wide Qdrant client for `url`, creating it on first use.
+
+    Clients are cached per ``(url, api_key, prefer_grpc, timeout, pool_size)`` and shared by the embedder,
+    the uploaders and the retriever, so connections (and their TLS sessions) are pooled and kept
+    alive across calls. The client is thread-safe; do not close it yourself – use
+    `close_qdrant_clients` (also run at interpreter exit).
+
+    Args:
+        url: URL of the Qdrant instance. Defaults to QDRANT_CLIENT_URL.
+        api_key: API key for the Qdrant instance. Defaults to QDRANT_API_KEY.
+        prefer_grpc: Use the gRPC interface (port 6334) where available; faster for bulk upserts.
+            Defaults to QDRANT_PREFER_GRPC.
+        timeout: Request timeout in seconds.
+        pool_size: Maximum number of pooled (and kept-alive) HTTP connections.
+    """
+    key = (url, api_key, prefer_grpc, timeout, pool_size)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            logger.info("Connecting to Qdrant at %s (%s)", url, "gRPC" if prefer_grpc else "REST")
+            client = QdrantClient(**_client_kwargs(url, api_key, prefer_grpc, timeout, pool_size))
+            _clients[key] = client
+        return client
+
+
+def create_async_qdrant_client(
+    url: Optional[str] = QDRANT_CLIENT_URL,
+    api_key: Optional[str] = QDRANT_API_KEY,
+    *,
+    prefer_grpc: bool = QDRANT_PREFER_GRPC,
+    timeout: int = DEFAULT_TIMEOUT,
+    pool_size: int = DEFAULT_POOL_SIZE,
+) -> AsyncQdrantClient:
+    """
+    Create an AsyncQdrantClient with the same connection settings as `get_qdrant_client`.
+
+    Async clients are bound to the event loop they are first used on, so they are not cached here;
+    the caller owns the client and must ``await client.close()`` when done.
+    """
+    return AsyncQdrantClient(**_client_kwargs(url, api_key, prefer_grpc, timeout, pool_size))
+
+
+def check_qdrant_health(client: QdrantClient) -> bool:
+    """Return True if the Qdrant server behind `client` answers; log the error otherwise."""
+    try:
+        client.get_collections()
+        return True
+    except Exception as exc:
+        logger.error("Qdrant health check failed: %s", exc)
+        return False
+
+
+def close_qdrant_clients() -> None:
+    """Close every cached client. Clients requested afterwards are created anew."""
+    with _clients_lock:
+        clients = list(_clients.values())
+        _clients.clear()
+    for client in clients:
+        try:
+            client.close()
+        except Exception as exc:
+            logger.warning("Error while closing Qdrant client: %s", exc)
+
+
+atexit.register(close_qdrant_clients)
@@ -0,0 +1,363 @@
+# provisioning.py
+
+import logging
+import math
+import os
+from dataclasses import asdict, dataclass, field, fields
+from typing import Dict, Iterable, List, Optional, Sequence, Union
+
+import numpy as np
+import yaml
+from qdrant_client import QdrantClient, models
+
+logger = logging.getLogger(__name__)
+
+# Payload fields of the CommonLII case points that are filtered or looked up exactly
+DEFAULT_PAYLOAD_INDEXES: Dict[str, str] = {
+    "court": "keyword",
+    "decision_date": "datetime",
+    "neutral_citation": "keyword",
+    "case_number": "keyword",
+    # Chunk-level points: grouped search by case, and chunk/pooled filtering
+    "case_id": "integer",
+    "point_type": "keyword",
+    "case_point": "bool",
+    # Full-text filters on the people involved (see embeddings.search_filters)
+    "coram": "text",
+    "appellants": "text",
+    "respondents": "text",
+    "counsel_appellant": "text",
+    "counsel_respondent": "text",
+}
+
+_QUANTIZATION_TYPES = (None, "scalar", "binary")
+
+# Named vectors of a two-tier collection (see `CollectionSpec.search_dim`)
+SEARCH_VECTOR = "search"
+FULL_VECTOR = "full"
+
+DEFAULT_SPEC_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "config", "qdrant_collections.yaml"))
+
+
+@dataclass
+class CollectionSpec:
+    """
+    Desired configuration of a Qdrant collection.
+
+    Defaults suit the CommonLII cases: full-precision vectors live on disk, an int8 copy stays in
+    RAM for the HNSW search, and the top candidates are rescored against the originals.
+
+    Attributes:
+        name: Collection name.
+        vector_size: Dimension of the vectors.
+        distance: ``Cosine``, ``Dot``, ``Euclid`` or ``Manhattan``.
+        on_disk: Keep the original vectors memory-mapped on disk instead of in RAM.
+        on_disk_payload: Keep payloads on disk (they carry the full judgment text).
+        hnsw_m: Edges per node of the HNSW graph.
+        hnsw_ef_construct: Candidate list size while building the graph.
+        hnsw_on_disk: Keep the HNSW graph on disk.
+        quantization: ``"scalar"`` (int8), ``"binary"`` or None.
+        quantization_always_ram: Pin the quantized vectors in RAM.
+        quantization_quantile: Quantile used to clip outliers for scalar quantization.
+        rescore: Rescore quantized candidates with the original vectors at query time.
+        oversampling: Fetch ``limit * oversampling`` quantized candidates before rescoring.
+        indexing_threshold: Segment size (KB) above which the HNSW index is built.
+        memmap_threshold: Segment size (KB) above which a segment is memory-mapped; None keeps the server default.
+        default_segment_number: Target number of segments; 0 lets Qdrant choose.
+        payload_indexes: Payload field -> index type (``keyword``, ``datetime``, ``integer``, ``text``, ...).
+        search_dim: Two-tier layout: index only the first `search_dim` dimensions of each (Matryoshka)
+            embedding as the ``search`` vector, and keep the full vector as an unindexed ``full`` vector
+            (on disk if `on_disk`) that rescores the candidates. None stores one unnamed vector.
+        prefetch_oversampling: In the two-tier layout, ``limit * prefetch_oversampling`` candidates are
+            fetched with the ``search`` vector and rescored with the ``full`` vector.
+    """
+    name: str
+    vector_size: int
+    distance: str = "Cosine"
+    on_disk: bool = True
+    on_disk_payload: bool = True
+    hnsw_m: int = 16
+    hnsw_ef_construct: int = 128
+    hnsw_on_disk: bool = False
+    quantization: Optional[str] = "scalar"
+    quantization_always_ram: bool = True
+    quantization_quantile: float = 0.99
+    rescore: bool = True
+    oversampling: float = 2.0
+    indexing_threshold: int = 20_000
+    memmap_threshold: Optional[int] = None
+    default_segment_number: int = 0
+    payload_indexes: Dict[str, str] = field(default_factory=lambda: dict(DEFAULT_PAYLOAD_INDEXES))
+    search_dim: Optional[int] = None
+    prefetch_oversampling: float = 4.0
+
+    def __post_init__(self):
+        if self.quantization not in _QUANTIZATION_TYPES:
+            raise ValueError(f"quantization must be one of {_QUANTIZATION_TYPES}, got {self.quantization!r}")
+        if self.search_dim is not None and self.vector_size and not 0 < self.search_dim < self.vector_size:
+            raise ValueError(f"search_dim must be between 0 and vector_size ({self.vector_size}), got {self.search_dim}")
+
+    @property
+    def two_tier(self) -> bool:
+        return self.search_dim is not None
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "CollectionSpec":
+        known = {f.name for f in fields(cls)}
+        unknown = set(data) - known
+        if unknown:
+            raise ValueError(f"Unknown collection spec key(s): {sorted(unknown)}")
+        return cls(**data)
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    def vectors_config(self) -> Union[models.VectorParams, Dict[str, models.VectorParams]]:
+        distance = models.Distance(self.distance)
+        if not self.two_tier:
+            return models.VectorParams(size=self.vector_size, distance=distance, on_disk=self.on_disk)
+        return {
+            # Small enough to keep in RAM; the only vector with an HNSW graph and a quantized copy
+            SEARCH_VECTOR: models.VectorParams(
+                size=self.search_dim,
+                distance=distance,
+                on_disk=False,
+                quantization_config=self.quantization_config(),
+            ),
+            # Only read to rescore a few candidates per query: no graph (m=0)
+            FULL_VECTOR: models.VectorParams(
+                size=self.vector_size,
+                distance=distance,
+                on_disk=self.on_disk,
+                hnsw_config=models.HnswConfigDiff(m=0),
+            ),
+        }
+
+    def hnsw_config(self) -> models.HnswConfigDiff:
+        return models.HnswConfigDiff(m=self.hnsw_m, ef_construct=self.hnsw_ef_construct, on_disk=self.hnsw_on_disk)
+
+    def optimizers_config(self) -> models.OptimizersConfigDiff:
+        return models.OptimizersConfigDiff(
+            indexing_threshold=self.indexing_threshold,
+            memmap_threshold=self.memmap_threshold,
+            default_segment_number=self.default_segment_number,
+        )
+
+    def quantization_config(self) -> Optional[models.QuantizationConfig]:
+        if self.quantization == "scalar":
+            return models.ScalarQuantization(scalar=models.ScalarQuantizationConfig(
+                type=models.ScalarType.INT8,
+                quantile=self.quantization_quantile,
+                always_ram=self.quantization_always_ram,
+            ))
+        if self.quantization == "binary":
+            return models.BinaryQuantization(binary=models.BinaryQuantizationConfig(always_ram=self.quantization_always_ram))
+        return None
+
+    def search_params(self, hnsw_ef: Optional[int] = None) -> models.SearchParams:
+        """Query-time parameters matching this spec (rescoring of quantized candidates)."""
+        quantization = None
+        if self.quantization:
+            quantization = models.QuantizationSearchParams(rescore=self.rescore, oversampling=self.oversampling)
+        return models.SearchParams(hnsw_ef=hnsw_ef, quantization=quantization)
+
+    def search_vector(self, vector: Sequence[float]) -> List[float]:
+        """The ``search`` vector of a full embedding: its first `search_dim` dimensions, re-normalised."""
+        return truncate_embedding(vector, self.search_dim)
+
+    def point_vector(self, vector: Sequence[float]) -> Union[List[float], Dict[str, List[float]]]:
+        """The vector(s) to store for a full embedding in this collection."""
+        if not self.two_tier:
+            return list(vector)
+        return {SEARCH_VECTOR: self.search_vector(vector), FULL_VECTOR: list(vector)}
+
+    def to_collection_point(self, point: models.PointStruct) -> models.PointStruct:
+        """Return `point` (holding a full embedding) in this collection's vector layout."""
+        if not self.two_tier or isinstance(point.vector, dict):
+            return point
+        return models.PointStruct(id=point.id, vector=self.point_vector(point.vector), payload=point.payload)
+
+    def to_collection_points(self, points: Iterable[models.PointStruct]) -> List[models.PointStruct]:
+        return [self.to_collection_point(p) for p in points]
+
+    def prefetch_limit(self, limit: int) -> int:
+        return max(limit, math.ceil(limit * self.prefetch_oversampling))
+
+
+def truncate_embedding(vector: Sequence[float], dim: int) -> List[float]:
+    """
+    Shorten a Matryoshka embedding (OpenAI ``text-embedding-3-*``) to its first `dim` dimensions.
+
+    The prefix is re-normalised to unit length, which gives the same vector as requesting `dim`
+    dimensions from the API.
+    """
+    head = np.asarray(vector[:dim], dtype=np.float32)
+    norm = np.linalg.norm(head)
+    return (head / norm if norm else head).tolist()
+
+
+def _load_spec_options(path: str) -> Dict[str, dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        data = yaml.safe_load(f) or {}
+    return {name: dict(options or {}) for name, options in (data.get("collections") or {}).items()}
+
+
+def load_collection_specs(path: str = DEFAULT_SPEC_PATH) -> Dict[str, CollectionSpec]:
+    """
+    Load collection specs from a YAML file of the form::
+
+        collections:
+          commonlii_cases:
+            vector_size: 1536
+            quantization: scalar
+            payload_indexes: {court: keyword, decision_date: datetime}
+
+    Keys left out take the `CollectionSpec` defaults.
+    """
+    return {name: CollectionSpec.from_dict({"name": name, **options}) for name, options in _load_spec_options(path).items()}
+
+
+def collection_spec(name: str, vector_size: int, spec_path: Optional[str] = DEFAULT_SPEC_PATH) -> CollectionSpec:
+    """
+    Return the spec for collection `name`: its entry in `spec_path` if there is one, else the defaults.
+
+    `vector_size` fills in the size when the YAML entry leaves it out; a conflicting size raises ValueError.
+    """
+    options = {}
+    if spec_path and os.path.exists(spec_path):
+        options = _load_spec_options(spec_path).get(name, {})
+    options.setdefault("vector_size", vector_size)
+    if options["vector_size"] != vector_size:
+        raise ValueError(f"Spec for '{name}' expects {options['vector_size']}-d vectors, got {vector_size}-d")
+    return CollectionSpec.from_dict({"name": name, **options})
+
+
+def load_collection_spec(name: str, spec_path: Optional[str] = DEFAULT_SPEC_PATH) -> Optional[CollectionSpec]:
+    """
+    Return the spec of collection `name` from `spec_path` for the query side, or None if it has no entry.
+
+    Unlike `collection_spec`, no vector size is needed; it is 0 when the entry leaves it out.
+    """
+    if not spec_path or not os.path.exists(spec_path):
+        return None
+    options = _load_spec_options(spec_path).get(name)
+    if options is None:
+        return None
+    return CollectionSpec.from_dict({"vector_size": 0, **options, "name": name})
+
+
+def load_search_params(name: str, spec_path: Optional[str] = DEFAULT_SPEC_PATH) -> Optional[models.SearchParams]:
+    """Return the query-time search params of collection `name` from `spec_path`, or None if it has no entry."""
+    spec = load_collection_spec(name, spec_path)
+    return spec.search_params() if spec else None
+
+
+def _enum_value(value):
+    return getattr(value, "value", value)
+
+
+def apply_collection_spec(client: QdrantClient, spec: CollectionSpec) -> List[str]:
+    """
+    Create or update the collection so that it matches `spec`; safe to run repeatedly.
+
+    A missing collection is created with the full spec. For an existing collection, only the settings
+    that differ are updated (HNSW, optimizers, quantization, on-disk vectors) and missing payload
+    indexes are created; nothing is dropped, and no points are touched.
+
+    Returns:
+        List[str]: Human-readable description of the changes made (empty if already up to date).
+
+    Raises:
+        ValueError: If the existing collection has a different vector layout, size or distance; that
+        needs a new collection and a re-upload.
+    """
+    changes: List[str] = []
+    if not client.collection_exists(spec.name):
+        client.create_collection(
+            collection_name=spec.name,
+            vectors_config=spec.vectors_config(),
+            hnsw_config=spec.hnsw_config(),
+            optimizers_config=spec.optimizers_config(),
+            # Two-tier collections quantize only their search vector (see `vectors_config`)
+            quantization_config=None if spec.two_tier else spec.quantization_config(),
+            on_disk_payload=spec.on_disk_payload,
+        )
+        changes.append("created collection")
+    else:
+        info = client.get_collection(spec.name)
+        vectors = _check_vector_layout(spec, info.config.params.vectors)
+        full = vectors[FULL_VECTOR if spec.two_tier else ""]
+
+        update = {}
+        vector_diffs = {}
+        if bool(full.on_disk) != spec.on_disk:
+            vector_diffs[FULL_VECTOR if spec.two_tier else ""] = models.VectorParamsDiff(on_disk=spec.on_disk)
+            changes.append(f"on_disk={spec.on_disk}")
+        if spec.two_tier and _quantization_kind(vectors[SEARCH_VECTOR].quantization_config) != spec.quantization:
+            vector_diffs[SEARCH_VECTOR] = models.VectorParamsDiff(
+                quantization_config=spec.quantization_config() or models.Disabled.DISABLED)
+            changes.append(f"quantization={spec.quantization}")
+        if vector_diffs:
+            update["vectors_config"] = vector_diffs
+
+        hnsw = info.config.hnsw_config
+        if (hnsw.m, hnsw.ef_construct, bool(hnsw.on_disk)) != (spec.hnsw_m, spec.hnsw_ef_construct, spec.hnsw_on_disk):
+            update["hnsw_config"] = spec.hnsw_config()
+            changes.append(f"hnsw m={spec.hnsw_m} ef_construct={spec.hnsw_ef_construct}")
+
+        opt = info.config.optimizer_config
+        wanted_opt = (spec.indexing_threshold, spec.default_segment_number)
+        if (opt.indexing_threshold, opt.default_segment_number) != wanted_opt or (
+                spec.memmap_threshold is not None and opt.memmap_threshold != spec.memmap_threshold):
+            update["optimizers_config"] = spec.optimizers_config()
+            changes.append("optimizer thresholds")
+
+        if not spec.two_tier and _quantization_kind(info.config.quantization_config) != spec.quantization:
+            update["quantization_config"] = spec.quantization_config() or models.Disabled.DISABLED
+            changes.append(f"quantization={spec.quantization}")
+
+        if update:
+            client.update_collection(collection_name=spec.name, **update)
+
+    existing = client.get_collection(spec.name).payload_schema or {}
+    for field_name, schema in spec.payload_indexes.items():
+        current = existing.get(field_name)
+        if current is not None and _enum_value(current.data_type) == schema:
+            continue
+        client.create_payload_index(spec.name, field_name=field_name, field_schema=schema, wait=True)
+        changes.append(f"payload index {field_name}:{schema}")
+
+    if changes:
+        logger.info("Provisioned collection '%s': %s", spec.name, ", ".join(changes))
+    else:
+        logger.info("Collection '%s' already matches its spec", spec.name)
+    return changes
+
+
+def _check_vector_layout(spec: CollectionSpec, vectors) -> Dict[str, models.VectorParams]:
+    """Raise ValueError unless the collection's `vectors` match `spec`; return them by name (``""`` if unnamed)."""
+    if spec.two_tier:
+        if not isinstance(vectors, dict) or set(vectors) != {SEARCH_VECTOR, FULL_VECTOR}:
+            raise ValueError(f"Collection '{spec.name}' does not have the named vectors "
+                             f"'{SEARCH_VECTOR}' and '{FULL_VECTOR}' of a two-tier spec")
+        expected = {SEARCH_VECTOR: spec.search_dim, FULL_VECTOR: spec.vector_size}
+    else:
+        if isinstance(vectors, dict):
+            raise ValueError(f"Collection '{spec.name}' uses named vectors; it does not match this spec")
+        vectors, expected = {"": vectors}, {"": spec.vector_size}
+    for name, size in expected.items():
+        params = vectors[name]
+        if params.size != size or _enum_value(params.distance) != spec.distance:
+            raise ValueError(
+                f"Collection '{spec.name}' has {params.size}-d {_enum_value(params.distance)} vectors{f' ({name!r})' if name else ''}, "
+                f"spec asks for {size}-d {spec.distance}"
+            )
+    return vectors
+
+
+def _quantization_kind(config) -> Optional[str]:
+    if isinstance(config, models.ScalarQuantization):
+        return "scalar"
+    if isinstance(config, models.BinaryQuantization):
+        return "binary"
+    return None
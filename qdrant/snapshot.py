@@ -0,0 +1,206 @@
+# snapshot.py
+
+import json
+import logging
+import os
+import time
+from dataclasses import asdict, dataclass, field
+from typing import List, Optional, Sequence
+
+import duckdb
+import httpx
+import numpy as np
+from qdrant_client import QdrantClient, models
+from qdrant_client.models import PointStruct
+
+from embeddings.document_store import DEFAULT_OFFLOAD_FIELDS, DocumentStore
+from embeddings.duckdb_reader import iter_point_batches, source_sql
+from qdrant.bulk_upload import BulkUploader
+from qdrant.provisioning import FULL_VECTOR, apply_collection_spec, collection_spec
+from qdrant.sync import with_content_hash
+
+logger = logging.getLogger(__name__)
+
+_TRANSFER_TIMEOUT = httpx.Timeout(connect=30.0, read=3600.0, write=3600.0, pool=30.0)
+_CHUNK_BYTES = 1 << 20
+
+
+def _headers(api_key: Optional[str]) -> dict:
+    return {"api-key": api_key} if api_key else {}
+
+
+def wait_until_optimized(client: QdrantClient, collection_name: str, *, timeout: float = 3600.0, poll: float = 5.0) -> None:
+    """Block until the collection is green (all segments indexed and optimised), or raise TimeoutError."""
+    deadline = time.monotonic() + timeout
+    while True:
+        info = client.get_collection(collection_name)
+        status = getattr(info.status, "value", info.status)
+        if status == "green":
+            return
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"Collection '{collection_name}' still {status} after {timeout:.0f}s")
+        logger.info("Waiting for '%s' to finish optimising (status %s, %s indexed vectors)",
+                    collection_name, status, info.indexed_vectors_count)
+        time.sleep(poll)
+
+
+def build_snapshot(
+    duckdb_path: str,
+    collection_name: str,
+    out_dir: str,
+    *,
+    local_url: str = "http://localhost:6333",
+    local_api_key: Optional[str] = None,
+    table_name: str = "embedded_points",
+    doc_store: Optional[DocumentStore] = None,
+    offload_fields: Sequence[str] = DEFAULT_OFFLOAD_FIELDS,
+    upload_workers: int = 8,
+) -> str:
+    """
+    Build `collection_name` from a DuckDB point store on a local Qdrant instance and download its snapshot.
+
+    The local collection is recreated from the collection spec (see `qdrant.provisioning`), bulk-loaded
+    with indexing switched off, then re-enabled and left to optimise before the snapshot is taken, so the
+    snapshot restores as a fully indexed collection.
+
+    Returns:
+        str: Path of the downloaded ``.snapshot`` file.
+    """
+    client = QdrantClient(url=local_url, api_key=local_api_key, timeout=300)
+
+    dim = _vector_size(duckdb_path, table_name)
+    spec = collection_spec(collection_name, dim)
+    if client.collection_exists(collection_name):
+        logger.info("Dropping existing local collection '%s'", collection_name)
+        client.delete_collection(collection_name)
+    apply_collection_spec(client, spec)
+
+    # Building the HNSW graph once at the end is much cheaper than maintaining it during the load
+    client.update_collection(collection_name, optimizers_config=models.OptimizersConfigDiff(indexing_threshold=0))
+
+    def points():
+        for batch in iter_point_batches(duckdb_path, table_name):
+            loaded = with_content_hash([
+                PointStruct(id=pid, vector=vector, payload=json.loads(payload))
+                for pid, vector, payload in zip(batch.ids.tolist(), batch.vectors.tolist(), batch.payloads)
+            ])
+            yield from doc_store.offload(loaded, offload_fields) if doc_store else loaded
+
+    stats = BulkUploader(client, collection_name, workers=upload_workers, verify=False, spec=spec).upload(points())
+    if stats["points_failed"]:
+        raise RuntimeError(f"{stats['points_failed']} points failed to load into the local collection")
+
+    client.update_collection(collection_name, optimizers_config=spec.optimizers_config())
+    wait_until_optimized(client, collection_name)
+
+    snapshot = client.create_snapshot(collection_name, wait=True)
+    os.makedirs(out_dir, exist_ok=True)
+    path = os.path.join(out_dir, snapshot.name)
+    url = f"{local_url.rstrip('/')}/collections/{collection_name}/snapshots/{snapshot.name}"
+    logger.info("Downloading snapshot %s (%.1f MB)", snapshot.name, (snapshot.size or 0) / 1024 ** 2)
+    with httpx.stream("GET", url, headers=_headers(local_api_key), timeout=_TRANSFER_TIMEOUT) as response:
+        response.raise_for_status()
+        with open(path, "wb") as f:
+            for chunk in response.iter_bytes(_CHUNK_BYTES):
+                f.write(chunk)
+    logger.info("✅ Snapshot of %d points written to %s", stats["points_uploaded"], path)
+    return path
+
+
+def restore_snapshot(snapshot_path: str, collection_name: str, *, target_url: str, api_key: Optional[str] = None) -> None:
+    """
+    Upload a snapshot file to the target cluster, replacing the collection's contents in one transfer.
+
+    Uses ``POST /collections/{name}/snapshots/upload?priority=snapshot``: the snapshot's data wins over
+    whatever the collection held before.
+    """
+    url = f"{target_url.rstrip('/')}/collections/{collection_name}/snapshots/upload"
+    size_mb = os.path.getsize(snapshot_path) / 1024 ** 2
+    logger.info("Uploading %s (%.1f MB) to %s", snapshot_path, size_mb, url)
+    started = time.monotonic()
+    with open(snapshot_path, "rb") as f:
+        response = httpx.post(
+            url,
+            params={"priority": "snapshot", "wait": "true"},
+            files={"snapshot": (os.path.basename(snapshot_path), f, "application/octet-stream")},
+            headers=_headers(api_key),
+            timeout=_TRANSFER_TIMEOUT,
+        )
+    response.raise_for_status()
+    logger.info("✅ Restored '%s' in %.0fs", collection_name, time.monotonic() - started)
+
+
+@dataclass
+class VerifyReport:
+    expected_points: int
+    target_points: int
+    sampled: int = 0
+    missing: List = field(default_factory=list)
+    mismatched: List = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return self.expected_points == self.target_points and not self.missing and not self.mismatched
+
+    def as_dict(self) -> dict:
+        return {**asdict(self), "ok": self.ok}
+
+
+def verify_collection(
+    client: QdrantClient,
+    collection_name: str,
+    duckdb_path: str,
+    *,
+    table_name: str = "embedded_points",
+    sample_size: int = 200,
+    atol: float = 1e-4,
+) -> VerifyReport:
+    """
+    Check a collection against the DuckDB point store it was built from.
+
+    Compares the exact point count with the number of local rows, then retrieves a random sample of
+    points and compares their vectors with the local ones (both unit-normalised, since Qdrant stores
+    cosine vectors normalised).
+    """
+    con = duckdb.connect(duckdb_path)
+    try:
+        source = source_sql(table_name)
+        expected = con.execute(f"SELECT COUNT(*) FROM {source}").fetchone()[0]
+        sample = con.execute(f"SELECT id, vector FROM {source} USING SAMPLE {int(sample_size)} ROWS").fetchall()
+    finally:
+        con.close()
+
+    report = VerifyReport(expected_points=expected, target_points=client.count(collection_name, exact=True).count)
+    if sample:
+        ids = [row[0] for row in sample]
+        local = {row[0]: _normalise(row[1]) for row in sample}
+        remote = {}
+        for record in client.retrieve(collection_name, ids=ids, with_vectors=True, with_payload=False):
+            # Two-tier collections: the stored embedding is the full vector
+            remote[record.id] = record.vector[FULL_VECTOR] if isinstance(record.vector, dict) else record.vector
+        report.sampled = len(ids)
+        for pid in ids:
+            if pid not in remote:
+                report.missing.append(pid)
+            elif not np.allclose(_normalise(remote[pid]), local[pid], atol=atol):
+                report.mismatched.append(pid)
+
+    log = logger.info if report.ok else logger.error
+    log("Verification of '%s': %s", collection_name, report.as_dict())
+    return report
+
+
+def _normalise(vector) -> np.ndarray:
+    v = np.asarray(vector, dtype=np.float32)
+    return v / (np.linalg.norm(v) or 1.0)
+
+
+def _vector_size(duckdb_path: str, table_name: str) -> int:
+    con = duckdb.connect(duckdb_path)
+    try:
+        row = con.execute(f"SELECT len(vector) FROM {source_sql(table_name)} LIMIT 1").fetchone()
+    finally:
+        con.close()
+    if row is None:
+        raise ValueError(f"No points in {duckdb_path}:{table_name}")
+    return row[0]
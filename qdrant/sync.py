@@ -0,0 +1,166 @@
+# sync.py
+
+import hashlib
+import json
+import logging
+from dataclasses import asdict, dataclass
+from typing import Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+from qdrant_client import QdrantClient, models
+from qdrant_client.models import PointStruct
+
+from embeddings.document_store import DEFAULT_OFFLOAD_FIELDS, DocumentStore
+from embeddings.duckdb_reader import iter_point_batches
+from qdrant.bulk_upload import BulkUploader, estimate_point_bytes
+
+CONTENT_HASH_KEY = "content_hash"
+_SCROLL_PAGE = 1000
+_DELETE_CHUNK = 1000
+
+
+def point_content_hash(vector: Sequence[float], payload: dict) -> str:
+    """
+    Hash of a point's float32 vector and canonical payload JSON (without the hash field itself).
+
+    Identical for a PointStruct built in memory and for the same point read back from DuckDB.
+    """
+    digest = hashlib.sha256(np.asarray(vector, dtype=np.float32).tobytes())
+    body = {k: v for k, v in payload.items() if k != CONTENT_HASH_KEY}
+    digest.update(json.dumps(body, sort_keys=True, separators=(",", ":")).encode("utf-8"))
+    return digest.hexdigest()[:32]
+
+
+def with_content_hash(points: Sequence[PointStruct]) -> List[PointStruct]:
+    """Return copies of `points` whose payload carries their `CONTENT_HASH_KEY`."""
+    return [
+        PointStruct(id=p.id, vector=p.vector, payload={**(p.payload or {}), CONTENT_HASH_KEY: point_content_hash(p.vector, p.payload or {})})
+        for p in points
+    ]
+
+
+@dataclass
+class SyncReport:
+    local_points: int = 0
+    remote_points: int = 0
+    new: int = 0
+    changed: int = 0
+    unchanged: int = 0
+    deleted: int = 0
+    upserted: int = 0
+    failed: int = 0
+    bytes_uploaded: int = 0
+    dry_run: bool = False
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+class DeltaSync:
+    """
+    Bring a Qdrant collection in line with the `embedded_points` table of a DuckDB point store.
+
+    Every point uploaded through this class (or `StreamingUploadPipeline`) carries a content hash of
+    its vector and payload in ``payload["content_hash"]``. A sync scrolls the collection fetching
+    only that field, hashes the local rows, and then:
+
+    * upserts local points that are missing remotely or whose hash differs,
+    * deletes remote points that no longer exist locally (unless `delete_missing` is False),
+    * leaves everything else alone.
+
+    Points uploaded before hashes were recorded have no hash, so they are re-sent once.
+    """
+
+    def __init__(
+        self,
+        client: QdrantClient,
+        collection_name: str,
+        duckdb_path: str,
+        *,
+        table_name: str = "embedded_points",
+        uploader: Optional[BulkUploader] = None,
+        doc_store: Optional[DocumentStore] = None,
+        offload_fields: Sequence[str] = DEFAULT_OFFLOAD_FIELDS,
+        read_batch_size: int = 10_000,
+    ):
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.client = client
+        self.collection_name = collection_name
+        self.duckdb_path = duckdb_path
+        self.table_name = table_name
+        self.uploader = uploader or BulkUploader(client, collection_name)
+        self.doc_store = doc_store
+        self.offload_fields = list(offload_fields)
+        self.read_batch_size = read_batch_size
+
+    def remote_hashes(self) -> Dict:
+        """Return ``{point id: content hash or None}`` for every point of the collection."""
+        hashes: Dict = {}
+        offset = None
+        while True:
+            records, offset = self.client.scroll(
+                self.collection_name,
+                limit=_SCROLL_PAGE,
+                offset=offset,
+                with_payload=[CONTENT_HASH_KEY],
+                with_vectors=False,
+            )
+            for record in records:
+                hashes[record.id] = (record.payload or {}).get(CONTENT_HASH_KEY)
+            if offset is None:
+                return hashes
+
+    def run(self, *, dry_run: bool = False, delete_missing: bool = True) -> SyncReport:
+        """Sync the collection and return what was (or, with `dry_run`, would be) changed."""
+        report = SyncReport(dry_run=dry_run)
+        remote = self.remote_hashes() if self.client.collection_exists(self.collection_name) else {}
+        report.remote_points = len(remote)
+        self.logger.info("Collection '%s' holds %d points", self.collection_name, len(remote))
+
+        local_ids = set()
+
+        def changed_points() -> Iterator[PointStruct]:
+            for batch in iter_point_batches(self.duckdb_path, self.table_name, batch_size=self.read_batch_size):
+                todo = []
+                for point_id, vector, payload_json in zip(batch.ids.tolist(), batch.vectors, batch.payloads):
+                    local_ids.add(point_id)
+                    payload = json.loads(payload_json)
+                    content_hash = point_content_hash(vector, payload)
+                    remote_hash = remote.get(point_id, False)
+                    if remote_hash == content_hash:
+                        report.unchanged += 1
+                        continue
+                    if remote_hash is False:
+                        report.new += 1
+                    else:
+                        report.changed += 1
+                    payload[CONTENT_HASH_KEY] = content_hash
+                    todo.append(PointStruct(id=point_id, vector=vector.tolist(), payload=payload))
+                if self.doc_store and todo:
+                    todo = self.doc_store.offload(todo, self.offload_fields)
+                for point in todo:
+                    report.bytes_uploaded += estimate_point_bytes(point)
+                yield from todo
+
+        if dry_run:
+            for _ in changed_points():
+                pass
+        else:
+            stats = self.uploader.upload(changed_points())
+            report.upserted = stats["points_uploaded"]
+            report.failed = stats["points_failed"] + stats["missing"]
+        report.local_points = len(local_ids)
+
+        gone = [pid for pid in remote if pid not in local_ids]
+        if delete_missing and gone:
+            if not dry_run:
+                for i in range(0, len(gone), _DELETE_CHUNK):
+                    self.client.delete(
+                        self.collection_name,
+                        points_selector=models.PointIdsList(points=gone[i:i + _DELETE_CHUNK]),
+                        wait=True,
+                    )
+            report.deleted = len(gone)
+
+        self.logger.info("%sSync of '%s': %s", "[dry run] " if dry_run else "", self.collection_name, report.as_dict())
+        return report
@@ -1,13 +1,32 @@
-from qdrant_client import QdrantClient, models
-from config.config_env import QDRANT_API_KEY, QDRANT_CLIENT_URL
-import json, duckdb
+import json
 import logging
 from qdrant_client.models import PointStruct
-from typing import List
+from typing import Iterator, List
+from embeddings.duckdb_reader import iter_point_batches
+from qdrant.client_factory import get_qdrant_client
+from qdrant.provisioning import apply_collection_spec, collection_spec
 
 logger = logging.getLogger(__name__)
 
-qdrant_client = QdrantClient(url=QDRANT_CLIENT_URL, api_key=QDRANT_API_KEY)
+def iter_qdrant_point_batches_from_duckdb(db_path: str, table_or_parquet: str, batch_size: int = 10_000) -> Iterator[List[PointStruct]]:
+    """
+    Streams id, vector, and payload from a DuckDB table or Parquet file as batches of Qdrant PointStruct objects.
+
+    Rows are read as Arrow record batches, so memory is bounded by `batch_size` rather than the table size.
+
+    Args:
+        db_path: path to .duckdb database (or None if querying directly from a Parquet file)
+        table_or_parquet: table name or full path to a Parquet file
+        batch_size: maximum number of points per yielded batch
+
+    Yields:
+        Lists of at most `batch_size` PointStruct ready for Qdrant upsert
+    """
+    for batch in iter_point_batches(db_path, table_or_parquet, batch_size=batch_size):
+        yield [
+            PointStruct(id=point_id, vector=vector, payload=json.loads(payload))
+            for point_id, vector, payload in zip(batch.ids.tolist(), batch.vectors.tolist(), batch.payloads)
+        ]
 
 def prepare_qdrant_points_from_duckdb(db_path: str, table_or_parquet: str) -> List[PointStruct]:
     """
@@ -21,22 +40,7 @@ def prepare_qdrant_points_from_duckdb(db_path: str, table_or_parquet: str) -> Li
     Returns:
         List of PointStruct ready for Qdrant upsert
     """
-    # DuckDB connection
-    con = duckdb.connect(database=db_path) if db_path else duckdb.connect()
-
-    # Read data
-    qdrant_points_df = con.execute(f"SELECT id, vector, payload FROM '{table_or_parquet}'").df()
-
-    # Convert to PointStruct list
-    points = []
-    for _, row in qdrant_points_df.iterrows():
-        points.append(PointStruct(
-            id=row["id"],
-            vector=row["vector"],
-            payload=json.loads(row["payload"])
-        ))
-
-    return points
+    return [point for batch in iter_qdrant_point_batches_from_duckdb(db_path, table_or_parquet) for point in batch]
 
 def upload_points_to_qdrant(points: List[PointStruct], collection_name: str):
     """
@@ -46,27 +50,16 @@ def upload_points_to_qdrant(points: List[PointStruct], collection_name: str):
         points: List of PointStruct objects
         collection_name: Name of the Qdrant collection to upload to
     """ 
-  
-    # Create collection if it doesn't exist
-    if not qdrant_client.collection_exists(collection_name):
-        qdrant_client.create_collection(
-            collection_name=collection_name,
-            vectors_config=models.VectorParams(
-                size=len(points[0].vector),
-                distance=models.Distance.COSINE
-            )
-        )
-    else: 
-        logger.info(f"Collection '{collection_name}' already exists.")
-    
-    # Upload points
+    qdrant_client = get_qdrant_client()
+
+    # Create the collection (or bring it up to its spec) before uploading
+    spec = collection_spec(collection_name, len(points[0].vector))
+    apply_collection_spec(qdrant_client, spec)
+
+    # Upload points, with the vector layout of the spec (named search/full vectors in a two-tier collection)
     qdrant_client.upsert(
         collection_name=collection_name,
-        points=points
+        points=spec.to_collection_points(points)
     )
 
-    print(f"Uploaded {len(points)} points to Qdrant collection '{collection_name}'.")
-    
-    # Close Qdrant connection
-    qdrant_client.close()
-    logger.info(f"Closed Qdrant connection.")
+    logger.info("Uploaded %d points to Qdrant collection '%s'", len(points), collection_name)
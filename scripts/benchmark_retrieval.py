@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Benchmark retrieval quality and speed against exact ground truth.
+
+For every variant in VARIANTS, the DuckDB point store is loaded into its own collection (created
+from the BASE_COLLECTION spec with the variant's overrides) and the query set is run through
+`QdrantQueryRetriever`. The local backends in LOCAL_BACKENDS are measured the same way. Query
+vectors are precomputed, so no embedding API is called while timing.
+
+Reported per variant: recall@k versus exact NumPy top-k, p50/p95/p99 latency and QPS at each
+concurrency level, server and client memory. Results are written as JSON to RESULTS_DIR so runs
+can be compared over time.
+
+QDRANT_URL should be a local container (`docker run -p 6333:6333 qdrant/qdrant`); Qdrant local mode
+(":memory:" or a directory) also works but ignores HNSW/quantization settings and runs single-threaded.
+
+Edit the CONFIG block below to suit your project.
+"""
+import sys
+import os
+import argparse
+import json
+import time
+from dataclasses import replace
+from datetime import datetime, timezone
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from qdrant_client import QdrantClient
+from qdrant_client.http.models import PointStruct
+from embeddings.benchmark import (StaticQueryEmbedder, benchmark_retriever, exact_top_k, load_query_set,
+                                  qdrant_memory_bytes, sample_query_set)
+from embeddings.duckdb_reader import iter_point_batches
+from embeddings.local_retriever import LocalVectorRetriever
+from embeddings.retriever import QdrantQueryRetriever
+from qdrant.bulk_upload import BulkUploader
+from qdrant.provisioning import apply_collection_spec, collection_spec
+from qdrant.snapshot import wait_until_optimized
+
+# ─── CONFIG ────────────────────────────────────────────────────────────────────
+DUCKDB_PATH         = "commonlii_cases.duckdb"      # corpus (point store)
+DUCKDB_TABLE        = "embedded_points"
+QUERY_SET_PATH      = None                          # JSONL of {"query": ..., "vector": [...]}; None samples stored points
+SAMPLED_QUERIES     = 200                           # queries sampled when QUERY_SET_PATH is None
+QUERY_NOISE         = 0.05                          # relative noise added to sampled query vectors
+TOP_K               = 10
+CONCURRENCY_LEVELS  = [1, 4, 16]
+QDRANT_URL          = "http://localhost:6333"       # local container, or ":memory:" / a path for local mode
+QDRANT_API_KEY      = None
+BASE_COLLECTION     = "commonlii_cases"             # spec (config/qdrant_collections.yaml) the variants start from
+VARIANTS = {                                        # CollectionSpec overrides; "hnsw_ef" is a query-time setting
+    "spec":            {},
+    "no_quantization": {"quantization": None},
+    "binary":          {"quantization": "binary", "oversampling": 3.0},
+    "hnsw_m32":        {"hnsw_m": 32, "hnsw_ef_construct": 256},
+    "ef_256":          {"hnsw_ef": 256},
+    "two_tier_256":    {"search_dim": 256},
+}
+LOCAL_BACKENDS      = ["exact", "ivf"]              # LocalVectorRetriever modes to include; [] to skip
+DROP_PAYLOAD_FIELDS = ["full_text"]                 # not uploaded, as in production
+UPLOAD_WORKERS      = 8
+RESULTS_DIR         = "benchmarks"
+KEEP_COLLECTIONS    = False                         # keep the benchmark collections afterwards
+# ───────────────────────────────────────────────────────────────────────────────
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--variants", nargs="*", default=list(VARIANTS), help="subset of VARIANTS to run")
+    parser.add_argument("--no-local", action="store_true", help="skip LOCAL_BACKENDS")
+    parser.add_argument("--output", help="results file (default: RESULTS_DIR/retrieval_<timestamp>.json)")
+    return parser.parse_args()
+
+
+def is_local_mode(url: str) -> bool:
+    return not url.startswith(("http://", "https://"))
+
+
+def make_client() -> QdrantClient:
+    if QDRANT_URL == ":memory:":
+        return QdrantClient(location=":memory:")
+    if is_local_mode(QDRANT_URL):
+        return QdrantClient(path=QDRANT_URL)
+    return QdrantClient(url=QDRANT_URL, api_key=QDRANT_API_KEY, timeout=120)
+
+
+def iter_points():
+    for batch in iter_point_batches(DUCKDB_PATH, DUCKDB_TABLE, read_only=True):
+        for id_, vector, payload in zip(batch.ids.tolist(), batch.vectors.tolist(), batch.payloads):
+            payload = {k: v for k, v in json.loads(payload).items() if k not in DROP_PAYLOAD_FIELDS}
+            yield PointStruct(id=id_, vector=vector, payload=payload)
+
+
+def build_collection(client: QdrantClient, spec) -> float:
+    """(Re)create and fill the collection of `spec`; return the seconds until it is optimised."""
+    started = time.monotonic()
+    if client.collection_exists(spec.name):
+        client.delete_collection(spec.name)
+    apply_collection_spec(client, spec)
+    workers = 1 if is_local_mode(QDRANT_URL) else UPLOAD_WORKERS   # local mode is not thread-safe
+    stats = BulkUploader(client, spec.name, workers=workers, verify=False, spec=spec).upload(iter_points())
+    if stats["points_failed"]:
+        raise RuntimeError(f"{stats['points_failed']} points failed to load into '{spec.name}'")
+    wait_until_optimized(client, spec.name)
+    return time.monotonic() - started
+
+
+def main() -> None:
+    args = parse_args()
+    unknown = set(args.variants) - set(VARIANTS)
+    if unknown:
+        raise SystemExit(f"Unknown variant(s): {sorted(unknown)}")
+
+    if QUERY_SET_PATH:
+        from langchain_openai import OpenAIEmbeddings
+        query_set = load_query_set(QUERY_SET_PATH, OpenAIEmbeddings(model="text-embedding-3-small").embed_documents)
+    else:
+        query_set = sample_query_set(DUCKDB_PATH, DUCKDB_TABLE, SAMPLED_QUERIES, noise=QUERY_NOISE)
+    embedder = StaticQueryEmbedder(query_set)
+    dim = query_set.vectors.shape[1]
+
+    print(f"Computing exact top-{TOP_K} for {len(query_set.texts)} queries …")
+    truth = exact_top_k(DUCKDB_PATH, DUCKDB_TABLE, query_set.vectors, TOP_K)
+    levels = [1] if is_local_mode(QDRANT_URL) else CONCURRENCY_LEVELS
+
+    client = make_client()
+    server_version = None
+    if not is_local_mode(QDRANT_URL):
+        server_version = client.info().version
+
+    results = []
+    built = {}   # collections are shared by variants whose specs only differ at query time
+    for name in args.variants:
+        overrides = dict(VARIANTS[name])
+        hnsw_ef = overrides.pop("hnsw_ef", None)
+        spec = replace(collection_spec(BASE_COLLECTION, dim), **overrides)
+        spec_key = json.dumps({**spec.to_dict(), "name": None}, sort_keys=True)
+        if spec_key not in built:
+            spec = replace(spec, name=f"{BASE_COLLECTION}__bench_{len(built)}")
+            print(f"Building collection for variant '{name}' …")
+            built[spec_key] = (spec.name, build_collection(client, spec))
+        collection_name, build_seconds = built[spec_key]
+
+        retriever = QdrantQueryRetriever(
+            collection_name=collection_name,
+            client=client,
+            embeddings=embedder,
+            search_params=spec.search_params(hnsw_ef=hnsw_ef),
+            spec=replace(spec, name=collection_name),
+        )
+        print(f"Running variant '{name}' …")
+        result = benchmark_retriever(retriever, query_set, truth, k=TOP_K, concurrency_levels=levels)
+        if not is_local_mode(QDRANT_URL):
+            result["server_memory"] = qdrant_memory_bytes(QDRANT_URL, QDRANT_API_KEY)
+        results.append({"name": name, "backend": "qdrant", "collection": collection_name,
+                         "config": {**VARIANTS[name]}, "build_seconds": build_seconds, **result})
+
+    for mode in ([] if args.no_local else LOCAL_BACKENDS):
+        started = time.monotonic()
+        retriever = LocalVectorRetriever(duckdb_path=DUCKDB_PATH, table_name=DUCKDB_TABLE, embeddings=embedder,
+                                         index="ivf" if mode == "ivf" else None)
+        build_seconds = time.monotonic() - started
+        print(f"Running local backend '{mode}' …")
+        result = benchmark_retriever(retriever, query_set, truth, k=TOP_K, concurrency_levels=CONCURRENCY_LEVELS)
+        results.append({"name": f"local_{mode}", "backend": "local", "config": {"index": mode},
+                        "build_seconds": build_seconds, **result})
+        retriever.close()
+
+    if not KEEP_COLLECTIONS:
+        for collection_name, _ in built.values():
+            client.delete_collection(collection_name)
+
+    report = {
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "qdrant": {"url": QDRANT_URL, "version": server_version},
+        "corpus": {"path": DUCKDB_PATH, "table": DUCKDB_TABLE, "dim": dim},
+        "queries": {"source": QUERY_SET_PATH or "sampled", "count": len(query_set.texts)},
+        "k": TOP_K,
+        "results": results,
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f"retrieval_{datetime.now():%Y%m%d_%H%M%S}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    recall_key = f"recall_at_{TOP_K}"
+    print(f"\n{'variant':<20} {recall_key:>12} {'conc':>5} {'QPS':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for result in results:
+        for level in result["levels"]:
+            print(f"{result['name']:<20} {result[recall_key]:>12.4f} {level['concurrency']:>5} {level['qps']:>9.1f} "
+                  f"{level.get('p50_ms', float('nan')):>8.2f} {level.get('p95_ms', float('nan')):>8.2f} "
+                  f"{level.get('p99_ms', float('nan')):>8.2f}")
+    print(f"\nResults written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,18 +3,30 @@
 Embed every JSON file under `output_probe/` and upload all vectors to Qdrant.
 
 Edit the CONFIG block below to suit your project.
+
+Progress is checkpointed: points are committed to SAVE_DUCKDB_PATH in batches and every
+committed file is recorded in an ingestion manifest, so an interrupted run resumes where it
+stopped. Use --changed-only for nightly re-runs after a scrape, and --full to start over.
+
+With UPLOAD_TO_QDRANT on, committed points are also streamed to Qdrant by background upload
+workers while the next files are being embedded (see StreamingUploadPipeline). A file is marked
+done once its points are in DuckDB; uploads that still fail after retries are logged and can be
+re-sent from DuckDB with upload_duckdb_points_to_qdrant.py.
 """
 import sys
 import os
-import re
-import math
-
+import argparse
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 import os
-from typing import Iterator, List
+from typing import Dict, Iterator, List, Optional
 from embeddings.embeddings import OpenAIEmbedder          # <- your class
+from embeddings.batching import MAX_INPUT_TOKENS
+from embeddings.cache import EmbeddingCache
+from embeddings.manifest import IngestionManifest
+from embeddings.upload_pipeline import StreamingUploadPipeline
+from embeddings.document_store import DocumentStore
 from qdrant_client.http.models import PointStruct
 
 # ─── CONFIG ────────────────────────────────────────────────────────────────────
@@ -22,7 +34,24 @@ ROOT_DIR            = "/Users/dlau/Documents/GitHub/YALaw/output_probe/"  # fold
 JSON_FIELD          = "full_text"      # field to embed (dot-notation OK)
 ID_FIELD            = "id"                      # field for the vector ID
 QDRANT_COLLECTION   = "commonlii_cases"        # Qdrant collection name
-SAVE_DUCKDB_PATH    = "commonlii_cases.duckdb"   # set to None to skip local save
+SAVE_DUCKDB_PATH    = "commonlii_cases.duckdb"   # local point store, also holds the ingestion manifest
+COMMIT_EVERY_POINTS = 2_000                     # commit points + manifest after this many points
+EMBEDDING_CACHE_PATH = "embedding_cache.duckdb"  # set to None to always call the API
+EMBEDDING_CACHE_MAX_BYTES = 8 * 1024 ** 3       # evict least recently used beyond this size
+FILES_PER_ROUND     = 64                        # files embedded concurrently per round
+MAX_CONCURRENCY     = 8                         # in-flight embedding requests
+REQUESTS_PER_MINUTE = 3_000                     # match your OpenAI tier
+TOKENS_PER_MINUTE   = 1_000_000                 # match your OpenAI tier
+POOLED_CASE_VECTOR  = True                      # also keep one pooled vector per split judgment
+CHUNK_ALL           = False                     # index every judgment as passages, for grouped search by case
+CHUNK_TOKENS        = 512                       # passage size with CHUNK_ALL
+CHUNK_OVERLAP       = 64                        # tokens shared by consecutive passages with CHUNK_ALL
+UPLOAD_TO_QDRANT    = True                      # stream committed points to QDRANT_COLLECTION
+UPLOAD_BATCH_SIZE   = 256                       # points per Qdrant upsert
+UPLOAD_QUEUE_SIZE   = 8                         # upload batches buffered between embedding and upload
+UPLOAD_WORKERS      = 4                         # concurrent Qdrant upserts
+DOCUMENT_STORE_PATH = "commonlii_documents.duckdb"  # large payload fields go here, not to Qdrant; None to keep them inline
+OFFLOAD_FIELDS      = ["full_text"]             # payload fields moved to DOCUMENT_STORE_PATH
 # ───────────────────────────────────────────────────────────────────────────────
 
 
@@ -34,70 +63,124 @@ def iter_json_files(root: str) -> Iterator[str]:
                 yield os.path.join(dirpath, name)
 
 
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--changed-only", action="store_true",
+                      help="also re-ingest finished files whose content changed since they were ingested")
+    mode.add_argument("--full", action="store_true",
+                      help="ignore the manifest and re-ingest every file")
+    return parser.parse_args()
+
+
+def commit(embedder: OpenAIEmbedder, manifest: IngestionManifest, pending: Dict[str, List[PointStruct]],
+           pipeline: Optional[StreamingUploadPipeline] = None, doc_store: Optional[DocumentStore] = None) -> None:
+    """
+    Write the points of `pending` files to DuckDB (and queue them for Qdrant), then mark those files done.
+
+    With a `doc_store`, the OFFLOAD_FIELDS of every point are moved there first, so both the DuckDB
+    backup and Qdrant receive slim payloads.
+    """
+    if not pending:
+        return
+    # Case ids are recorded too: a split case without a pooled point still owns its full text in the doc store
+    point_ids = {
+        path: list(dict.fromkeys([p.id for p in pts] + [p.payload["case_id"] for p in pts if "case_id" in (p.payload or {})]))
+        for path, pts in pending.items()
+    }
+
+    # Rows are upserted by id; only drop points a previous run stored for these files that are no longer produced
+    fresh = {pid for ids in point_ids.values() for pid in ids}
+    stale = {pid for path in pending for pid in manifest.point_ids(path)} - fresh
+    embedder.delete_points_from_duckdb(list(stale), db_path=SAVE_DUCKDB_PATH)
+
+    points = [p for pts in pending.values() for p in pts]
+    if doc_store:
+        doc_store.delete_many(list(stale))
+        points = doc_store.offload(points, OFFLOAD_FIELDS)
+    if pipeline:
+        pipeline.submit(points)
+    else:
+        embedder.upload_points_to_duckdb(points, db_path=SAVE_DUCKDB_PATH)
+    manifest.mark_done(point_ids)
+    embedder.logger.info("💾 Committed %d file(s), %d point(s)", len(pending), len(points))
+    pending.clear()
+
+
 def main() -> None:
-    embedder = OpenAIEmbedder()
-    all_points: List[PointStruct] = []
-
-    for path in iter_json_files(ROOT_DIR):
-        embedder.logger.info("→ Embedding %s", path)
-        try:
-            pts = embedder.embed_json_file(
-                json_file_path=path,
+    args = parse_args()
+    cache = EmbeddingCache(EMBEDDING_CACHE_PATH, max_size_bytes=EMBEDDING_CACHE_MAX_BYTES) if EMBEDDING_CACHE_PATH else None
+    embedder = OpenAIEmbedder(
+        cache=cache,
+        max_concurrency=MAX_CONCURRENCY,
+        requests_per_minute=REQUESTS_PER_MINUTE,
+        tokens_per_minute=TOKENS_PER_MINUTE,
+    )
+    manifest = IngestionManifest(SAVE_DUCKDB_PATH)
+    doc_store = DocumentStore(DOCUMENT_STORE_PATH) if DOCUMENT_STORE_PATH else None
+
+    def drop_points(point_ids: List[int]) -> None:
+        embedder.delete_points_from_duckdb(point_ids, db_path=SAVE_DUCKDB_PATH)
+        if doc_store:
+            doc_store.delete_many(point_ids)
+
+    paths = sorted(iter_json_files(ROOT_DIR))
+    # Also drops the points of source files deleted since the last run (DeltaSync then removes them from Qdrant)
+    todo = manifest.plan(paths, changed_only=args.changed_only, on_missing=drop_points)
+    if not args.full:
+        paths = todo
+
+    pipeline = StreamingUploadPipeline(
+        embedder,
+        QDRANT_COLLECTION,
+        duckdb_path=SAVE_DUCKDB_PATH,
+        upload_batch_size=UPLOAD_BATCH_SIZE,
+        queue_size=UPLOAD_QUEUE_SIZE,
+        upload_workers=UPLOAD_WORKERS,
+    ) if UPLOAD_TO_QDRANT else None
+
+    pending: Dict[str, List[PointStruct]] = {}
+    n_points = 0
+    try:
+        for start in range(0, len(paths), FILES_PER_ROUND):
+            round_paths = paths[start:start + FILES_PER_ROUND]
+            embedder.logger.info("→ Embedding files %d to %d of %d", start + 1, start + len(round_paths), len(paths))
+            results = embedder.embed_json_files(
+                round_paths,
                 json_field=JSON_FIELD,
                 id_field=ID_FIELD,
+                split_oversized=True,           # count tokens locally; split long judgments up front
+                pooled_vector=POOLED_CASE_VECTOR,
+                chunk_all=CHUNK_ALL,
+                max_chunk_tokens=CHUNK_TOKENS if CHUNK_ALL else MAX_INPUT_TOKENS,
+                chunk_overlap=CHUNK_OVERLAP if CHUNK_ALL else 0,
             )
-            all_points.extend(pts)
-        except Exception as exc:
-            embedder.logger.error("🔄  Retrying %s (%s)", path, exc)
-            embedder.logger.info("Attempting to embed %s in chunks", path)
-            
-            # Default chunk count in case parsing fails
-            num_of_chunks = 3
-
-            # Try to extract token information from the exception message
-            try:
-                exc_str = str(exc)
-                match = re.search(r'you requested (\d+) tokens', exc_str)
-                if match:
-                    requested_tokens = int(match.group(1))
-                    # Use a default or known max_tokens, e.g., 8192
-                    MAX_TOKENS = 8192
-                    num_of_chunks = math.ceil(requested_tokens / MAX_TOKENS)
-                    embedder.logger.info("Requested %d tokens. Chunking into %d parts (max %d tokens each).",
-                                        requested_tokens, num_of_chunks, MAX_TOKENS)
-            except Exception as parse_exc:
-                embedder.logger.warning("⚠️  Failed to parse token info from error: %s", parse_exc)
-
-            try:
-                pts = embedder.embed_json_file_in_chunks(
-                    json_file_path=path,
-                    json_field=JSON_FIELD,
-                    id_field=ID_FIELD,
-                    num_of_chunks=num_of_chunks
-                )
-                all_points.extend(pts)
-                embedder.logger.info("✅  Successfully embedded %s in chunks (added %d points to all_points)", path, len(pts))
-            except Exception as chunk_exc:
-                embedder.logger.error("⚠️  FAILED to embed %s in %d chunks (%s)", path, num_of_chunks, chunk_exc)
-            
-
-    if not all_points:
-        raise RuntimeError("No embeddings were created — check CONFIG settings.")
-
-    # Optional local backup
-    if SAVE_DUCKDB_PATH:
-        embedder.upload_points_to_duckdb(all_points, db_path=SAVE_DUCKDB_PATH)
 
-    # Chunked upload to Qdrant: 10 points at a time
-    # BATCH_SIZE = 10
-    # for i in range(0, len(all_points), BATCH_SIZE):
-    #     chunk = all_points[i:i + BATCH_SIZE]
-    #     embedder.upload_points_to_qdrant(chunk, collection_name=QDRANT_COLLECTION)
-    #     embedder.logger.info("🔼 Uploaded points %d to %d", i + 1, i + len(chunk))
-    #     # Optional delay to reduce Qdrant server load
-
-    # embedder.logger.info("✅ %d total points uploaded to '%s'",
-    #                      len(all_points), QDRANT_COLLECTION)
+            for path, result in results.items():
+                if isinstance(result, Exception):
+                    embedder.logger.error("⚠️  FAILED to embed %s (%s)", path, result)
+                    manifest.mark_failed(path, str(result))
+                    continue
+                pending[path] = result
+                n_points += len(result)
+
+            if sum(map(len, pending.values())) >= COMMIT_EVERY_POINTS:
+                commit(embedder, manifest, pending, pipeline, doc_store)
+    finally:
+        # Also runs on Ctrl-C / crashes: keep whatever has already been embedded
+        commit(embedder, manifest, pending, pipeline, doc_store)
+        if pipeline:
+            pipeline.close()
+        if doc_store:
+            embedder.logger.info("Document store stats: %s", doc_store.stats())
+            doc_store.close()
+
+    if cache:
+        embedder.logger.info("Embedding cache stats: %s", cache.stats())
+    embedder.logger.info("Manifest: %s", manifest.summary())
+
+    if paths and not n_points:
+        raise RuntimeError("No embeddings were created — check CONFIG settings.")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Full re-index of `output_probe/` through the OpenAI Batch API.
+
+Cheaper than commonlii_embed.py and not bound by the synchronous rate limits, but results
+take up to 24h. Request files and submitted batch ids are kept in BATCH_WORK_DIR, so re-running
+the script after an interruption resumes polling instead of resubmitting.
+
+Edit the CONFIG block below to suit your project.
+"""
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from embeddings.embeddings import OpenAIEmbedder
+from embeddings.cache import EmbeddingCache
+from embeddings.batching import MAX_INPUT_TOKENS
+from commonlii_embed import iter_json_files
+
+# ─── CONFIG ────────────────────────────────────────────────────────────────────
+ROOT_DIR            = "/Users/dlau/Documents/GitHub/YALaw/output_probe/"  # folder to scan (recursive)
+JSON_FIELD          = "full_text"                 # field to embed (dot-notation OK)
+ID_FIELD            = "id"                        # field for the vector ID
+SAVE_DUCKDB_PATH    = "commonlii_cases.duckdb"    # embedded points are written here
+EMBEDDING_CACHE_PATH = "embedding_cache.duckdb"   # cached inputs are not resubmitted; None to disable
+BATCH_WORK_DIR      = "batch_jobs/commonlii"      # request files + batch id state
+POLL_INTERVAL       = 300                         # seconds between status polls
+MAX_ATTEMPTS        = 3                           # submissions per input, counting the first one
+POOLED_CASE_VECTOR  = True                        # also keep one pooled vector per split judgment
+CHUNK_ALL           = False                       # index every judgment as passages, for grouped search by case
+CHUNK_TOKENS        = 512                         # passage size with CHUNK_ALL
+CHUNK_OVERLAP       = 64                          # tokens shared by consecutive passages with CHUNK_ALL
+FILES_PER_SHARD     = 256                         # files whose records are held in memory together
+# ───────────────────────────────────────────────────────────────────────────────
+
+
+def main() -> None:
+    cache = EmbeddingCache(EMBEDDING_CACHE_PATH) if EMBEDDING_CACHE_PATH else None
+    embedder = OpenAIEmbedder(cache=cache)
+
+    n_points = 0
+    # Every shard is written as soon as it is done, so the corpus is never held in memory at once
+    for points in embedder.iter_embed_json_files_offline(
+        sorted(iter_json_files(ROOT_DIR)),
+        json_field=JSON_FIELD,
+        id_field=ID_FIELD,
+        work_dir=BATCH_WORK_DIR,
+        poll_interval=POLL_INTERVAL,
+        max_attempts=MAX_ATTEMPTS,
+        pooled_vector=POOLED_CASE_VECTOR,
+        chunk_all=CHUNK_ALL,
+        max_chunk_tokens=CHUNK_TOKENS if CHUNK_ALL else MAX_INPUT_TOKENS,
+        chunk_overlap=CHUNK_OVERLAP if CHUNK_ALL else 0,
+        files_per_shard=FILES_PER_SHARD,
+    ):
+        embedder.upload_points_to_duckdb(points, db_path=SAVE_DUCKDB_PATH)
+        n_points += len(points)
+    if not n_points:
+        raise RuntimeError("No embeddings were created — check CONFIG settings.")
+    embedder.logger.info("✅ %d points written to %s", n_points, SAVE_DUCKDB_PATH)
+
+
+if __name__ == "__main__":
+    main()
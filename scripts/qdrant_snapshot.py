@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Full re-index through a snapshot instead of network upserts.
+
+  build    load the DuckDB point store into a local Qdrant instance (e.g.
+           `docker run -p 6333:6333 qdrant/qdrant`), let it optimise, and download a snapshot
+  restore  upload that snapshot to the target cluster in one transfer
+  verify   compare the target collection with the DuckDB point store (exact count + sampled vectors)
+
+The target cluster is QDRANT_CLIENT_URL / QDRANT_API_KEY from the environment.
+Edit the CONFIG block below to suit your project.
+"""
+import sys
+import os
+import argparse
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from config.config_env import QDRANT_API_KEY, QDRANT_CLIENT_URL
+from embeddings.document_store import DocumentStore
+from qdrant.client_factory import get_qdrant_client
+from qdrant.snapshot import build_snapshot, restore_snapshot, verify_collection
+
+# ─── CONFIG ────────────────────────────────────────────────────────────────────
+DUCKDB_PATH         = "commonlii_cases.duckdb"      # local point store
+DUCKDB_TABLE        = "embedded_points"             # table with id, vector, payload
+QDRANT_COLLECTION   = "commonlii_cases"             # collection to build / restore
+LOCAL_QDRANT_URL    = "http://localhost:6333"       # throwaway Qdrant used for the build
+SNAPSHOT_DIR        = "snapshots"                   # where built snapshots are written
+DOCUMENT_STORE_PATH = "commonlii_documents.duckdb"  # large payload fields still in DUCKDB_TABLE are moved here
+OFFLOAD_FIELDS      = ["full_text"]                 # payload fields kept out of Qdrant
+UPLOAD_WORKERS      = 8                             # parallel upserts into the local instance
+VERIFY_SAMPLE_SIZE  = 200                           # points whose vectors are compared
+# ───────────────────────────────────────────────────────────────────────────────
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build = commands.add_parser("build", help="build the collection locally and download a snapshot")
+    build.add_argument("--local-url", default=LOCAL_QDRANT_URL)
+
+    restore = commands.add_parser("restore", help="restore a snapshot file to the target cluster")
+    restore.add_argument("snapshot", help="path of the .snapshot file")
+    restore.add_argument("--no-verify", action="store_true", help="skip the verification after restoring")
+
+    verify = commands.add_parser("verify", help="compare a collection with the DuckDB point store")
+    verify.add_argument("--url", default=QDRANT_CLIENT_URL, help="Qdrant to check (default: the target cluster)")
+    return parser.parse_args()
+
+
+def verify(url: str, api_key) -> None:
+    report = verify_collection(
+        get_qdrant_client(url, api_key),
+        QDRANT_COLLECTION,
+        DUCKDB_PATH,
+        table_name=DUCKDB_TABLE,
+        sample_size=VERIFY_SAMPLE_SIZE,
+    )
+    print(f"Verification of '{QDRANT_COLLECTION}' at {url}:")
+    print(f"  points in DuckDB   {report.expected_points:>10,}")
+    print(f"  points in Qdrant   {report.target_points:>10,}")
+    print(f"  vectors sampled    {report.sampled:>10,}")
+    print(f"  missing            {len(report.missing):>10,}")
+    print(f"  mismatched         {len(report.mismatched):>10,}")
+    if not report.ok:
+        sys.exit(1)
+
+
+def main() -> None:
+    args = parse_args()
+
+    if args.command == "build":
+        doc_store = DocumentStore(DOCUMENT_STORE_PATH) if DOCUMENT_STORE_PATH else None
+        try:
+            path = build_snapshot(
+                DUCKDB_PATH,
+                QDRANT_COLLECTION,
+                SNAPSHOT_DIR,
+                local_url=args.local_url,
+                table_name=DUCKDB_TABLE,
+                doc_store=doc_store,
+                offload_fields=OFFLOAD_FIELDS,
+                upload_workers=UPLOAD_WORKERS,
+            )
+        finally:
+            if doc_store:
+                doc_store.close()
+        verify(args.local_url, None)
+        print(f"Snapshot ready: {path}")
+
+    elif args.command == "restore":
+        restore_snapshot(args.snapshot, QDRANT_COLLECTION, target_url=QDRANT_CLIENT_URL, api_key=QDRANT_API_KEY)
+        if not args.no_verify:
+            verify(QDRANT_CLIENT_URL, QDRANT_API_KEY)
+
+    elif args.command == "verify":
+        verify(args.url, QDRANT_API_KEY if args.url == QDRANT_CLIENT_URL else None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Delta-sync the local DuckDB point store into Qdrant.
+
+Only points that are new or whose vector/payload changed since the last upload are sent, and points
+that no longer exist locally are deleted from the collection. Run with --dry-run to see what would change.
+
+Edit the CONFIG block below to suit your project.
+"""
+import sys
+import os
+import argparse
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from embeddings.document_store import DocumentStore
+from qdrant.bulk_upload import BulkUploader
+from qdrant.client_factory import check_qdrant_health, get_qdrant_client
+from qdrant.provisioning import apply_collection_spec, collection_spec
+from qdrant.sync import DeltaSync
+
+# ─── CONFIG ────────────────────────────────────────────────────────────────────
+DUCKDB_PATH         = "commonlii_cases.duckdb"      # local point store
+DUCKDB_TABLE        = "embedded_points"             # table with id, vector, payload
+QDRANT_COLLECTION   = "commonlii_cases"             # Qdrant collection name
+VECTOR_SIZE         = 1536                          # used only if the collection has to be created
+DOCUMENT_STORE_PATH = "commonlii_documents.duckdb"  # large payload fields still in DUCKDB_TABLE are moved here
+OFFLOAD_FIELDS      = ["full_text"]                 # payload fields kept out of Qdrant
+UPLOAD_WORKERS      = 8                             # parallel upsert requests
+PREFER_GRPC         = True                          # gRPC is noticeably faster than REST for bulk upserts
+# ───────────────────────────────────────────────────────────────────────────────
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dry-run", action="store_true", help="report what would change without writing to Qdrant")
+    parser.add_argument("--keep-missing", action="store_true", help="do not delete remote points that are gone locally")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    client = get_qdrant_client(prefer_grpc=PREFER_GRPC, timeout=120, pool_size=UPLOAD_WORKERS)
+    if not check_qdrant_health(client):
+        raise RuntimeError("Qdrant is not reachable — check QDRANT_CLIENT_URL / QDRANT_API_KEY.")
+    spec = collection_spec(QDRANT_COLLECTION, VECTOR_SIZE)
+    if not args.dry_run:
+        apply_collection_spec(client, spec)
+
+    doc_store = DocumentStore(DOCUMENT_STORE_PATH) if DOCUMENT_STORE_PATH and not args.dry_run else None
+    sync = DeltaSync(
+        client,
+        QDRANT_COLLECTION,
+        DUCKDB_PATH,
+        table_name=DUCKDB_TABLE,
+        uploader=BulkUploader(client, QDRANT_COLLECTION, workers=UPLOAD_WORKERS, spec=spec),
+        doc_store=doc_store,
+        offload_fields=OFFLOAD_FIELDS,
+    )
+    report = sync.run(dry_run=args.dry_run, delete_missing=not args.keep_missing)
+
+    print(f"{'Would sync' if args.dry_run else 'Synced'} '{QDRANT_COLLECTION}' from {DUCKDB_PATH}:")
+    print(f"  local points     {report.local_points:>10,}")
+    print(f"  remote points    {report.remote_points:>10,}")
+    print(f"  new              {report.new:>10,}")
+    print(f"  changed          {report.changed:>10,}")
+    print(f"  unchanged        {report.unchanged:>10,}")
+    print(f"  deleted          {report.deleted:>10,}")
+    print(f"  bytes uploaded   {report.bytes_uploaded / 1024**2:>10,.1f} MB")
+    if report.failed:
+        print(f"  FAILED           {report.failed:>10,}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,58 +2,70 @@ import sys
 import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-import duckdb
 import json
+from itertools import chain
+from typing import Iterator, Optional
 from qdrant_client.http.models import PointStruct
-from typing import List
 from embeddings.embeddings import OpenAIEmbedder  # Replace with your actual class
+from embeddings.duckdb_reader import iter_point_batches
+from embeddings.document_store import DocumentStore
+from qdrant.bulk_upload import BulkUploader
+from qdrant.client_factory import check_qdrant_health, get_qdrant_client
+from qdrant.provisioning import collection_spec
+from qdrant.sync import with_content_hash
 
 ### CONFIGURATION ###
 DUCKDB_PATH = "commonlii_cases.duckdb"            # Path to your DuckDB database
 DUCKDB_TABLE = "embedded_points"                      # Table name containing id, vectors, payload
 QDRANT_COLLECTION_NAME = "commonlii_cases"  # Qdrant collection name
-BATCH_SIZE = 100 # Number of points to upload in a single batch
+MAX_BATCH_POINTS = 512          # Max points per upsert request
+MAX_BATCH_BYTES = 8 * 1024**2   # Max (estimated) bytes per upsert request; the server default limit is 32 MB
+UPLOAD_WORKERS = 8              # Parallel upsert requests
+READ_BATCH_SIZE = 10_000        # Rows read from DuckDB at a time
+PREFER_GRPC = True              # gRPC is noticeably faster than REST for bulk upserts
+DOCUMENT_STORE_PATH = "commonlii_documents.duckdb"  # large payload fields still in DUCKDB_TABLE are moved here; None to upload them
+OFFLOAD_FIELDS = ["full_text"]  # payload fields kept out of Qdrant
 #####################
 
-# Connect to DuckDB
-conn = duckdb.connect(DUCKDB_PATH)
 
-# Query data from DuckDB
-rows = conn.execute(f"SELECT id, vector, payload FROM {DUCKDB_TABLE}").fetchall()
+def iter_points(doc_store: Optional[DocumentStore] = None) -> Iterator[PointStruct]:
+    for batch in iter_point_batches(DUCKDB_PATH, DUCKDB_TABLE, batch_size=READ_BATCH_SIZE):
+        # Hash before offloading, as sync_duckdb_points_to_qdrant.py does, so later syncs skip these points
+        points = with_content_hash([
+            PointStruct(id=id_, vector=vector, payload=json.loads(payload))
+            for id_, vector, payload in zip(batch.ids.tolist(), batch.vectors.tolist(), batch.payloads)
+        ])
+        yield from doc_store.offload(points, OFFLOAD_FIELDS) if doc_store else points
 
-# Convert to Qdrant-compatible PointStruct
-qdrant_points: List[PointStruct] = []
 
-# Instantiate the embedder (the class with upload_points_to_qdrant)
-embedder = OpenAIEmbedder()
+def main() -> None:
+    client = get_qdrant_client(prefer_grpc=PREFER_GRPC, timeout=120, pool_size=UPLOAD_WORKERS)
+    if not check_qdrant_health(client):
+        raise RuntimeError("Qdrant is not reachable — check QDRANT_CLIENT_URL / QDRANT_API_KEY.")
+    doc_store = DocumentStore(DOCUMENT_STORE_PATH) if DOCUMENT_STORE_PATH else None
+    points = iter_points(doc_store)
+    first = next(points, None)
+    if first is None:
+        raise RuntimeError(f"No points in {DUCKDB_PATH}:{DUCKDB_TABLE}")
 
+    # Instantiate the embedder (the class with ensure_qdrant_collection)
+    embedder = OpenAIEmbedder()
+    spec = collection_spec(QDRANT_COLLECTION_NAME, len(first.vector))
+    embedder.ensure_qdrant_collection(QDRANT_COLLECTION_NAME, spec.vector_size, client=client, spec=spec)
 
-qdrant_points: List[PointStruct] = []
-
-for row in rows:
-    id_, vector_raw, payload_raw = row
+    uploader = BulkUploader(
+        client,
+        QDRANT_COLLECTION_NAME,
+        max_batch_points=MAX_BATCH_POINTS,
+        max_batch_bytes=MAX_BATCH_BYTES,
+        workers=UPLOAD_WORKERS,
+        spec=spec,
+    )
+    stats = uploader.upload(chain([first], points))
+    embedder.logger.info("Upload finished: %s", stats)
+    if stats["points_failed"] or stats["missing"]:
+        sys.exit(1)
 
-    vector = json.loads(vector_raw) if isinstance(vector_raw, str) else vector_raw
-    payload = json.loads(payload_raw) if isinstance(payload_raw, str) else payload_raw
 
-    point = PointStruct(
-        id=id_,
-        vector=vector,
-        payload=payload
-    )
-    qdrant_points.append(point)
-
-    # Upload when batch size is met
-    if len(qdrant_points) == BATCH_SIZE:
-        embedder.upload_points_to_qdrant(
-            qdrant_points=qdrant_points,
-            collection_name=QDRANT_COLLECTION_NAME,
-        )
-        qdrant_points.clear()  # Clear batch
-
-# Upload any remaining points
-if qdrant_points:
-    embedder.upload_points_to_qdrant(
-        qdrant_points=qdrant_points,
-        collection_name=QDRANT_COLLECTION_NAME,
-    )
+if __name__ == "__main__":
+    main()
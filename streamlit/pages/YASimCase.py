@@ -1,6 +1,7 @@
 
 import sys
 import os
+import logging
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
 
@@ -11,9 +12,16 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')
 # Display the names of the relevant cases, eg 10 cases
 
 import streamlit as st
+from datetime import date
 from typing import List, Dict
 from embeddings.retriever import QdrantQueryRetriever
+from embeddings.local_retriever import LocalVectorRetriever
 from embeddings.query_prompt import OpenAIQueryPrompt
+from embeddings.document_store import DocumentStore
+from embeddings.cache import EmbeddingCache
+from embeddings.query_cache import QueryEmbeddingCache
+from embeddings.query_classifier import classify_query
+from embeddings.search_filters import SearchFilters
 
 st.set_page_config(page_title="Case Finder", layout="wide")
 
@@ -21,35 +29,119 @@ OPENAI_API_KEY = st.secrets["api_keys"]["OPENAI_API_KEY"]
 QDRANT_API_KEY = st.secrets["api_keys"]["QDRANT_API_KEY"]
 QDRANT_CLIENT_URL = st.secrets["api_keys"]["QDRANT_CLIENT_URL"]
 
+# Local store of the judgment texts, which are not kept in the Qdrant payloads
+DOCUMENT_STORE_PATH = os.getenv("DOCUMENT_STORE_PATH", "commonlii_documents.duckdb")
+
+# "qdrant" searches the cluster; "local" searches the DuckDB point store in-process (no cluster needed)
+RETRIEVER_BACKEND = os.getenv("RETRIEVER_BACKEND", st.secrets.get("retriever", {}).get("backend", "qdrant"))
+LOCAL_POINTS_PATH = os.getenv("LOCAL_POINTS_PATH", "commonlii_cases.duckdb")
+LOCAL_VECTOR_CACHE_DIR = os.getenv("LOCAL_VECTOR_CACHE_DIR", ".vector_cache")
+LOCAL_INDEX = os.getenv("LOCAL_INDEX") or None  # "ivf" for approximate search on large corpora
+# Search passages (needs a collection embedded with CHUNK_ALL) and list each case once with its best passages
+GROUPED_SEARCH = os.getenv("GROUPED_SEARCH", "").lower() in ("1", "true", "yes")
+PASSAGES_PER_CASE = 3
+# Query embeddings are reused across reruns and sessions; "" keeps the cache in memory only
+QUERY_CACHE_PATH = os.getenv("QUERY_CACHE_PATH", "query_cache.duckdb")
+
 # --------------------- BACKEND ------------------------------------------
-retriever = QdrantQueryRetriever(collection_name="commonlii_cases", qdrant_url=QDRANT_CLIENT_URL, qdrant_api_key=QDRANT_API_KEY, openai_api_key=OPENAI_API_KEY)
+@st.cache_resource
+def get_document_store(path: str):
+    return DocumentStore(path, read_only=True) if os.path.exists(path) else None
+
+@st.cache_resource
+def get_query_cache(path: str):
+    # One cache per process, shared by every session
+    return QueryEmbeddingCache(EmbeddingCache(path) if path else None)
+
+@st.cache_resource
+def get_local_retriever(path: str, cache_dir: str, index: str | None):
+    # Loading (or memory-mapping) the vectors is done once per process, not on every rerun
+    return LocalVectorRetriever(duckdb_path=path, openai_api_key=OPENAI_API_KEY, document_store=get_document_store(DOCUMENT_STORE_PATH), cache_dir=cache_dir, index=index, query_cache=get_query_cache(QUERY_CACHE_PATH))
+
+if RETRIEVER_BACKEND == "local":
+    retriever = get_local_retriever(LOCAL_POINTS_PATH, LOCAL_VECTOR_CACHE_DIR, LOCAL_INDEX)
+else:
+    retriever = QdrantQueryRetriever(collection_name="commonlii_cases", qdrant_url=QDRANT_CLIENT_URL, qdrant_api_key=QDRANT_API_KEY, openai_api_key=OPENAI_API_KEY, document_store=get_document_store(DOCUMENT_STORE_PATH), query_cache=get_query_cache(QUERY_CACHE_PATH))
 openai = OpenAIQueryPrompt(OPENAI_API_KEY)
 
-def search_similar_cases(query: str, num_results: int = 20) -> List[Dict]:
+@st.cache_data(ttl=3600)
+def get_court_counts(_retriever) -> Dict:
+    # Case counts per court over the whole collection, for the court options; one call per hour for every session
+    return _retriever.facet_counts(("court",)).get("court", {})
+
+@st.cache_data(ttl=3600)
+def get_facet_counts(_retriever, filters: SearchFilters) -> Dict:
+    # Case counts per court from the payload index; refreshed hourly, and whenever the filters change
+    return _retriever.facet_counts(("court",), filters=filters).get("court", {})
+
+def search_similar_cases(query: str, num_results: int = 20, filters: SearchFilters | None = None) -> List[Dict]:
     """
     
     """
+    # Citations and case numbers are looked up exactly by the flat search, with the exact case pinned first
+    if GROUPED_SEARCH and not classify_query(query).exact:
+        return search_similar_cases_grouped(query, num_results, filters)
     
     query_response = retriever.similarity_search_by_query_with_dense_vector(
         query=query,
-        limit=num_results
+        limit=num_results,
+        filters=filters
     )
     
     results = []
-    for i in range(0, num_results):
+    for point in query_response.points:
+        results.append(
+            {
+                "id": point.id,
+                # Chunk hits point back to their case; the full text is stored under the case id
+                "case_id": point.payload.get('case_id', point.id),
+                "title": f"Case {point.id}: {point.payload.get('case_name', 'Untitled')}",
+                "court": point.payload.get('court', 'Untitled'),
+                "url": point.payload.get('source_html_url', 'http://www.commonlii.org/my/cases/'),
+                "similarity_score": point.score,
+                "decision_date": point.payload.get('decision_date', 'Unknown'),
+            }
+        )
+    return results
+
+def search_similar_cases_grouped(query: str, num_results: int = 20, filters: SearchFilters | None = None) -> List[Dict]:
+    """One result per case, in one request, carrying the case's best-matching passages."""
+    groups = retriever.search_cases_grouped(query, limit=num_results, group_size=PASSAGES_PER_CASE, filters=filters).groups
+
+    results = []
+    for group in groups:
+        best = group.hits[0]
         results.append(
             {
-                "id": query_response.points[i].id,
-                "title": f"Case {query_response.points[i].id}: {query_response.points[i].payload.get('case_name', 'Untitled')}",
-                "court": query_response.points[i].payload.get('court', 'Untitled'),
-                "url": query_response.points[i].payload.get('source_html_url', 'http://www.commonlii.org/my/cases/'),
-                "full_text": query_response.points[i].payload.get('full_text', 'Untitled'),
-                "similarity_score": query_response.points[i].score,
-                "decision_date": query_response.points[i].payload.get('decision_date', 'Unknown'),
+                "id": group.id,
+                "case_id": group.id,
+                "title": f"Case {group.id}: {best.payload.get('case_name', 'Untitled')}",
+                "court": best.payload.get('court', 'Untitled'),
+                "url": best.payload.get('source_html_url', 'http://www.commonlii.org/my/cases/'),
+                "similarity_score": best.score,
+                "decision_date": best.payload.get('decision_date', 'Unknown'),
+                "passages": [
+                    {
+                        "text": hit.payload.get('chunk_text', ''),
+                        "char_start": hit.payload.get('char_start'),
+                        "char_end": hit.payload.get('char_end'),
+                        "score": hit.score,
+                    }
+                    for hit in group.hits
+                ],
             }
         )
     return results
 
+def load_full_texts(cases: List[Dict]) -> None:
+    """Fetch the full texts of `cases` that have not been fetched yet, in one call, into the session state."""
+    full_texts = st.session_state["full_texts"]
+    missing = [case["case_id"] for case in cases if case["case_id"] not in full_texts]
+    if missing:
+        fetched = retriever.fetch_full_texts(missing)
+        for case_id in missing:
+            full_texts[case_id] = fetched.get(case_id, "Full text not available.")
+
 def summarize_relevancy(query: str, case: str) -> str:
     explanation = openai.explain_law_case_relavancy(query=query, case=case)
     return f"{explanation}"
@@ -60,6 +152,8 @@ if "results" not in st.session_state:
     st.session_state["results"] = []
 if "page" not in st.session_state:
     st.session_state["page"] = 0
+if "full_texts" not in st.session_state:
+    st.session_state["full_texts"] = {}
 
 PAGE_SIZE = 10
 
@@ -70,6 +164,7 @@ with st.sidebar:
         """
         ### Tips 🔍
         * Describe the cases you are looking for **using the semantics**.
+        * Know the case? Paste its citation (e.g. `[1999] MYCA 3`) or case number (e.g. `W-03-151-2000`).
         * Do not present a collection of disconnected keywords.
         * Instead, provide a coherent sentence to describe the nature of the case.
         * The result is **sorted by relevance**, with the most relevant cases appearing first.
@@ -79,6 +174,42 @@ with st.sidebar:
         """
     )
 
+    # Filters are applied by the search itself, so every result shown matches them
+    st.markdown("### Filters")
+    try:
+        court_counts = get_court_counts(retriever)
+    except Exception as e:
+        # Failures are not cached, so the next rerun tries again; searching works without the counts
+        logging.warning("Court counts unavailable: %s", e)
+        court_counts = {}
+        st.caption("The court list is unavailable right now.")
+    courts = st.multiselect("Court", options=list(court_counts), format_func=lambda c: f"{c} ({court_counts[c]:,})")
+    use_dates = st.checkbox("Limit decision dates")
+    decided_from = decided_to = None
+    if use_dates:
+        decided_from = st.date_input("Decided from", value=date(1990, 1, 1), min_value=date(1900, 1, 1))
+        decided_to = st.date_input("Decided to", value=date.today(), min_value=date(1900, 1, 1))
+    coram = st.text_input("Judge (coram)")
+    parties = st.text_input("Party")
+    counsel = st.text_input("Counsel")
+    try:
+        filters = SearchFilters(courts=courts, decided_from=decided_from, decided_to=decided_to,
+                                coram=coram or None, parties=parties or None, counsel=counsel or None)
+    except ValueError as e:
+        st.error(str(e))
+        filters = SearchFilters()
+    if not filters.is_empty:
+        try:
+            matching = get_facet_counts(retriever, filters)
+        except Exception as e:
+            # Keep the unfiltered court options; only the match counts are left out
+            logging.warning("Filtered court counts unavailable: %s", e)
+            matching = None
+        if matching is not None:
+            st.caption(f"{sum(matching.values()):,} cases match these filters")
+            if matching:
+                st.bar_chart(matching, horizontal=True)
+
 # --------------------- MAIN LAYOUT -------------------------------------------
 
 st.title("⚖️  Legal Case Similarity Search")
@@ -104,8 +235,10 @@ with st.form("search_form", clear_on_submit=False):
         for key in keys_to_delete:
             del st.session_state[key]
         
-        st.session_state["results"] = search_similar_cases(query)
+        st.session_state["results"] = search_similar_cases(query, filters=None if filters.is_empty else filters)
+        logging.info("Query embedding cache: %s", get_query_cache(QUERY_CACHE_PATH).stats())
         st.session_state["page"] = 0
+        st.session_state["full_texts"] = {}
 
 results = st.session_state["results"]
 page = st.session_state["page"]
@@ -123,6 +256,9 @@ if results:
 
     start, end = page * PAGE_SIZE, (page + 1) * PAGE_SIZE
     page_slice = results[start:end]
+    # Only the visible page needs its texts (for the download buttons and summaries)
+    load_full_texts(page_slice)
+    full_texts = st.session_state["full_texts"]
 
     for idx, case in enumerate(page_slice, start=1):
         with st.container():
@@ -130,6 +266,11 @@ if results:
             st.write(f"**Court**: {case["court"]}")
             st.write(f"**Decision Date**: {case["decision_date"]}")
             st.markdown(f"**Relevance**: <span style='color:{'green' if case['similarity_score'] > 0.8 else 'orange' if case['similarity_score'] > 0.6 else 'red'}'>{case['similarity_score']:.2f}</span>", unsafe_allow_html=True)
+            if case.get("passages"):
+                with st.expander("Matching passages", expanded=False):
+                    for passage in case["passages"]:
+                        st.caption(f"Characters {passage['char_start']}–{passage['char_end']} · relevance {passage['score']:.2f}")
+                        st.write(passage["text"])
 
             link_col, dl_col = st.columns([4, 1])
             with link_col:
@@ -143,7 +284,7 @@ if results:
                 with dl_col:
                     st.download_button(
                         label="⬇️ Download",
-                        data=case["full_text"],
+                        data=full_texts[case["case_id"]],
                         file_name=f"{case['title'].replace(' ', '_')}.doc",
                         mime="text/plain",
                         key=f"dl-{start + idx}"
@@ -152,7 +293,9 @@ if results:
                 with st.expander("Relatedness Summary", expanded=True):
                     if st.session_state.get(f"summary_result_{start + idx}") is None:
                         with st.spinner("Summarizing..."):
-                            result = summarize_relevancy(query, case["full_text"])
+                            # The matching passages are enough to explain the match and far shorter than the judgment
+                            context = "\n\n[...]\n\n".join(p["text"] for p in case["passages"]) if case.get("passages") else full_texts[case["case_id"]]
+                            result = summarize_relevancy(query, context)
                             st.session_state[f"summary_result_{start + idx}"] = result
                             st.session_state[f"summarizing_{start + idx}"] = False
                             st.rerun()
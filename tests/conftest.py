@@ -0,0 +1,25 @@
+import os
+import sys
+
+import pytest
+
+# The packages (embeddings, qdrant, config) are imported from the repository root, like the scripts do
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+
+def split_by_words(text, max_tokens, model, *, overlap=0):
+    """Stand-in for `split_by_tokens` counting one token per word, so that tests need no tokenizer download."""
+    words = text.split(" ")
+    pieces, start = [], 0
+    for i in range(0, len(words), max_tokens):
+        piece = " ".join(words[i:i + max_tokens])
+        pieces.append((piece, start, start + len(piece), len(words[i:i + max_tokens])))
+        start += len(piece) + 1
+    return pieces
+
+
+@pytest.fixture
+def word_splitter(monkeypatch):
+    """Make `OpenAIEmbedder` split texts with `split_by_words`."""
+    import embeddings.embeddings as embeddings_module
+    monkeypatch.setattr(embeddings_module, "split_by_tokens", split_by_words)
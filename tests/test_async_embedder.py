@@ -0,0 +1,129 @@
+import asyncio
+import json
+import random
+import time
+
+import httpx
+import openai
+import pytest
+from openai import AsyncOpenAI
+
+import embeddings.async_embedder as async_embedder
+from embeddings.async_embedder import AsyncEmbeddingEngine, TokenBucket
+
+
+class MockEmbeddingsAPI:
+    """
+    httpx transport handler standing in for the embeddings endpoint.
+
+    Every input ``"<n>"`` is embedded as ``[n, 1.0]``; the first `failures` requests are answered with
+    `status`, and the embeddings of a response come back shuffled (the API tags them with ``index``).
+    """
+
+    def __init__(self, failures=0, status=429, retry_after=None, delay=0.0):
+        self.failures = failures
+        self.status = status
+        self.retry_after = retry_after
+        self.delay = delay
+        self.requests = []
+
+    async def __call__(self, request):
+        body = json.loads(await request.aread())
+        self.requests.append(body["input"])
+        if self.delay:
+            await asyncio.sleep(random.uniform(0, self.delay))
+        if len(self.requests) <= self.failures:
+            headers = {"retry-after": self.retry_after} if self.retry_after is not None else {}
+            return httpx.Response(self.status, headers=headers, json={"error": {"message": "try again", "type": "error"}})
+        data = [{"object": "embedding", "index": i, "embedding": [float(text), 1.0]} for i, text in enumerate(body["input"])]
+        random.shuffle(data)
+        n_tokens = len(body["input"])
+        return httpx.Response(200, json={
+            "object": "list", "data": data, "model": body["model"],
+            "usage": {"prompt_tokens": n_tokens, "total_tokens": n_tokens},
+        })
+
+
+def make_engine(monkeypatch, api, **kwargs):
+    engine = AsyncEmbeddingEngine("text-embedding-3-small", api_key="test", initial_backoff=0.01, **kwargs)
+    monkeypatch.setattr(engine, "_new_client", lambda: AsyncOpenAI(
+        api_key="test", base_url="http://mock/v1", max_retries=0,
+        http_client=httpx.AsyncClient(transport=httpx.MockTransport(api)),
+    ))
+    return engine
+
+
+def embed(engine, texts, token_counts):
+    return asyncio.run(engine.embed(texts, token_counts))
+
+
+def test_results_keep_input_order_across_requests(monkeypatch):
+    monkeypatch.setattr(async_embedder, "MAX_REQUEST_INPUTS", 4)
+    api = MockEmbeddingsAPI(delay=0.02)
+    engine = make_engine(monkeypatch, api)
+    texts = [str(n) for n in range(30)]
+
+    vectors = embed(engine, texts, [1] * len(texts))
+
+    assert vectors == [[float(n), 1.0] for n in range(30)]
+    assert len(api.requests) == 8
+
+
+@pytest.mark.parametrize("status", [429, 500, 503])
+def test_retryable_errors_are_retried(monkeypatch, status):
+    api = MockEmbeddingsAPI(failures=2, status=status)
+    engine = make_engine(monkeypatch, api)
+
+    assert embed(engine, ["1", "2"], [1, 1]) == [[1.0, 1.0], [2.0, 1.0]]
+    assert len(api.requests) == 3
+
+
+def test_retry_after_header_sets_the_delay(monkeypatch):
+    api = MockEmbeddingsAPI(failures=1, retry_after="0.3")
+    engine = make_engine(monkeypatch, api)
+
+    start = time.monotonic()
+    embed(engine, ["1"], [1])
+    assert time.monotonic() - start >= 0.3
+
+
+def test_gives_up_after_max_retries(monkeypatch):
+    api = MockEmbeddingsAPI(failures=10, status=429)
+    engine = make_engine(monkeypatch, api, max_retries=2)
+
+    with pytest.raises(openai.RateLimitError):
+        embed(engine, ["1"], [1])
+    assert len(api.requests) == 3
+
+
+def test_client_errors_are_not_retried(monkeypatch):
+    api = MockEmbeddingsAPI(failures=1, status=400)
+    engine = make_engine(monkeypatch, api)
+
+    with pytest.raises(openai.BadRequestError):
+        embed(engine, ["1"], [1])
+    assert len(api.requests) == 1
+
+
+def test_request_bucket_throttles_requests(monkeypatch):
+    monkeypatch.setattr(async_embedder, "MAX_REQUEST_INPUTS", 1)
+    api = MockEmbeddingsAPI()
+    engine = make_engine(monkeypatch, api)
+    engine.request_bucket = TokenBucket(1_200, capacity=1)   # 20 requests/s, no burst
+
+    start = time.monotonic()
+    embed(engine, [str(n) for n in range(5)], [1] * 5)
+    assert time.monotonic() - start >= 4 / 20 * 0.9
+    assert len(api.requests) == 5
+
+
+def test_token_bucket_throttles_tokens(monkeypatch):
+    api = MockEmbeddingsAPI()
+    engine = make_engine(monkeypatch, api)
+    engine.token_bucket = TokenBucket(60_000, capacity=100)   # 1000 tokens/s, requests of at most 100 tokens
+
+    start = time.monotonic()
+    vectors = embed(engine, [str(n) for n in range(5)], [100] * 5)
+    assert time.monotonic() - start >= 4 * 100 / 1_000 * 0.9
+    assert len(api.requests) == 5
+    assert vectors == [[float(n), 1.0] for n in range(5)]
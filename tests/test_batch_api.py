@@ -0,0 +1,129 @@
+import json
+import os
+from collections import Counter
+
+import pytest
+
+from embeddings.batch_api import BatchEmbeddingJob, LocalFileBatchBackend
+from embeddings.embeddings import OpenAIEmbedder
+from embeddings.utils import chunk_point_id
+
+
+def text_vector(text):
+    return [float(len(text)), 1.0]
+
+
+class FlakyHandler:
+    """
+    Request handler of `LocalFileBatchBackend`: embeds every input as `text_vector`, except that
+    the inputs in `failures` fail that many times first (``None`` fails forever).
+    """
+
+    def __init__(self, failures=None):
+        self.failures = dict(failures or {})
+        self.calls = Counter()
+
+    def __call__(self, body):
+        text = body["input"]
+        self.calls[text] += 1
+        if text in self.failures and (self.failures[text] is None or self.calls[text] <= self.failures[text]):
+            raise RuntimeError(f"cannot embed {text!r}")
+        return {"object": "list", "data": [{"object": "embedding", "index": 0, "embedding": text_vector(text)}]}
+
+
+class CountingBackend(LocalFileBatchBackend):
+    def __init__(self, root, handler):
+        super().__init__(root, handler)
+        self.submitted = []
+
+    def submit(self, request_file):
+        self.submitted.append(os.path.basename(request_file))
+        return super().submit(request_file)
+
+
+INPUTS = {"a": "alpha", "b": "beta", "c": "gamma"}
+
+
+def make_job(tmp_path, handler, **kwargs):
+    backend = CountingBackend(str(tmp_path / "batches"), handler)
+    job = BatchEmbeddingJob(backend, "text-embedding-3-small", str(tmp_path / "work"), poll_interval=0, **kwargs)
+    return job, backend
+
+
+def request_ids(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line)["custom_id"] for line in f]
+
+
+def test_only_failed_lines_are_resubmitted(tmp_path):
+    handler = FlakyHandler({"beta": 1})
+    job, backend = make_job(tmp_path, handler)
+
+    embeddings, errors = job.run(INPUTS)
+
+    assert embeddings == {cid: text_vector(text) for cid, text in INPUTS.items()}
+    assert errors == {}
+    assert handler.calls == Counter({"alpha": 1, "beta": 2, "gamma": 1})
+    assert backend.submitted == ["requests_a1_0000.jsonl", "requests_a2_0000.jsonl"]
+    assert request_ids(tmp_path / "work" / "requests_a2_0000.jsonl") == ["b"]
+
+
+def test_inputs_failing_every_attempt_end_up_in_errors(tmp_path):
+    handler = FlakyHandler({"gamma": None})
+    job, backend = make_job(tmp_path, handler, max_attempts=3)
+
+    embeddings, errors = job.run(INPUTS)
+
+    assert set(embeddings) == {"a", "b"}
+    assert errors == {"c": "cannot embed 'gamma'"}
+    assert handler.calls["gamma"] == 3
+    assert len(backend.submitted) == 3
+
+
+def test_restarted_job_resumes_from_state_file(tmp_path):
+    job, backend = make_job(tmp_path, FlakyHandler())
+    first, _ = job.run(INPUTS)
+    assert json.loads((tmp_path / "work" / "batches.json").read_text())
+
+    handler = FlakyHandler()
+    job, backend = make_job(tmp_path, handler)
+    again, errors = job.run(INPUTS)
+
+    assert backend.submitted == []
+    assert not handler.calls
+    assert again == first and errors == {}
+
+
+@pytest.fixture
+def embedder(word_splitter):
+    return OpenAIEmbedder(openai_api_key="test", qdrant_client_url=":memory:")
+
+
+def write_records(path, records):
+    path.write_text("\n".join(json.dumps(r) for r in records), encoding="utf-8")
+    return str(path)
+
+
+def test_offline_embedding_maps_custom_ids_back_to_points(tmp_path, embedder):
+    paths = [
+        write_records(tmp_path / "a.json", [{"id": 7, "full_text": "one two three four five six seven eight nine ten"}]),
+        write_records(tmp_path / "b.json", [{"id": 8, "full_text": "short text"}, {"id": 9, "full_text": "lost one two three four"}]),
+    ]
+    # The second chunk of case 7 fails once and is resubmitted; case 9 never gets its first chunk
+    handler = FlakyHandler({"five six seven eight": 1, "lost one two three": None})
+    backend = CountingBackend(str(tmp_path / "batches"), handler)
+
+    points = embedder.embed_json_files_offline(
+        paths, "full_text", work_dir=str(tmp_path / "work"), backend=backend, poll_interval=0,
+        max_chunk_tokens=4, pooled_vector=False, files_per_shard=1,
+    )
+
+    by_id = {p.id: p for p in points}
+    assert set(by_id) == {chunk_point_id(7, k) for k in range(3)} | {8}
+    for k, text in enumerate(["one two three four", "five six seven eight", "nine ten"]):
+        chunk = by_id[chunk_point_id(7, k)]
+        assert chunk.payload["chunk_index"] == k and chunk.payload["chunk_text"] == text
+        assert chunk.vector == text_vector(text)
+    assert by_id[8].vector == text_vector("short text")
+    assert handler.calls["one two three four"] == 1
+    assert handler.calls["lost one two three"] == 3
@@ -0,0 +1,92 @@
+import json
+
+import pytest
+from qdrant_client import QdrantClient, models
+
+from embeddings.embeddings import OpenAIEmbedder
+from embeddings.retriever import QdrantQueryRetriever
+from embeddings.utils import chunk_point_id
+from qdrant.provisioning import CollectionSpec
+
+COLLECTION = "cases"
+
+# One axis per topic, so that a query vector picks its case deterministically
+TOPICS = {"negligence": [1.0, 0.0, 0.0], "contract": [0.0, 1.0, 0.0], "tenancy": [0.0, 0.0, 1.0]}
+
+
+def topic_vector(text):
+    return next(vector for word, vector in TOPICS.items() if word in text)
+
+
+class TopicEmbeddings:
+    """Query embedder of the retriever (`embed_query` / `embed_documents`)."""
+
+    def embed_query(self, query):
+        return topic_vector(query)
+
+    def embed_documents(self, texts):
+        return [topic_vector(t) for t in texts]
+
+
+@pytest.fixture
+def embedder(monkeypatch, word_splitter):
+    embedder = OpenAIEmbedder(openai_api_key="test", qdrant_client_url=":memory:")
+
+    async def embed(texts, token_counts):
+        return [topic_vector(t) for t in texts]
+
+    monkeypatch.setattr(embedder.engine, "embed", embed)
+    return embedder
+
+
+@pytest.fixture
+def records_file(tmp_path):
+    path = tmp_path / "cases.json"
+    records = [
+        # Split into three chunks of four words: negligence first, then contract
+        {"id": 7, "case_name": "Split v Case", "full_text": "negligence duty of care contract offer and acceptance contract terms were breached"},
+        {"id": 8, "case_name": "Short v Case", "full_text": "tenancy notice to quit"},
+    ]
+    path.write_text("\n".join(json.dumps(r) for r in records), encoding="utf-8")
+    return str(path)
+
+
+def search(points, query):
+    client = QdrantClient(":memory:")
+    client.create_collection(COLLECTION, vectors_config=models.VectorParams(size=3, distance=models.Distance.COSINE))
+    client.upsert(COLLECTION, points=points)
+    retriever = QdrantQueryRetriever(
+        collection_name=COLLECTION,
+        client=client,
+        embeddings=TopicEmbeddings(),
+        spec=CollectionSpec(name=COLLECTION, vector_size=3),
+    )
+    return retriever.similarity_search_by_query_with_dense_vector(query, limit=10).points
+
+
+def test_split_case_without_pooled_point_is_found_once(embedder, records_file):
+    points = embedder.embed_json_file(records_file, "full_text", split_oversized=True, max_chunk_tokens=4, pooled_vector=False)
+    assert sum(p.payload.get("case_point", False) for p in points) == 1
+
+    hits = search(points, "negligence")
+    assert hits[0].id == chunk_point_id(7, 0)
+    assert hits[0].payload["case_id"] == 7
+    # Each case is listed once: the first chunk stands for case 7, its other chunks are left out
+    assert sorted(h.payload.get("case_id", h.id) for h in hits) == [7, 8]
+
+
+def test_pooled_point_stands_for_split_case(embedder, records_file):
+    points = embedder.embed_json_file(records_file, "full_text", split_oversized=True, max_chunk_tokens=4, pooled_vector=True)
+    assert not any(p.payload.get("case_point") for p in points)
+
+    hits = search(points, "contract")
+    assert [h.id for h in hits] == [7, 8]
+    assert hits[0].payload["point_type"] == "pooled"
+
+
+def test_chunk_all_without_pooled_point_lists_every_case(embedder, records_file):
+    points = embedder.embed_json_file(records_file, "full_text", chunk_all=True, max_chunk_tokens=4, pooled_vector=False)
+
+    hits = search(points, "tenancy")
+    assert hits[0].id == chunk_point_id(8, 0)
+    assert sorted(h.payload["case_id"] for h in hits) == [7, 8]